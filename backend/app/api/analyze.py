@@ -0,0 +1,67 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import List, Optional
+import asyncio
+import logging
+import os
+import re
+
+from core.process_excel import analyze_comment, parse_stages
+from core.dedup import cluster_comments, cluster_sizes, DEDUP_ENABLED
+from core.admission import get_controller
+from api.responses import FastJSONResponse
+
+router = APIRouter(default_response_class=FastJSONResponse)
+logger = logging.getLogger(__name__)
+
+ANALYZE_CONCURRENCY = int(os.getenv("ANALYZE_CONCURRENCY", "8"))
+
+class AnalyzeItem(BaseModel):
+    id: Optional[str] = None
+    text: str
+
+class AnalyzeRequest(BaseModel):
+    texts: List[AnalyzeItem]
+    stages: List[str] = ["keywords", "sentiment", "summary"]
+    top_n: int = 5
+    dedup: bool = DEDUP_ENABLED
+
+@router.post("/analyze")
+async def analyze(request: AnalyzeRequest):
+    """
+    Run the selected stages (keywords, sentiment, summary, wordcloud) over a
+    batch of texts in one call. Texts are normalised and near-duplicates
+    clustered once up front; each distinct text is then analysed concurrently.
+    """
+    try:
+        stages = parse_stages(request.stages)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Shared preprocessing for every stage
+    texts = [re.sub(r"\s+", " ", item.text).strip() for item in request.texts]
+    rep_of = cluster_comments(texts) if request.dedup else list(range(len(texts)))
+    sizes = cluster_sizes(rep_of)
+
+    semaphore = asyncio.Semaphore(ANALYZE_CONCURRENCY)
+
+    async def run(idx: int) -> dict:
+        async with semaphore:
+            try:
+                return await analyze_comment(texts[idx], stages, top_n=request.top_n)
+            except Exception as e:
+                logger.error(f"Analysis failed for item {idx}: {str(e)}")
+                return {"error": str(e)}
+
+    representatives = [idx for idx in sorted(set(rep_of)) if texts[idx]]
+    async with get_controller("analyze").admit(len(representatives) * len(stages)):
+        outputs = dict(zip(representatives, await asyncio.gather(*(run(idx) for idx in representatives))))
+
+    results = []
+    for position, (item, rep, size) in enumerate(zip(request.texts, rep_of, sizes)):
+        result = {"id": item.id if item.id is not None else str(position)}
+        result.update(outputs.get(rep, {"error": "Empty text"}))
+        result["cluster_size"] = size
+        results.append(result)
+
+    return FastJSONResponse({"stages": list(stages), "results": results})
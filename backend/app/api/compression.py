@@ -0,0 +1,118 @@
+import asyncio
+import gzip
+import os
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip is offered
+    brotli = None
+
+from core.metrics import COMPRESSION_BYTES_TOTAL
+
+# Bodies smaller than this are sent as-is; compressing them costs more than it saves
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+# Bodies above this are compressed in a worker thread so the event loop keeps serving
+COMPRESSION_THREAD_MIN_SIZE = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "image/svg+xml")
+
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    The accepted encoding with the highest q-value; server preference (br
+    over gzip) only breaks ties. Encodings at q=0 are never chosen.
+    """
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        token, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[token.strip()] = quality
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _compressible(status: int, headers: Headers, body: bytes, minimum_size: int) -> bool:
+    if status in (204, 206, 304) or len(body) < minimum_size:
+        return False
+    if "content-encoding" in headers or "content-range" in headers:
+        return False
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type.startswith("text/") and content_type != "text/event-stream" or content_type in COMPRESSIBLE_TYPES
+
+
+class CompressionMiddleware:
+    """
+    gzip/brotli for responses sent as a single body (JSON results, metrics).
+    Streamed responses (NDJSON and SSE progress, file downloads) pass through
+    untouched so their chunks keep flowing as they are produced; spreadsheets,
+    Parquet and PNGs are already compressed.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start = None
+
+        async def send_compressed(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                # Held back until the first body message shows whether the response streams
+                start = message
+                return
+            if start is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (message["type"] == "http.response.body" and not message.get("more_body", False)
+                    and _compressible(start["status"], headers, body, self.minimum_size)):
+                if len(body) >= COMPRESSION_THREAD_MIN_SIZE:
+                    compressed = await asyncio.to_thread(compress, body, encoding)
+                else:
+                    compressed = compress(body, encoding)
+                COMPRESSION_BYTES_TOTAL.inc(len(body), encoding=encoding, stage="original")
+                COMPRESSION_BYTES_TOTAL.inc(len(compressed), encoding=encoding, stage="compressed")
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(compressed))
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": compressed}
+
+            initial, start = start, None
+            await send(initial)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
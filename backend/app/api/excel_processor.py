@@ -11,20 +11,67 @@ from typing import Optional
 import sys
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from core.process_excel import process_excel
+from core.process_excel import process_excel, parse_stages, buffer_size, estimate_rows
+from core.process_archive import process_archive, estimate_archive_rows
+from core.admission import Overloaded, get_controller
+from core.dedup import DEDUP_ENABLED
+from core.checkpoint import CHECKPOINT_ENABLED
+from core.progress import ProgressTracker, create_job
+from core.columnar_export import parse_format, EXPORT_FORMATS
 
 router = APIRouter()
 
-@router.post("/process-excel", summary="Process Excel file with comments")
-async def process_excel_file(
-    background_tasks: BackgroundTasks,
-    file: UploadFile = File(...),
-    save_to_disk: bool = False
-):
-    # Debug information
-    request_id = f"req_{os.getpid()}_{int(time.time())}"
-    print(f"[{request_id}] Processing Excel file: {file.filename if file else 'No file'}")
-    
+# Uploads are copied to disk in chunks of this size and rejected once they pass the limit
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(100 * 1024 * 1024)))
+
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def iter_file(fileobj, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    """Yield a generated output file in chunks from the start, closing it afterwards"""
+    try:
+        fileobj.seek(0)
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fileobj.close()
+
+def _parse_stages_or_400(stages: Optional[str]) -> tuple:
+    """Parse the comma-separated `stages` query parameter (default: all stages)"""
+    try:
+        return parse_stages(stages)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _output_type(filename: str, output_format: str) -> tuple:
+    """Media type and download name of a processed upload in the requested output format"""
+    if output_format == "xlsx":
+        return XLSX_MEDIA_TYPE, f"processed_{filename}"
+    extension, media_type = EXPORT_FORMATS[output_format]
+    return media_type, f"processed_{os.path.splitext(filename)[0]}{extension}"
+
+def _parse_format_or_400(output_format: Optional[str]) -> str:
+    """`xlsx` (default) or a columnar export format: parquet, arrow"""
+    if not output_format or output_format.lower() == "xlsx":
+        return "xlsx"
+    try:
+        return parse_format(output_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def estimate_cost(temp_path: str, filename: str, stages: tuple, all_sheets: bool = False) -> int:
+    """Admission cost of an upload: estimated rows x selected stages"""
+    if filename.lower().endswith(".zip"):
+        rows = await asyncio.to_thread(estimate_archive_rows, temp_path)
+    else:
+        rows = await asyncio.to_thread(estimate_rows, temp_path, all_sheets)
+    return rows * len(stages)
+
+async def save_excel_upload(file: UploadFile, request_id: str, allow_zip: bool = False) -> str:
+    """Validate an uploaded Excel file (or zip of them, with `allow_zip`) and copy it to a temporary path"""
     # Validate file input
     if not file:
         print(f"[{request_id}] Error: No file provided")
@@ -34,101 +81,150 @@ async def process_excel_file(
         print(f"[{request_id}] Error: File has no name")
         raise HTTPException(status_code=400, detail="File has no name")
     
-    if not file.filename.endswith(('.xlsx', '.xls')):
+    if not file.filename.lower().endswith(('.xlsx', '.xls', '.zip') if allow_zip else ('.xlsx', '.xls')):
         print(f"[{request_id}] Error: Invalid file type: {file.filename}")
+        accepted = "Excel files (.xlsx, .xls) or zip archives of them" if allow_zip else "Excel files (.xlsx, .xls)"
         raise HTTPException(
             status_code=400, 
-            detail="Only Excel files (.xlsx, .xls) are accepted. Please ensure your file has the correct extension."
+            detail=f"Only {accepted} are accepted. Please ensure your file has the correct extension."
         )
     
     temp_path = None
-    try:
-        # Create a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            # Reset file position to start
-            await file.seek(0)
-            try:
-                # Copy the uploaded file to the temp file
-                contents = await file.read()
-                if not contents:
-                    print("Error: Uploaded file is empty")
-                    raise HTTPException(status_code=400, detail="Uploaded file is empty. Please check that your file contains data.")
-                
-                print(f"Read {len(contents)} bytes from uploaded file")
-                temp_file.write(contents)
-                temp_path = temp_file.name
-            except Exception as file_read_error:
-                print(f"Error reading uploaded file: {str(file_read_error)}")
-                if os.path.exists(temp_file.name):
-                    os.unlink(temp_file.name)
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Error reading uploaded file: {str(file_read_error)}. Please try uploading the file again."
-                )
-        
-        # Verify the file was saved correctly
-        if not temp_path or not os.path.exists(temp_path):
-            raise HTTPException(status_code=500, detail="Failed to save uploaded file (file not found)")
+    size = 0
+    # Create a temporary file
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
+        temp_path = temp_file.name
+        # Reset file position to start
+        await file.seek(0)
+        try:
+            # Copy the upload in chunks, enforcing the size limit as we go
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    print(f"[{request_id}] Error: Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"Uploaded file is too large. The limit is {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."
+                    )
+                temp_file.write(chunk)
+            if size == 0:
+                print("Error: Uploaded file is empty")
+                raise HTTPException(status_code=400, detail="Uploaded file is empty. Please check that your file contains data.")
             
-        if os.path.getsize(temp_path) == 0:
+            print(f"Read {size} bytes from uploaded file")
+        except HTTPException:
+            temp_file.close()
+            os.unlink(temp_path)
+            raise
+        except Exception as file_read_error:
+            print(f"Error reading uploaded file: {str(file_read_error)}")
+            temp_file.close()
             if os.path.exists(temp_path):
                 os.unlink(temp_path)
-            raise HTTPException(status_code=400, detail="Uploaded file is empty. Please check that your file contains data.")
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Error reading uploaded file: {str(file_read_error)}. Please try uploading the file again."
+            )
+    
+    # Verify the file was saved correctly
+    if not temp_path or not os.path.exists(temp_path):
+        raise HTTPException(status_code=500, detail="Failed to save uploaded file (file not found)")
         
-        if save_to_disk:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_filename = f"processed_{timestamp}_{file.filename}"
-            output_path = os.path.join(tempfile.gettempdir(), output_filename)
+    return temp_path
+
+@router.post("/process-excel", summary="Process Excel file with comments")
+async def process_excel_file(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    save_to_disk: bool = False,
+    dedup: bool = DEDUP_ENABLED,
+    incremental: bool = False,
+    stages: Optional[str] = None,
+    all_sheets: bool = False,
+    resume: bool = CHECKPOINT_ENABLED,
+    output_format: str = "xlsx",
+    export_images: bool = False
+):
+    """
+    `output_format=parquet` or `arrow` returns the results as a columnar file
+    (one row per comment) instead of a workbook; `export_images` embeds the
+    word cloud PNGs in it, otherwise rows only reference their cluster's image.
+    """
+    # Debug information
+    request_id = f"req_{os.getpid()}_{int(time.time())}"
+    print(f"[{request_id}] Processing Excel file: {file.filename if file else 'No file'}")
+    selected_stages = _parse_stages_or_400(stages)
+    output_format = _parse_format_or_400(output_format)
+    
+    # The upload's name is validated before it is used for the download name
+    temp_path = await save_excel_upload(file, request_id)
+    media_type, download_name = _output_type(file.filename, output_format)
+    try:
+        cost = await estimate_cost(temp_path, file.filename, selected_stages, all_sheets)
+        async with get_controller("excel").admit(cost):
+            if save_to_disk:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                output_filename = f"{timestamp}_{download_name}"
+                output_path = os.path.join(tempfile.gettempdir(), output_filename)
             
-            await process_excel(temp_path, output_path)
+                # The output is served from output_path; drop the in-memory copy now
+                result_io = await process_excel(temp_path, output_path, dedup=dedup, incremental=incremental,
+                                                stages=selected_stages, all_sheets=all_sheets, resume=resume,
+                                                output_format=output_format, export_images=export_images)
+                result_io.close()
             
-            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
-                raise HTTPException(status_code=500, detail="Failed to generate output file")
+                if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+                    raise HTTPException(status_code=500, detail="Failed to generate output file")
             
-            background_tasks.add_task(lambda: os.unlink(output_path) if os.path.exists(output_path) else None)
-            background_tasks.add_task(lambda: os.unlink(temp_path) if os.path.exists(temp_path) else None)
+                background_tasks.add_task(lambda: os.unlink(output_path) if os.path.exists(output_path) else None)
+                background_tasks.add_task(lambda: os.unlink(temp_path) if os.path.exists(temp_path) else None)
             
-            return FileResponse(
-                path=output_path,
-                filename=output_filename,
-                media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-        else:
-            print(f"Processing Excel file {temp_path}")
-            try:
-                result_io = await process_excel(temp_path)
-                
-                if not result_io:
-                    print("Error: Failed to generate output content")
-                    raise HTTPException(status_code=500, detail="Failed to generate output content")
+                return FileResponse(
+                    path=output_path,
+                    filename=output_filename,
+                    media_type=media_type
+                )
+            else:
+                print(f"Processing Excel file {temp_path}")
+                try:
+                    result_io = await process_excel(temp_path, dedup=dedup, incremental=incremental, stages=selected_stages,
+                                                    all_sheets=all_sheets, resume=resume, output_format=output_format,
+                                                    export_images=export_images)
                 
-                # Check if result_io is a BytesIO object before calling getbuffer()
-                if not hasattr(result_io, 'getbuffer'):
-                    print(f"Error: Unexpected result type: {type(result_io)}")
-                    raise HTTPException(status_code=500, detail="Internal processing error: Invalid output format")
+                    if not result_io:
+                        print("Error: Failed to generate output content")
+                        raise HTTPException(status_code=500, detail="Failed to generate output content")
                 
-                if result_io.getbuffer().nbytes == 0:
-                    print("Error: Empty output file generated")
-                    raise HTTPException(status_code=500, detail="Empty output file generated")
+                    output_size = buffer_size(result_io)
+                    if output_size == 0:
+                        print("Error: Empty output file generated")
+                        raise HTTPException(status_code=500, detail="Empty output file generated")
                     
-                background_tasks.add_task(lambda: os.unlink(temp_path) if os.path.exists(temp_path) else None)
-                result_io.seek(0)
-                print(f"Returning processed Excel file ({result_io.getbuffer().nbytes} bytes)")
-            except Exception as e:
-                print(f"Excel processing error: {str(e)}")
-                import traceback
-                print(traceback.format_exc())
-                raise HTTPException(status_code=500, detail=f"Excel processing failed: {str(e)}")
-            headers = {
-                'Content-Disposition': f'attachment; filename="processed_{file.filename}"'
-            }
+                    background_tasks.add_task(lambda: os.unlink(temp_path) if os.path.exists(temp_path) else None)
+                    print(f"Returning processed Excel file ({output_size} bytes)")
+                except Exception as e:
+                    print(f"Excel processing error: {str(e)}")
+                    import traceback
+                    print(traceback.format_exc())
+                    raise HTTPException(status_code=500, detail=f"Excel processing failed: {str(e)}")
+                headers = {
+                    'Content-Disposition': f'attachment; filename="{download_name}"',
+                    'Content-Length': str(output_size)
+                }
             
-            return StreamingResponse(
-                result_io,
-                media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                headers=headers
-            )
+                return StreamingResponse(
+                    iter_file(result_io),
+                    media_type=media_type,
+                    headers=headers
+                )
             
+    except Overloaded:
+        if temp_path and os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
     except ValueError as ve:
         if temp_path and os.path.exists(temp_path):
             os.unlink(temp_path)
@@ -140,4 +236,166 @@ async def process_excel_file(
         # Log the full exception
         import traceback
         print(f"Excel processing error: {str(e)}\n{traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+async def _run_excel_job(tracker: ProgressTracker, temp_path: str, output_path: str, filename: str,
+                         dedup: bool, incremental: bool, stages: tuple, all_sheets: bool = False,
+                         resume: bool = CHECKPOINT_ENABLED, cost: int = 1, output_format: str = "xlsx",
+                         export_images: bool = False):
+    try:
+        # Queued jobs wait for capacity instead of timing out
+        async with get_controller("excel").admit(cost, timeout=None):
+            result_io = await process_excel(temp_path, output_path, dedup=dedup, progress=tracker, incremental=incremental,
+                                            stages=stages, all_sheets=all_sheets, resume=resume, output_format=output_format,
+                                            export_images=export_images)
+            result_io.close()
+        media_type, download_name = _output_type(filename, output_format)
+        tracker.finish(result=output_path, media_type=media_type, filename=download_name)
+    except Exception as e:
+        print(f"[{tracker.job_id}] Excel job failed: {str(e)}")
+        tracker.fail(str(e))
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+@router.post("/process-excel/jobs", summary="Start a background Excel processing job with progress events")
+async def start_excel_job(
+    file: UploadFile = File(...),
+    dedup: bool = DEDUP_ENABLED,
+    incremental: bool = False,
+    stages: Optional[str] = None,
+    all_sheets: bool = False,
+    resume: bool = CHECKPOINT_ENABLED,
+    output_format: str = "xlsx",
+    export_images: bool = False
+):
+    """
+    Completed rows are checkpointed (unless `resume=false`), so if the job is
+    lost midway, uploading the same file again only processes the rows left.
+    `output_format` and `export_images` work as for /process-excel.
+    """
+    selected_stages = _parse_stages_or_400(stages)
+    output_format = _parse_format_or_400(output_format)
+    get_controller("excel").check()
+    request_id = f"req_{os.getpid()}_{int(time.time())}"
+    temp_path = await save_excel_upload(file, request_id)
+    cost = await estimate_cost(temp_path, file.filename, selected_stages, all_sheets)
+    tracker = create_job("excel")
+    extension = ".xlsx" if output_format == "xlsx" else EXPORT_FORMATS[output_format][0]
+    output_path = os.path.join(tempfile.gettempdir(), f"processed_{tracker.job_id}{extension}")
+
+    tracker.task = asyncio.create_task(_run_excel_job(
+        tracker, temp_path, output_path, file.filename, dedup, incremental, selected_stages, all_sheets, resume, cost,
+        output_format, export_images
+    ))
+    return {
+        "job_id": tracker.job_id,
+        "events_url": f"/api/jobs/{tracker.job_id}/events",
+        "result_url": f"/api/jobs/{tracker.job_id}/result"
+    }
+
+async def _process_batch(temp_path: str, filename: str, combined: bool, dedup: bool, incremental: bool,
+                         stages: tuple, progress: Optional[ProgressTracker] = None, resume: bool = CHECKPOINT_ENABLED):
+    """Process a multi-sheet workbook or a zip of workbooks; returns (output file, media_type, download name)"""
+    stem = os.path.splitext(filename)[0]
+    if not filename.lower().endswith(".zip"):
+        output = await process_excel(temp_path, None, dedup=dedup, progress=progress, incremental=incremental,
+                                     stages=stages, all_sheets=True, resume=resume)
+        return output, XLSX_MEDIA_TYPE, f"processed_{filename}"
+    with tempfile.TemporaryDirectory() as work_dir:
+        output, media_type = await process_archive(temp_path, work_dir, combined=combined, dedup=dedup,
+                                                   progress=progress, incremental=incremental, stages=stages,
+                                                   resume=resume)
+    extension = ".xlsx" if media_type == XLSX_MEDIA_TYPE else ".zip"
+    return output, media_type, f"processed_{stem}{extension}"
+
+@router.post("/process-excel/batch", summary="Process every sheet of a workbook, or every workbook in a zip archive")
+async def process_excel_batch(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    combined: bool = False,
+    dedup: bool = DEDUP_ENABLED,
+    incremental: bool = False,
+    stages: Optional[str] = None,
+    resume: bool = CHECKPOINT_ENABLED
+):
+    """
+    Sheets and workbooks are analysed in parallel under one shared NLP
+    concurrency budget. A workbook upload returns one processed workbook with
+    all its sheets. A zip upload returns a zip with one processed workbook per
+    input, or with `combined=true` a single workbook with a sheet per input sheet.
+    """
+    request_id = f"req_{os.getpid()}_{int(time.time())}"
+    selected_stages = _parse_stages_or_400(stages)
+    temp_path = await save_excel_upload(file, request_id, allow_zip=True)
+    background_tasks.add_task(lambda: os.unlink(temp_path) if os.path.exists(temp_path) else None)
+    cost = await estimate_cost(temp_path, file.filename, selected_stages, all_sheets=True)
+    try:
+        async with get_controller("excel").admit(cost):
+            output, media_type, download_name = await _process_batch(
+                temp_path, file.filename, combined, dedup, incremental, selected_stages, resume=resume
+            )
+    except Overloaded:
+        # Raised before the response exists, so the background cleanup won't run
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        import traceback
+        print(f"[{request_id}] Batch processing error: {str(e)}\n{traceback.format_exc()}")
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+
+    return StreamingResponse(
+        iter_file(output),
+        media_type=media_type,
+        headers={
+            'Content-Disposition': f'attachment; filename="{download_name}"',
+            'Content-Length': str(buffer_size(output))
+        }
+    )
+
+async def _run_batch_job(tracker: ProgressTracker, temp_path: str, filename: str, combined: bool,
+                         dedup: bool, incremental: bool, stages: tuple, resume: bool = CHECKPOINT_ENABLED,
+                         cost: int = 1):
+    try:
+        async with get_controller("excel").admit(cost, timeout=None):
+            output, media_type, download_name = await _process_batch(
+                temp_path, filename, combined, dedup, incremental, stages, progress=tracker, resume=resume
+            )
+        output_path = os.path.join(tempfile.gettempdir(), f"processed_{tracker.job_id}{os.path.splitext(download_name)[1]}")
+        with output, open(output_path, "wb") as f:
+            output.seek(0)
+            shutil.copyfileobj(output, f)
+        tracker.finish(result=output_path, media_type=media_type, filename=download_name)
+    except Exception as e:
+        print(f"[{tracker.job_id}] Batch job failed: {str(e)}")
+        tracker.fail(str(e))
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+@router.post("/process-excel/batch/jobs", summary="Start a background multi-sheet or zip processing job")
+async def start_batch_job(
+    file: UploadFile = File(...),
+    combined: bool = False,
+    dedup: bool = DEDUP_ENABLED,
+    incremental: bool = False,
+    stages: Optional[str] = None,
+    resume: bool = CHECKPOINT_ENABLED
+):
+    selected_stages = _parse_stages_or_400(stages)
+    get_controller("excel").check()
+    request_id = f"req_{os.getpid()}_{int(time.time())}"
+    temp_path = await save_excel_upload(file, request_id, allow_zip=True)
+    cost = await estimate_cost(temp_path, file.filename, selected_stages, all_sheets=True)
+    tracker = create_job("excel_batch")
+    tracker.task = asyncio.create_task(_run_batch_job(
+        tracker, temp_path, file.filename, combined, dedup, incremental, selected_stages, resume, cost
+    ))
+    return {
+        "job_id": tracker.job_id,
+        "events_url": f"/api/jobs/{tracker.job_id}/events",
+        "result_url": f"/api/jobs/{tracker.job_id}/result"
+    }
@@ -0,0 +1,68 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+import asyncio
+import logging
+
+from api.excel_processor import iter_file
+from core.columnar_export import export_records, parse_format, EXPORT_FORMATS
+from core.process_excel import new_output_buffer, buffer_size
+from db.supabase_client import iter_sentiment_results, SUPABASE_ENABLED
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def _stored_record(row: dict) -> dict:
+    """A sentiment_analysis row joined with its stakeholder comment, as an export record"""
+    comment = row.get("stakeholder_comments") or {}
+    details = row.get("analysis_details") if isinstance(row.get("analysis_details"), dict) else {}
+    keywords = details.get("keywords")
+    if isinstance(keywords, str):
+        keywords = [keyword.strip() for keyword in keywords.split(",") if keyword.strip()]
+    return {
+        "comment_id": str(row.get("comment_id")),
+        "comment": comment.get("comment_text"),
+        "section_reference": comment.get("section_reference"),
+        "sentiment": row.get("sentiment_label"),
+        "sentiment_score": row.get("sentiment_score"),
+        "confidence": row.get("confidence_score"),
+        "keywords": keywords,
+        "summary": details.get("summary")
+    }
+
+def _write_stored(legislation_id: str, output, fmt: str) -> int:
+    return export_records((_stored_record(row) for row in iter_sentiment_results(legislation_id)), output, fmt)
+
+@router.get("/legislations/{legislation_id}/export")
+async def export_legislation(legislation_id: str, format: str = "parquet"):
+    """
+    Export the stored analysis results of a legislation's comments (comment,
+    section, sentiment label/score/confidence and any stored keywords and
+    summary) as a Parquet or Arrow IPC file, paged from Supabase and written
+    in row groups. Comments analysed more than once appear once, with their
+    latest analysis.
+    """
+    if not SUPABASE_ENABLED:
+        raise HTTPException(status_code=503, detail="Database storage is not configured")
+    try:
+        fmt = parse_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    output = new_output_buffer()
+    try:
+        rows = await asyncio.to_thread(_write_stored, legislation_id, output, fmt)
+    except ValueError as e:
+        output.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        output.close()
+        logger.error(f"Export failed for legislation {legislation_id}: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
+    extension, media_type = EXPORT_FORMATS[fmt]
+    headers = {
+        "Content-Disposition": f'attachment; filename="legislation_{legislation_id}{extension}"',
+        "Content-Length": str(buffer_size(output)),
+        "X-Row-Count": str(rows)
+    }
+    return StreamingResponse(iter_file(output), media_type=media_type, headers=headers)
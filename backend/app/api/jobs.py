@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+import asyncio
+import json
+import os
+
+from core.progress import get_job
+
+router = APIRouter()
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _get_job_or_404(job_id: str):
+    tracker = get_job(job_id)
+    if not tracker:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return tracker
+
+
+def _format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _get_job_or_404(job_id).snapshot()
+
+
+@router.get("/jobs/{job_id}/events", summary="Server-Sent Events stream of job progress")
+async def job_events(job_id: str, request: Request):
+    """
+    Emits a `progress` snapshot on connect, then a `row` event per completed
+    comment (with throughput, fallback counts and ETA) and a final `done` or
+    `error` event.
+    """
+    tracker = _get_job_or_404(job_id)
+
+    async def generate():
+        queue = tracker.subscribe()
+        try:
+            yield _format_event("progress", tracker.snapshot())
+            if tracker.finished:
+                yield _format_event("done" if tracker.status == "completed" else "error", tracker.snapshot())
+                return
+
+            while True:
+                if await request.is_disconnected():
+                    break
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _format_event(event, data)
+                if event in ("done", "error"):
+                    break
+        finally:
+            tracker.unsubscribe(queue)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    tracker = _get_job_or_404(job_id)
+
+    if tracker.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Job failed: {tracker.error}")
+    if tracker.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is still {tracker.status}")
+
+    if isinstance(tracker.result, str):
+        if not os.path.exists(tracker.result):
+            raise HTTPException(status_code=410, detail="Job output is no longer available")
+        return FileResponse(path=tracker.result, filename=tracker.filename, media_type=tracker.media_type)
+    if isinstance(tracker.result, bytes):
+        # Pre-serialised result body, e.g. a batch sentiment job
+        return Response(content=tracker.result, media_type=tracker.media_type)
+    return tracker.result
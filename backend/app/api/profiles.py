@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+
+from core.tracing import get_trace, TRACES
+
+router = APIRouter()
+
+@router.get("/profiles")
+async def list_profiles():
+    """
+    Recently recorded request traces. Send `X-Profile: 1` (or `?profile=1`)
+    with any request to record one; its id is returned in `X-Profile-Id`.
+    """
+    return {
+        "profiles": [
+            {"trace_id": trace.trace_id, "name": trace.name, "started_at": trace.wall_started, "spans": len(trace.events)}
+            for trace in reversed(TRACES.values())
+        ]
+    }
+
+@router.get("/profiles/{trace_id}")
+async def get_profile(trace_id: str):
+    """
+    Chrome trace-event JSON for a request. Open it in chrome://tracing,
+    Perfetto or speedscope.
+    """
+    trace = get_trace(trace_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail=f"Profile {trace_id} not found")
+    return JSONResponse(
+        trace.to_chrome_trace(),
+        headers={"Content-Disposition": f'attachment; filename="profile_{trace_id}.json"'}
+    )
@@ -0,0 +1,14 @@
+from fastapi.responses import JSONResponse
+
+from core.serialization import dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson (stdlib json when it isn't installed).
+    Used as the default response class of the result-heavy routers; return it
+    directly with plain dicts/lists to also skip FastAPI's jsonable_encoder pass.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,37 @@
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+import asyncio
+import logging
+
+from core.search_index import search_comments, SEARCH_MAX_LIMIT
+from core.metrics import SEARCH_QUERY_SECONDS
+from api.responses import FastJSONResponse
+
+router = APIRouter(default_response_class=FastJSONResponse)
+logger = logging.getLogger(__name__)
+
+@router.get("/search")
+async def search(
+    q: str = "",
+    sentiment: Optional[str] = None,
+    section: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    facets: bool = True
+):
+    """
+    Search analysed comments. Every word of `q` must appear in the comment or
+    its keywords (the last word also matches as a prefix); `sentiment` and
+    `section` (e.g. "4" or "Section 4") narrow the results. Returns the newest
+    matches first with the total count and, for result sets up to the facet
+    limit, counts per sentiment label and section.
+    """
+    if limit < 1 or limit > SEARCH_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+    try:
+        with SEARCH_QUERY_SECONDS.time():
+            results = await asyncio.to_thread(search_comments, q, sentiment, section, limit, offset, facets)
+    except Exception as e:
+        logger.error(f"Search failed: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    return FastJSONResponse(results)
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+import asyncio
+import logging
+
+from core.section_analytics import partition_by_section, cached_sections, analyze_sections, section_key, SECTION_STAGES
+from core.admission import get_controller
+from api.responses import FastJSONResponse
+from db.supabase_client import get_all_comments, SUPABASE_ENABLED
+
+router = APIRouter(default_response_class=FastJSONResponse)
+logger = logging.getLogger(__name__)
+
+MAX_TOP_KEYWORDS = 50
+
+@router.get("/legislations/{legislation_id}/sections")
+async def section_analytics(legislation_id: str, section: Optional[str] = None, top_n: int = 10, refresh: bool = False):
+    """
+    Per-section view of a legislation's stakeholder comments: sentiment
+    distribution, top keywords and a summary for each section_reference.
+    Sections are analysed concurrently and cached; a section is only
+    recomputed once its comments change. `section` restricts the view to one
+    section and `refresh` ignores cached results.
+    """
+    if not SUPABASE_ENABLED:
+        raise HTTPException(status_code=503, detail="Database storage is not configured")
+    if top_n < 1 or top_n > MAX_TOP_KEYWORDS:
+        raise HTTPException(status_code=400, detail=f"top_n must be between 1 and {MAX_TOP_KEYWORDS}")
+
+    try:
+        comments = await asyncio.to_thread(get_all_comments, legislation_id)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Failed to load comments: {str(e)}")
+
+    sections = partition_by_section(comments)
+    if section is not None:
+        sections = [s for s in sections if s.key == section_key(section)]
+        if not sections:
+            raise HTTPException(status_code=404, detail=f"No comments found for section '{section}'")
+
+    cached = {} if refresh else await asyncio.to_thread(cached_sections, legislation_id, sections, top_n)
+    stale = [s for s in sections if s.key not in cached]
+
+    computed = {}
+    if stale:
+        cost = sum(len(s.comments) for s in stale) * len(SECTION_STAGES)
+        async with get_controller("analyze").admit(cost):
+            try:
+                computed = await analyze_sections(legislation_id, stale, top_n=top_n)
+            except Exception as e:
+                logger.error(f"Section analytics failed for legislation {legislation_id}: {str(e)}", exc_info=True)
+                raise HTTPException(status_code=500, detail=f"Section analytics failed: {str(e)}")
+
+    results = []
+    for s in sections:
+        result = dict(cached[s.key]) if s.key in cached else dict(computed[s.key])
+        result["cached"] = s.key in cached
+        results.append(result)
+
+    return FastJSONResponse({
+        "legislation_id": legislation_id,
+        "comment_count": sum(len(s.comments) for s in sections),
+        "sections_recomputed": len(stale),
+        "sections": results
+    })
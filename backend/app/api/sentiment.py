@@ -1,52 +1,256 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import AsyncIterator, Dict, Optional, List
 from core.sentiment_model import analyze_sentiment, store_results, analyze_sentiment_vader
+from core.dedup import cluster_comments, cluster_sizes, DEDUP_ENABLED
+from core.progress import ProgressTracker, create_job, current_tracker
+from core.result_table import ResultTable
+from core.serialization import dumps
+from core.admission import get_controller
+from core.search_index import index_comments, SEARCH_INDEX_ENABLED
+from api.streaming import DuplexStreamingResponse, track_body
+from api.responses import FastJSONResponse
+from core.stream_input import detect_format, iter_records
+import asyncio
 import logging
+import os
 import socket
 import httpx
+import numpy as np
 
-router = APIRouter()
+router = APIRouter(default_response_class=FastJSONResponse)
 logger = logging.getLogger(__name__)
 
+# Streaming ingestion: comments are read and analysed this many at a time
+SENTIMENT_STREAM_CHUNK = int(os.getenv("SENTIMENT_STREAM_CHUNK", "256"))
+SENTIMENT_STREAM_MAX_CHUNK = 5000
+SENTIMENT_STREAM_CONCURRENCY = int(os.getenv("SENTIMENT_STREAM_CONCURRENCY", "8"))
+
 class CommentRequest(BaseModel):
     comment_id: str
     text: str
 
 class BatchCommentsRequest(BaseModel):
     comments: List[CommentRequest]
+    dedup: bool = DEDUP_ENABLED
+    # Return parallel arrays (one per field) instead of a list of result objects
+    compact: bool = False
+
+def _sentiment_record(comment_id: str, table: ResultTable, rep: int, cluster_id: str, size: int) -> dict:
+    row = table.row(rep, ("sentiment", "sentiment_score", "confidence"))
+    return {
+        "comment_id": comment_id,
+        "sentiment_label": row.get("sentiment"),
+        "sentiment_score": row.get("sentiment_score"),
+        "confidence_score": row.get("confidence"),
+        "cluster_id": cluster_id,
+        "cluster_size": size
+    }
+
+def _sentiment_columns(comment_ids: List[str], table: ResultTable, rep_of: List[int], sizes: List[int]) -> dict:
+    """The fields of _sentiment_record as parallel arrays, read straight from the table's columns"""
+    rows = np.asarray(rep_of, dtype=np.int64)
+    return {
+        "comment_id": comment_ids,
+        "sentiment_label": [table.labels[code] if code >= 0 else None for code in table.label_codes[rows].tolist()],
+        "sentiment_score": [None if value != value else value for value in table.column("sentiment_score", rows).tolist()],
+        "confidence_score": [None if value != value else value for value in table.column("confidence", rows).tolist()],
+        "cluster_id": [comment_ids[rep] for rep in rep_of],
+        "cluster_size": sizes
+    }
+
+async def _analyse_text(text: str):
+    try:
+        return await analyze_sentiment(text)
+    except (socket.gaierror, ConnectionError, httpx.ConnectError, httpx.ConnectTimeout) as network_err:
+        logger.warning(f"Network error encountered, using VADER fallback: {str(network_err)}")
+        return analyze_sentiment_vader(text)
+
+async def run_sentiment_batch(request: BatchCommentsRequest, progress: Optional[ProgressTracker] = None) -> bytes:
+    """
+    Analyse a batch of comments, reporting per-comment completion to an optional
+    tracker. Results are kept in a columnar ResultTable and only serialised to
+    the `{"results": [...]}` JSON body at the end; with `compact`, `results`
+    holds one array per field instead.
+    """
+    texts = [comment.text for comment in request.comments]
+    rep_of = cluster_comments(texts) if request.dedup else list(range(len(texts)))
+    sizes = cluster_sizes(rep_of)
+    table = ResultTable(len(texts))
+
+    if progress:
+        progress.start(total=len(texts))
+
+    # Analyse each cluster representative once
+    for idx in sorted(set(rep_of)):
+        label, score, confidence = await _analyse_text(texts[idx])
+        table.set(idx, {"sentiment": label, "sentiment_score": score, "confidence": confidence})
+
+        if progress:
+            progress.row_done(request.comments[idx].comment_id, {
+                "sentiment_label": label,
+                "sentiment_score": score,
+                "confidence_score": confidence
+            }, count=sizes[idx])
+
+    for comment, rep in zip(request.comments, rep_of):
+        row = table.row(rep, ("sentiment", "sentiment_score", "confidence"))
+        store_results(
+            comment_id=comment.comment_id,
+            sentiment_score=row["sentiment_score"],
+            sentiment_label=row["sentiment"],
+            confidence_score=row["confidence"]
+        )
+
+    if SEARCH_INDEX_ENABLED:
+        await asyncio.to_thread(index_comments, _search_records(request.comments, table, rep_of), "sentiment")
+
+    comment_ids = [comment.comment_id for comment in request.comments]
+    columns = _sentiment_columns(comment_ids, table, rep_of, sizes)
+    if not request.dedup:
+        # Only deduplicated results carry the cluster fields
+        del columns["cluster_id"], columns["cluster_size"]
+    if request.compact:
+        return dumps({"results": columns})
+    # Zipping the columns back into records is several times faster than a table.row() per comment
+    fields = list(columns)
+    return dumps({"results": [dict(zip(fields, values)) for values in zip(*columns.values())]})
+
+def _search_records(comments, table: ResultTable, rep_of: List[int]):
+    for comment, rep in zip(comments, rep_of):
+        row = table.row(rep, ("sentiment", "sentiment_score"))
+        yield {"comment_id": comment.comment_id, "comment": comment.text, **row}
 
 @router.post("/sentiment")
 async def sentiment_analysis(request: BatchCommentsRequest):
     """
     API endpoint for batch sentiment analysis of comments.
     """
-    results = []
+    async with get_controller("sentiment").admit(len(request.comments)):
+        try:
+            body = await run_sentiment_batch(request)
+            return Response(content=body, media_type="application/json")
+        
+        except Exception as e:
+            logger.error(f"Sentiment analysis failed: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Sentiment analysis failed: {str(e)}")
+
+async def _analyse_chunk(records: List[Dict], dedup: bool) -> List[dict]:
+    """Analyse one chunk of streamed comments; duplicates are clustered within the chunk"""
+    results = [None] * len(records)
+    valid = []
+    for pos, record in enumerate(records):
+        comment_id = record.get("comment_id")
+        text = record.get("text")
+        if comment_id is None or not isinstance(text, str):
+            results[pos] = {"comment_id": comment_id, "error": "Each comment needs a 'comment_id' and a string 'text'"}
+        else:
+            valid.append((pos, str(comment_id), text))
+
+    texts = [text for _, _, text in valid]
+    rep_of = cluster_comments(texts) if dedup else list(range(len(texts)))
+    sizes = cluster_sizes(rep_of)
+    reps = sorted(set(rep_of))
+    table = ResultTable(len(texts))
+
+    semaphore = asyncio.Semaphore(SENTIMENT_STREAM_CONCURRENCY)
+
+    async def analyse(idx):
+        async with semaphore:
+            label, score, confidence = await _analyse_text(texts[idx])
+        table.set(idx, {"sentiment": label, "sentiment_score": score, "confidence": confidence})
+
+    await asyncio.gather(*(analyse(idx) for idx in reps))
+
+    for (pos, comment_id, _), rep, size in zip(valid, rep_of, sizes):
+        results[pos] = _sentiment_record(comment_id, table, rep, valid[rep][1], size)
+        if not dedup:
+            del results[pos]["cluster_id"], results[pos]["cluster_size"]
+        store_results(
+            comment_id=comment_id,
+            sentiment_score=results[pos]["sentiment_score"],
+            sentiment_label=results[pos]["sentiment_label"],
+            confidence_score=results[pos]["confidence_score"]
+        )
+    if SEARCH_INDEX_ENABLED:
+        await asyncio.to_thread(index_comments, [
+            {"comment_id": comment_id, "comment": text, **table.row(rep, ("sentiment", "sentiment_score"))}
+            for (_, comment_id, text), rep in zip(valid, rep_of)
+        ], "sentiment")
+    return results
+
+async def iter_sentiment_results(records: AsyncIterator[Dict], dedup: bool = DEDUP_ENABLED,
+                                 chunk_size: int = SENTIMENT_STREAM_CHUNK) -> AsyncIterator[dict]:
+    """
+    Analyse a stream of {comment_id, text} records in bounded chunks, yielding
+    results in input order. Input is only read one chunk ahead of the output.
+    """
+    chunk = []
+    async for record in records:
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            for result in await _analyse_chunk(chunk, dedup):
+                yield result
+            chunk = []
+    if chunk:
+        for result in await _analyse_chunk(chunk, dedup):
+            yield result
+
+@router.post("/sentiment/stream", summary="Stream sentiment results for a large JSON or NDJSON batch")
+async def sentiment_stream(
+    request: Request,
+    format: Optional[str] = None,
+    dedup: bool = DEDUP_ENABLED,
+    chunk_size: int = SENTIMENT_STREAM_CHUNK
+):
+    """
+    Accepts the same body as /sentiment (`{"comments": [...]}`), a bare JSON
+    array of comments, or NDJSON with one comment per line. The body is parsed
+    incrementally and results are streamed back as NDJSON in input order, so
+    memory stays flat regardless of batch size. Duplicate clustering applies
+    within each chunk; set `dedup` as a query parameter.
+    """
+    fmt = format or detect_format(request.headers.get("content-type")) or "json"
+    if fmt not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="Only JSON or NDJSON input is accepted. Use ?format=json|ndjson or a matching Content-Type.")
+    chunk_size = min(max(1, chunk_size), SENTIMENT_STREAM_MAX_CHUNK)
+    body_read = asyncio.Event()
+    records = iter_records(track_body(request.stream(), body_read), fmt, key="comments")
+
+    async def generate():
+        try:
+            async for result in iter_sentiment_results(records, dedup, chunk_size):
+                yield dumps(result) + b"\n"
+        except ValueError as e:
+            # Headers are already sent, so report malformed input in-band
+            logger.warning(f"Sentiment stream stopped: {str(e)}")
+            yield dumps({"error": str(e)}) + b"\n"
+
+    return DuplexStreamingResponse(generate(), media_type="application/x-ndjson", body_read=body_read)
+
+async def _run_sentiment_job(tracker: ProgressTracker, request: BatchCommentsRequest):
+    current_tracker.set(tracker)
     try:
-        for comment in request.comments:
-            try:
-                label, score, confidence = await analyze_sentiment(comment.text)
-
-            except (socket.gaierror, ConnectionError, httpx.ConnectError, httpx.ConnectTimeout) as network_err:
-                logger.warning(f"Network error encountered, using VADER fallback: {str(network_err)}")
-                label, score, confidence = analyze_sentiment_vader(comment.text)
-            
-            results.append({
-                "comment_id": comment.comment_id,
-                "sentiment_label": label,
-                "sentiment_score": score,
-                "confidence_score": confidence
-            })
-            
-            store_results(
-                comment_id=comment.comment_id,
-                sentiment_score=score,
-                sentiment_label=label,
-                confidence_score=confidence
-            )
-                
-        return {"results": results}
-    
+        # Queued jobs wait for capacity instead of timing out
+        async with get_controller("sentiment").admit(len(request.comments), timeout=None):
+            body = await run_sentiment_batch(request, progress=tracker)
+        tracker.finish(result=body, media_type="application/json")
     except Exception as e:
-        logger.error(f"Sentiment analysis failed: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Sentiment analysis failed: {str(e)}")
\ No newline at end of file
+        logger.error(f"Sentiment job {tracker.job_id} failed: {str(e)}", exc_info=True)
+        tracker.fail(str(e))
+
+@router.post("/sentiment/jobs")
+async def start_sentiment_job(request: BatchCommentsRequest):
+    """
+    Start batch sentiment analysis in the background. Progress is available as
+    Server-Sent Events from the returned events_url and the final results from result_url.
+    """
+    get_controller("sentiment").check()
+    tracker = create_job("sentiment")
+    tracker.task = asyncio.create_task(_run_sentiment_job(tracker, request))
+    return {
+        "job_id": tracker.job_id,
+        "events_url": f"/api/jobs/{tracker.job_id}/events",
+        "result_url": f"/api/jobs/{tracker.job_id}/result"
+    }
@@ -0,0 +1,86 @@
+from fastapi import APIRouter, Request, HTTPException
+from starlette.datastructures import UploadFile
+from typing import Optional
+import asyncio
+import logging
+
+from api.streaming import DuplexStreamingResponse, track_body
+from core.stream_input import detect_format, iter_records
+from core.process_stream import process_records, DEFAULT_STREAM_CONCURRENCY, DEFAULT_STREAM_STAGES, MAX_STREAM_CONCURRENCY
+from core.admission import get_controller, Overloaded
+from core.process_excel import parse_stages
+from core.serialization import dumps
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def _iter_upload(upload: UploadFile):
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+@router.post("/process-stream", summary="Stream per-comment results for a CSV or NDJSON upload")
+async def process_stream(
+    request: Request,
+    format: Optional[str] = None,
+    concurrency: int = DEFAULT_STREAM_CONCURRENCY,
+    include_wordcloud: bool = False,
+    stages: Optional[str] = None
+):
+    """
+    Accepts either a multipart upload (field `file`) or a raw/chunked request
+    body in CSV or NDJSON form, each row carrying `comment_id` and `comment`.
+    Results are streamed back as NDJSON, one line per row as soon as it completes.
+    `stages` selects a comma-separated subset of keywords,sentiment,summary,wordcloud.
+    `concurrency` is capped at STREAM_MAX_CONCURRENCY, and each stream holds
+    its rows in flight x stages of the stream admission budget until it ends.
+    """
+    try:
+        selected = parse_stages(stages) if stages else DEFAULT_STREAM_STAGES
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if include_wordcloud:
+        selected = parse_stages(selected + ("wordcloud",))
+    concurrency = min(max(1, concurrency), MAX_STREAM_CONCURRENCY)
+    get_controller("stream").check()
+
+    content_type = request.headers.get("content-type", "")
+    body_read = asyncio.Event()
+
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if not isinstance(upload, UploadFile):
+            raise HTTPException(status_code=400, detail="No file provided")
+        fmt = format or detect_format(upload.content_type, upload.filename)
+        chunks = _iter_upload(upload)
+        # The form was read up front, so disconnects can be watched from the start
+        body_read.set()
+    else:
+        fmt = format or detect_format(content_type)
+        chunks = track_body(request.stream(), body_read)
+
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=400,
+            detail="Only CSV or NDJSON input is accepted. Set a .csv/.ndjson filename, a matching Content-Type, or ?format=csv|ndjson."
+        )
+
+    async def generate():
+        try:
+            # Streams are long-lived, so a saturated server delays this one rather than timing it out
+            async with get_controller("stream").admit(concurrency * len(selected), timeout=None):
+                async for result in process_records(iter_records(chunks, fmt), concurrency, selected):
+                    yield dumps(result) + b"\n"
+        except (ValueError, Overloaded) as e:
+            # Headers are already sent, so report malformed input or a full queue in-band
+            logger.warning(f"Stream processing stopped: {str(e)}")
+            yield dumps({"error": str(e)}) + b"\n"
+
+    return DuplexStreamingResponse(generate(), media_type="application/x-ndjson", body_read=body_read)
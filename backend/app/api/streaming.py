@@ -0,0 +1,67 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+
+async def track_body(chunks: AsyncIterator[bytes], body_read: asyncio.Event) -> AsyncIterator[bytes]:
+    """
+    Pass request body chunks through, setting `body_read` as soon as the last
+    one has arrived. Reads one chunk ahead: the parser may take a long time
+    over the final chunk, and disconnects should be watched during that time.
+    """
+    pending = None
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        if pending is not None:
+            yield pending
+        pending = chunk
+    body_read.set()
+    if pending is not None:
+        yield pending
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for endpoints whose body generator keeps reading the
+    request body while results stream out. The stock response listens for
+    client disconnects by calling receive(), which on ASGI servers below spec
+    2.4 swallows request body messages the generator is waiting for. While
+    the body is being read, disconnects surface as ClientDisconnect from
+    request.stream(); once `body_read` is set (see track_body, or set it up
+    front when the body was read before streaming) the response listens for
+    the disconnect itself and cancels the generator, so an abandoned client
+    doesn't leave the pipeline running to the end.
+    """
+
+    def __init__(self, content, *args, body_read: Optional[asyncio.Event] = None, **kwargs):
+        super().__init__(content, *args, **kwargs)
+        self.body_read = body_read
+
+    async def _wait_for_disconnect(self, receive):
+        await self.body_read.wait()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    async def __call__(self, scope, receive, send):
+        if self.body_read is None:
+            await self.stream_response(send)
+        else:
+            streaming = asyncio.ensure_future(self.stream_response(send))
+            watcher = asyncio.ensure_future(self._wait_for_disconnect(receive))
+            try:
+                await asyncio.wait((streaming, watcher), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                watcher.cancel()
+                if not streaming.done():
+                    # Client went away: cancelling the generator stops its pending rows
+                    streaming.cancel()
+                    await asyncio.gather(streaming, return_exceptions=True)
+            if streaming.cancelled():
+                return
+            streaming.result()
+        if self.background is not None:
+            await self.background()
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from core.summariser_model import generate_summary
+from core.summariser_model import generate_summary, HF_SUMMARIZER_MAX_TOKENS
+from core.chunking import estimate_tokens
+from core.admission import get_controller
 
 router = APIRouter()
 
@@ -11,25 +13,28 @@ class SummarizeRequest(BaseModel):
 
 @router.post("/summarise")
 async def summarise_text(request: SummarizeRequest):
-    try:
-        input_length = len(request.text.split())
+    # Cost is the number of model chunks the text will be split into
+    cost = 1 + estimate_tokens(request.text) // HF_SUMMARIZER_MAX_TOKENS
+    async with get_controller("summarise").admit(cost):
+        try:
+            input_length = len(request.text.split())
 
-        if input_length < 40:  
-            max_len = 40
-            min_len = 5
-        else:  
-            max_len = request.max_length
-            min_len = request.min_length
+            if input_length < 40:  
+                max_len = 40
+                min_len = 5
+            else:  
+                max_len = request.max_length
+                min_len = request.min_length
 
-        summary = await generate_summary(
-            request.text,
-            max_length=max_len,
-            min_length=min_len
-        )
-        return {"summary": summary}
+            summary = await generate_summary(
+                request.text,
+                max_length=max_len,
+                min_length=min_len
+            )
+            return {"summary": summary}
 
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Summarization failed: {str(e)}")
 
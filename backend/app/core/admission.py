@@ -0,0 +1,157 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from core.metrics import ADMISSION_IN_FLIGHT_COST, ADMISSION_QUEUE_DEPTH, ADMISSION_QUEUE_WAIT_SECONDS, ADMISSION_REJECTED_TOTAL
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Interactive requests give up and get a 429 after waiting this long; background jobs wait indefinitely
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+RETRY_AFTER_MIN_SECONDS = 1
+RETRY_AFTER_MAX_SECONDS = 300
+
+
+class Overloaded(Exception):
+    """Raised when an endpoint is saturated; main.py turns it into a 429 with Retry-After"""
+
+    def __init__(self, endpoint: str, retry_after: int):
+        super().__init__(f"The {endpoint} endpoint is busy. Please retry in {retry_after} seconds.")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Cost-based concurrency limit for one endpoint. A request is admitted while
+    the cost already running plus its own stays within `max_cost`; others wait
+    in FIFO order, up to `max_queue` of them. A request costing more than
+    `max_cost` on its own runs once nothing else is in flight.
+    """
+
+    def __init__(self, name: str, max_cost: float, max_queue: int):
+        self.name = name
+        self.max_cost = max_cost
+        self.max_queue = max_queue
+        self.in_flight = 0.0
+        self._waiters = deque()
+        # Running estimate of seconds per unit of cost, used for Retry-After
+        self._seconds_per_unit: Optional[float] = None
+
+    @property
+    def queued_cost(self) -> float:
+        return sum(cost for cost, _ in self._waiters)
+
+    def retry_after(self) -> int:
+        if not self._seconds_per_unit:
+            return 5
+        backlog = self.in_flight + self.queued_cost
+        seconds = backlog * self._seconds_per_unit / self.max_cost
+        return int(min(RETRY_AFTER_MAX_SECONDS, max(RETRY_AFTER_MIN_SECONDS, math.ceil(seconds))))
+
+    def _reject(self, reason: str):
+        ADMISSION_REJECTED_TOTAL.inc(endpoint=self.name, reason=reason)
+        raise Overloaded(self.name, self.retry_after())
+
+    def check(self):
+        """Fail fast with Overloaded if the queue is full; used before starting background jobs"""
+        if ADMISSION_ENABLED and len(self._waiters) >= self.max_queue:
+            self._reject("queue_full")
+
+    def _fits(self, cost: float) -> bool:
+        return self.in_flight == 0 or self.in_flight + cost <= self.max_cost
+
+    def _grant(self):
+        while self._waiters:
+            cost, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(cost):
+                break
+            self._waiters.popleft()
+            self.in_flight += cost
+            future.set_result(None)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters), endpoint=self.name)
+        ADMISSION_IN_FLIGHT_COST.set(self.in_flight, endpoint=self.name)
+
+    def _release(self, cost: float, elapsed: float):
+        self.in_flight = max(0.0, self.in_flight - cost)
+        per_unit = elapsed / cost
+        if self._seconds_per_unit is None:
+            self._seconds_per_unit = per_unit
+        else:
+            self._seconds_per_unit = 0.8 * self._seconds_per_unit + 0.2 * per_unit
+        self._grant()
+
+    @asynccontextmanager
+    async def admit(self, cost: float, timeout: Optional[float] = ADMISSION_MAX_WAIT_SECONDS):
+        """
+        Hold `cost` units of this endpoint's capacity for the duration of the
+        block, queueing if necessary. Raises Overloaded if the queue is full or
+        the wait exceeds `timeout` (None waits indefinitely).
+        """
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        cost = max(1.0, float(cost))
+        started = time.perf_counter()
+        if not self._waiters and self._fits(cost):
+            self.in_flight += cost
+            ADMISSION_IN_FLIGHT_COST.set(self.in_flight, endpoint=self.name)
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self._reject("queue_full")
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append((cost, future))
+            ADMISSION_QUEUE_DEPTH.set(len(self._waiters), endpoint=self.name)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if future.done() and not future.cancelled():
+                    # Granted just as the caller gave up: hand the capacity back
+                    self.in_flight -= cost
+                elif (cost, future) in self._waiters:
+                    self._waiters.remove((cost, future))
+                future.cancel()
+                self._grant()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self._reject("timeout")
+        waited = time.perf_counter() - started
+        ADMISSION_QUEUE_WAIT_SECONDS.observe(waited, endpoint=self.name)
+
+        run_started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(cost, time.perf_counter() - run_started)
+
+
+def _limit(name: str, setting: str, default: float) -> float:
+    return float(os.getenv(f"ADMISSION_{name.upper()}_{setting}", str(default)))
+
+
+# Per-endpoint limits. Costs are rows x selected stages for Excel and
+# combined analysis, rows in flight x selected stages for streams, comments
+# for sentiment batches and text chunks for summaries. Limits are per
+# worker process.
+_DEFAULTS = {
+    "excel": (20000, 8),
+    "analyze": (2000, 16),
+    "stream": (1000, 16),
+    "sentiment": (5000, 32),
+    "summarise": (16, 64)
+}
+
+CONTROLLERS: Dict[str, AdmissionController] = {
+    name: AdmissionController(name, _limit(name, "MAX_COST", max_cost), int(_limit(name, "MAX_QUEUE", max_queue)))
+    for name, (max_cost, max_queue) in _DEFAULTS.items()
+}
+
+
+def get_controller(name: str) -> AdmissionController:
+    return CONTROLLERS[name]
@@ -0,0 +1,161 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() in ("1", "true", "yes")
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", os.path.join("outputs", "checkpoints.db"))
+# Pending rows are written out once this many have completed or this much time has passed
+CHECKPOINT_BATCH = int(os.getenv("CHECKPOINT_BATCH", "200"))
+CHECKPOINT_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_INTERVAL_SECONDS", "30"))
+# Checkpoints of runs that were never retried are dropped after this long
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(7 * 24 * 3600)))
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of an input file's bytes, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _connect() -> sqlite3.Connection:
+    directory = os.path.dirname(CHECKPOINT_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(CHECKPOINT_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS row_checkpoints ("
+        " input_hash TEXT NOT NULL,"
+        " sheet TEXT NOT NULL,"
+        " fingerprint TEXT NOT NULL,"
+        " comment_id TEXT,"
+        " data TEXT NOT NULL,"
+        " wordcloud BLOB,"
+        " updated_at REAL NOT NULL,"
+        " PRIMARY KEY (input_hash, sheet, fingerprint))"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS row_checkpoints_updated ON row_checkpoints (updated_at)")
+    return conn
+
+
+class Checkpoint:
+    """
+    Per-row results of one run over an input file, keyed by the file's hash,
+    the sheet and the row fingerprint (comment_id + text). Completed rows are
+    buffered and written to SQLite periodically, so a run that dies midway
+    can be retried with the same file and only process the remaining rows.
+    The checkpoint is cleared once the output has been written.
+    """
+
+    def __init__(self, input_hash: str):
+        self.input_hash = input_hash
+        self._pending: List[Tuple] = []
+        self._last_flush = time.monotonic()
+        self._prune()
+
+    @classmethod
+    def for_file(cls, path: str) -> "Checkpoint":
+        return cls(file_hash(path))
+
+    def _prune(self):
+        try:
+            conn = _connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM row_checkpoints WHERE updated_at < ?",
+                                 (time.time() - CHECKPOINT_TTL_SECONDS,))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Checkpoint pruning failed: {str(e)}")
+
+    def load(self, sheet: str) -> Dict[str, Dict]:
+        """Checkpointed results of one sheet by row fingerprint; word clouds come back base64-encoded"""
+        found = {}
+        try:
+            conn = _connect()
+            try:
+                rows = conn.execute(
+                    "SELECT fingerprint, data, wordcloud FROM row_checkpoints WHERE input_hash = ? AND sheet = ?",
+                    (self.input_hash, sheet)
+                )
+                for fingerprint, data, wordcloud in rows:
+                    result = json.loads(data)
+                    if wordcloud is not None:
+                        result["wordcloud"] = base64.b64encode(wordcloud).decode("utf-8")
+                    found[fingerprint] = result
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Checkpoint lookup failed: {str(e)} - processing all rows")
+            return {}
+        return found
+
+    async def add(self, sheet: str, fingerprint: str, comment_id, result: Dict):
+        """
+        Record one completed row, flushing in a worker thread if a batch is full
+        or the interval has passed. load, flush and clear are blocking SQLite
+        calls; callers on the event loop run them with asyncio.to_thread.
+        """
+        data = {k: v for k, v in result.items() if k != "wordcloud"}
+        wordcloud = result.get("wordcloud")
+        self._pending.append((
+            self.input_hash,
+            sheet,
+            fingerprint,
+            str(comment_id),
+            json.dumps(data, default=str),
+            base64.b64decode(wordcloud) if wordcloud else None
+        ))
+        if (len(self._pending) >= CHECKPOINT_BATCH
+                or time.monotonic() - self._last_flush >= CHECKPOINT_INTERVAL_SECONDS):
+            await asyncio.to_thread(self.flush)
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        # Swapped out first: rows added on the event loop while this runs in a thread go to the next flush
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        now = time.time()
+        records = [record + (now,) for record in pending]
+        try:
+            conn = _connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO row_checkpoints"
+                        " (input_hash, sheet, fingerprint, comment_id, data, wordcloud, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        records
+                    )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to write checkpoint: {str(e)}")
+
+    def clear(self):
+        """Drop this run's checkpoint once its output exists"""
+        self._pending = []
+        try:
+            conn = _connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM row_checkpoints WHERE input_hash = ?", (self.input_hash,))
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Failed to clear checkpoint: {str(e)}")
@@ -0,0 +1,59 @@
+import re
+from typing import List
+
+# Rough sub-word token estimate: BERT/BART style tokenizers split long or rare
+# words into several pieces, so each word costs 1 token plus one per 8 chars.
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of model tokens in text"""
+    if not text:
+        return 0
+    return sum(1 + (len(piece) - 1) // 8 for piece in _PIECE_RE.findall(text))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+
+
+def _split_long_sentence(sentence: str, max_tokens: int) -> List[str]:
+    chunks, current, current_tokens = [], [], 0
+    for word in sentence.split():
+        word_tokens = estimate_tokens(word)
+        if current and current_tokens + word_tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def split_text(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens estimated tokens, packing
+    whole sentences where possible. Short texts are returned as a single chunk.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    chunks, current, current_tokens = [], [], 0
+    for sentence in split_sentences(text):
+        sentence_tokens = estimate_tokens(sentence)
+        if sentence_tokens > max_tokens:
+            if current:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_long_sentence(sentence, max_tokens))
+            continue
+        if current and current_tokens + sentence_tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += sentence_tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
@@ -0,0 +1,174 @@
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for Parquet/Arrow exports
+    pa = None
+
+from core.tracing import span
+
+# Rows per Parquet row group / Arrow record batch; one group is built in memory at a time
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "50000"))
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+# Arrow IPC buffer compression (zstd or lz4); empty for uncompressed, memory-mappable files
+ARROW_COMPRESSION = os.getenv("ARROW_COMPRESSION", "zstd") or None
+
+EXPORT_FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file")
+}
+
+EXPORT_COLUMNS = ("sheet", "comment_id", "comment", "section_reference", "cluster_id", "cluster_size",
+                  "sentiment", "sentiment_score", "confidence", "keywords", "summary", "wordcloud_ref")
+
+
+def parse_format(fmt: Optional[str]) -> str:
+    fmt = (fmt or "parquet").lower().lstrip(".")
+    if fmt == "ipc":
+        fmt = "arrow"
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Valid formats are: {', '.join(EXPORT_FORMATS)}")
+    return fmt
+
+
+def export_schema(images: bool = False) -> "pa.Schema":
+    fields = [
+        pa.field("sheet", pa.string()),
+        pa.field("comment_id", pa.string()),
+        pa.field("comment", pa.string()),
+        pa.field("section_reference", pa.string()),
+        pa.field("cluster_id", pa.string()),
+        pa.field("cluster_size", pa.int32()),
+        pa.field("sentiment", pa.dictionary(pa.int16(), pa.string())),
+        pa.field("sentiment_score", pa.float32()),
+        pa.field("confidence", pa.float32()),
+        pa.field("keywords", pa.list_(pa.string())),
+        pa.field("summary", pa.string()),
+        # "<sheet>/<cluster_id>.png"; rows of one cluster share an image
+        pa.field("wordcloud_ref", pa.string())
+    ]
+    if images:
+        # PNG bytes on the cluster representative's row only, null elsewhere
+        fields.append(pa.field("wordcloud", pa.binary()))
+    return pa.schema(fields)
+
+
+class ColumnarWriter:
+    """
+    Streams column batches to a Parquet file (one row group per batch) or an
+    Arrow IPC file (one record batch per batch), so only the batch being
+    written is held in memory.
+    """
+
+    def __init__(self, sink, fmt: str = "parquet", images: bool = False):
+        if pa is None:
+            raise ValueError("Parquet/Arrow export requires pyarrow, which is not installed")
+        self.format = parse_format(fmt)
+        self.schema = export_schema(images)
+        self.rows = 0
+        if self.format == "parquet":
+            self._writer = pq.ParquetWriter(sink, self.schema, compression=PARQUET_COMPRESSION)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=ARROW_COMPRESSION) if ARROW_COMPRESSION else None
+            self._writer = pa.ipc.new_file(sink, self.schema, options=options)
+
+    def write(self, columns: Dict[str, list]):
+        batch = pa.RecordBatch.from_pydict({name: columns.get(name) for name in self.schema.names}, schema=self.schema)
+        if self.format == "parquet":
+            self._writer.write_batch(batch, row_group_size=batch.num_rows)
+        else:
+            self._writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _text(value) -> Optional[str]:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    return str(value)
+
+
+def _sheet_batches(name: str, df, table, rep_of: List[int], images: bool) -> Iterator[Dict[str, list]]:
+    """Row groups of one analysed sheet, read straight from its ResultTable"""
+    rep_of = np.asarray(rep_of, dtype=np.int64)
+    comment_ids = [_text(value) for value in df["comment_id"]]
+    comments = [_text(value) for value in df["comment"]]
+    sections = [_text(value) for value in df["section_reference"]] if "section_reference" in df.columns else None
+    sizes = df["cluster_size"].to_numpy(dtype=np.int32) if "cluster_size" in df.columns else np.ones(len(df), dtype=np.int32)
+    keywords = {}
+
+    for start in range(0, len(df), EXPORT_ROW_GROUP_SIZE):
+        stop = min(start + EXPORT_ROW_GROUP_SIZE, len(df))
+        reps = rep_of[start:stop]
+        for rep in np.unique(reps):
+            if rep not in keywords:
+                keywords[rep] = table.keywords(rep)
+
+        scores = table.scores[reps]
+        confidence = table.confidence[reps]
+        columns = {
+            "sheet": [name] * (stop - start),
+            "comment_id": comment_ids[start:stop],
+            "comment": comments[start:stop],
+            "section_reference": sections[start:stop] if sections else [None] * (stop - start),
+            "cluster_id": [comment_ids[rep] for rep in reps],
+            "cluster_size": sizes[start:stop],
+            "sentiment": pa.DictionaryArray.from_arrays(
+                pa.array(table.label_codes[reps], type=pa.int16(), mask=table.label_codes[reps] < 0),
+                pa.array(table.labels, type=pa.string())
+            ),
+            "sentiment_score": pa.array(scores, mask=np.isnan(scores)),
+            "confidence": pa.array(confidence, mask=np.isnan(confidence)),
+            "keywords": [keywords[rep] for rep in reps],
+            "summary": [table.summaries[rep] for rep in reps],
+            "wordcloud_ref": [f"{name}/{comment_ids[rep]}.png" if table.image_offset[rep] >= 0 else None for rep in reps]
+        }
+        if images:
+            columns["wordcloud"] = [table.image(rep) if rep == row else None for row, rep in enumerate(reps, start=start)]
+        yield columns
+
+
+def write_export(sheets: List[Tuple], output, fmt: str = "parquet", images: bool = False) -> int:
+    """
+    Write analysed sheets, as returned by analyze_sheets, as one Parquet or
+    Arrow IPC file with a row per comment. Passed-through sheets are skipped.
+    Word clouds are referenced by cluster; `images` also embeds their PNGs.
+    Returns the number of rows written.
+    """
+    with span("export.write", format=fmt), ColumnarWriter(output, fmt, images) as writer:
+        for name, df, table, rep_of in sheets:
+            if table is None:
+                continue
+            for columns in _sheet_batches(name, df, table, rep_of, images):
+                writer.write(columns)
+    return writer.rows
+
+
+def export_records(records: Iterable[Dict], output, fmt: str = "parquet") -> int:
+    """
+    Write result dicts keyed by EXPORT_COLUMNS (e.g. rows loaded from
+    Supabase) in row groups of EXPORT_ROW_GROUP_SIZE. Returns the row count.
+    """
+    with span("export.write", format=fmt), ColumnarWriter(output, fmt) as writer:
+        batch: List[Dict] = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= EXPORT_ROW_GROUP_SIZE:
+                writer.write({column: [row.get(column) for row in batch] for column in EXPORT_COLUMNS})
+                batch = []
+        if batch:
+            writer.write({column: [row.get(column) for row in batch] for column in EXPORT_COLUMNS})
+    return writer.rows
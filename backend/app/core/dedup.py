@@ -0,0 +1,136 @@
+import os
+import re
+import hashlib
+import logging
+from collections import Counter
+from typing import Dict, List
+
+import numpy as np
+
+from core.metrics import CACHE_HITS_TOTAL, CACHE_MISSES_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Off by default: collapsing changes per-row output, so callers opt in per request (`dedup=true`)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() in ("1", "true", "yes")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+
+# MinHash / LSH parameters: 64 permutations split into 16 bands of 4 rows.
+# With these settings pairs above ~0.5 Jaccard similarity almost always share
+# a bucket; the final decision is made against DEDUP_THRESHOLD.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+# Words that flip or carry a comment's position. Near-duplicates that differ in
+# any of these ("I strongly support" / "I do not support") are kept apart.
+# "t" is what normalize_text leaves of n't contractions (don't -> "don t").
+STANCE_WORDS = frozenset((
+    "not", "no", "never", "nor", "neither", "none", "nothing", "without", "cannot", "t",
+    "support", "oppose", "agree", "disagree", "favour", "favor", "against", "object", "welcome",
+    "reject", "approve", "disapprove", "accept", "endorse", "good", "bad", "great", "poor",
+    "fair", "unfair", "benefit", "harm", "positive", "negative"
+))
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, _MERSENNE_PRIME, size=NUM_PERM).astype(np.int64)
+_PERM_B = _rng.randint(0, _MERSENNE_PRIME, size=NUM_PERM).astype(np.int64)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and strip punctuation/whitespace so trivial edits still match"""
+    text = re.sub(r"http\S+|www\S+", " ", text.lower())
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _shingles(tokens: List[str]) -> List[str]:
+    if len(tokens) < SHINGLE_SIZE:
+        return [" ".join(tokens)]
+    return [" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+
+
+def minhash_signature(normalized: str) -> np.ndarray:
+    """Compute a MinHash signature over word shingles of normalized text"""
+    shingles = set(_shingles(normalized.split()))
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.int64,
+        count=len(shingles)
+    )
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME
+    return permuted.min(axis=0)
+
+
+def _same_stance(a: List[str], b: List[str]) -> bool:
+    """True unless the tokens that differ between two texts include a stance word"""
+    first, second = Counter(a), Counter(b)
+    changed = (first - second) + (second - first)
+    return not any(token.rstrip("s") in STANCE_WORDS or token in STANCE_WORDS for token in changed)
+
+
+def cluster_comments(texts: List[str], threshold: float = DEDUP_THRESHOLD) -> List[int]:
+    """
+    Group near-duplicate texts and return, for each input, the index of its
+    cluster representative (the first occurrence). Empty texts are never merged,
+    and near-duplicates are only merged when their differing words carry no
+    negation or stance (see STANCE_WORDS).
+    """
+    rep_of = list(range(len(texts)))
+    exact: Dict[str, int] = {}
+    buckets: Dict[tuple, List[int]] = {}
+    signatures: Dict[int, np.ndarray] = {}
+    tokens: Dict[int, List[str]] = {}
+
+    for idx, text in enumerate(texts):
+        normalized = normalize_text(text or "")
+        if not normalized:
+            continue
+
+        # Exact (normalized) duplicates never need a signature
+        if normalized in exact:
+            rep_of[idx] = exact[normalized]
+            continue
+
+        sig = minhash_signature(normalized)
+        band_keys = [(b, sig[b * ROWS:(b + 1) * ROWS].tobytes()) for b in range(BANDS)]
+
+        match = None
+        seen = set()
+        for key in band_keys:
+            for candidate in buckets.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if (float(np.mean(signatures[candidate] == sig)) >= threshold
+                        and _same_stance(tokens[candidate], normalized.split())):
+                    match = candidate
+                    break
+            if match is not None:
+                break
+
+        if match is not None:
+            rep_of[idx] = match
+            exact[normalized] = match
+            continue
+
+        exact[normalized] = idx
+        signatures[idx] = sig
+        tokens[idx] = normalized.split()
+        for key in band_keys:
+            buckets.setdefault(key, []).append(idx)
+
+    clusters = len(set(rep_of))
+    CACHE_HITS_TOTAL.inc(len(texts) - clusters, cache="dedup")
+    CACHE_MISSES_TOTAL.inc(clusters, cache="dedup")
+    if clusters < len(texts):
+        logger.info(f"Deduplication: {len(texts)} comments collapsed into {clusters} clusters")
+    return rep_of
+
+
+def cluster_sizes(rep_of: List[int]) -> List[int]:
+    """Size of the cluster each item belongs to"""
+    counts = Counter(rep_of)
+    return [counts[rep] for rep in rep_of]
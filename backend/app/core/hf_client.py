@@ -0,0 +1,57 @@
+import asyncio
+import logging
+import os
+import random
+
+import httpx
+
+from core.metrics import HF_REQUEST_SECONDS, HF_RETRIES_TOTAL
+from core.rate_limit import acquire
+from core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+HF_MAX_RETRIES = int(os.getenv("HF_MAX_RETRIES", "3"))
+HF_RETRY_BASE_DELAY = float(os.getenv("HF_RETRY_BASE_DELAY", "0.5"))
+HF_RETRY_MAX_DELAY = float(os.getenv("HF_RETRY_MAX_DELAY", "20"))
+
+RETRY_STATUSES = (429, 503)
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Exponential backoff with full jitter, never shorter than what the server asked for"""
+    delay = random.uniform(0, min(HF_RETRY_MAX_DELAY, HF_RETRY_BASE_DELAY * 2 ** attempt))
+    hint = response.headers.get("Retry-After")
+    if hint is None and response.status_code == 503:
+        # Model cold starts report how long loading should take
+        try:
+            hint = response.json().get("estimated_time")
+        except Exception:
+            hint = None
+    try:
+        if hint is not None:
+            delay = max(delay, float(hint))
+    except ValueError:
+        pass
+    return min(delay, HF_RETRY_MAX_DELAY)
+
+
+async def post(client: httpx.AsyncClient, url: str, model: str, **kwargs) -> httpx.Response:
+    """
+    POST to an HF inference endpoint through the rate limiter, retrying 429
+    and 503 responses. The last response is returned either way so callers
+    keep their raise_for_status() handling.
+    """
+    attempt = 0
+    while True:
+        await acquire(model)
+        with HF_REQUEST_SECONDS.time(model=model), span(f"hf.{model}", attempt=attempt):
+            response = await client.post(url, **kwargs)
+        if response.status_code not in RETRY_STATUSES or attempt >= HF_MAX_RETRIES:
+            return response
+        delay = _retry_delay(response, attempt)
+        HF_RETRIES_TOTAL.inc(model=model, status=response.status_code)
+        logger.info(f"HF {model} returned {response.status_code}, retrying in {delay:.2f}s")
+        with span(f"hf.{model}.backoff"):
+            await asyncio.sleep(delay)
+        attempt += 1
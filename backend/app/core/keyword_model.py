@@ -1,4 +1,5 @@
 import os
+import asyncio
 import httpx
 from dotenv import load_dotenv
 import logging
@@ -10,6 +11,13 @@ from nltk.tokenize import word_tokenize
 from nltk.stem import WordNetLemmatizer
 from nltk.corpus import wordnet
 from nltk.tag import pos_tag
+from core.chunking import split_text
+from core.progress import note_fallback
+from core.metrics import FALLBACK_SECONDS, ERRORS_TOTAL
+from core.tracing import span, traced
+from core.singleflight import coalesce
+from core.nlp_cache import cached
+from core import hf_client
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -27,8 +35,10 @@ HF_API_TOKEN = os.getenv("HF_API_TOKEN")
 if not HF_API_TOKEN:
     logger.warning("HF_API_TOKEN not found, will use basic keyword extraction")
 
-HF_KEYWORD_URL = "https://api-inference.huggingface.co/models/yanekyuk/bert-keyword-extractor"
+HF_API_BASE_URL = os.getenv("HF_API_BASE_URL", "https://api-inference.huggingface.co")
+HF_KEYWORD_URL = f"{HF_API_BASE_URL}/models/yanekyuk/bert-keyword-extractor"
 headers = {"Authorization": f"Bearer {HF_API_TOKEN}"} if HF_API_TOKEN else {}
+HF_KEYWORD_MAX_TOKENS = int(os.getenv("HF_KEYWORD_MAX_TOKENS", "500"))
 
 # Custom stopwords
 try:
@@ -72,33 +82,60 @@ def basic_preprocess(text: str):
     
     return processed_tokens
 
-async def extract_keywords_hf_api(text: str, top_n: int = 10):
-    """Extract keywords using Hugging Face API"""
-    if not HF_API_TOKEN:
-        return None
-    
+async def _request_keywords(client: httpx.AsyncClient, text: str):
+    """Send a single keyword request and return a list of (word, score) pairs"""
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                HF_KEYWORD_URL,
-                headers=headers,
-                json={"inputs": text}
-            )
-            response.raise_for_status()
-            result = response.json()
-            
+        response = await hf_client.post(
+            client,
+            HF_KEYWORD_URL,
+            "keywords",
+            headers=headers,
+            json={"inputs": text}
+        )
+        response.raise_for_status()
+        result = response.json()
+
         if isinstance(result, list):
             keywords = []
-            for item in result[:top_n]:
+            for item in result:
                 if isinstance(item, dict) and 'word' in item:
-                    keywords.append(item['word'])
+                    keywords.append((item['word'], item.get('score', 1.0)))
                 elif isinstance(item, str):
-                    keywords.append(item)
+                    keywords.append((item, 1.0))
             return keywords
         return None
     except Exception as e:
         logger.error(f"HF API keyword extraction failed: {str(e)}")
+        ERRORS_TOTAL.inc(stage="hf_keywords")
+        return None
+
+async def extract_keywords_hf_api(text: str, top_n: int = 10):
+    """Extract keywords using Hugging Face API, merging results across chunks of long inputs"""
+    if not HF_API_TOKEN:
+        return None
+    
+    chunks = split_text(text, HF_KEYWORD_MAX_TOKENS)
+    if len(chunks) == 1:
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            keywords = await _request_keywords(client, text)
+        return [word for word, _ in keywords[:top_n]] if keywords is not None else None
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        chunk_results = await asyncio.gather(*(_request_keywords(client, chunk) for chunk in chunks))
+
+    # Merge keyword sets, ranking words found in several chunks higher
+    merged = {}
+    display = {}
+    for keywords in chunk_results:
+        for word, score in keywords or []:
+            key = word.lower()
+            merged[key] = merged.get(key, 0.0) + score
+            display.setdefault(key, word)
+
+    if not merged and all(result is None for result in chunk_results):
         return None
+    ranked = sorted(merged, key=merged.get, reverse=True)
+    return [display[key] for key in ranked[:top_n]]
 
 def extract_keywords_basic(text: str, top_n: int = 10):
     """Basic keyword extraction using frequency analysis with NLTK"""
@@ -137,6 +174,9 @@ def extract_keywords(text: str, top_n: int = 5):
 
     return extract_keywords_basic(text, top_n)
 
+@traced()
+@coalesce("keywords")
+@cached("keywords")
 async def extract_keywords_async(text: str, top_n: int = 5):
     """
     Async version that tries HF API first, then falls back to basic extraction if needed.
@@ -150,4 +190,6 @@ async def extract_keywords_async(text: str, top_n: int = 5):
         return hf_keywords
     
     # Fallback to basic extraction
-    return extract_keywords_basic(text, top_n)
\ No newline at end of file
+    note_fallback("keywords")
+    with FALLBACK_SECONDS.time(stage="keywords"), span("fallback.keywords"):
+        return extract_keywords_basic(text, top_n)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Minimal Prometheus text-format registry. Metrics are process-local and
+# rendered by the /metrics endpoint in main.py.
+
+REGISTRY: List["_Metric"] = []
+_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: Tuple = ()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with _lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            lines.extend(self._sample_lines(key, value))
+        return lines
+
+    def _sample_lines(self, key: Tuple, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _sample_lines(self, key: Tuple, state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state["counts"]):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, (('le', bound),))} {cumulative}")
+        lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, (('le', '+Inf'),))} {state['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state['sum']}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+# --- Backend metrics ---
+
+HTTP_REQUESTS_TOTAL = Counter("http_requests_total", "HTTP requests handled", ("method", "path", "status"))
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Time to produce an HTTP response", ("method", "path"))
+
+HF_REQUEST_SECONDS = Histogram("hf_request_duration_seconds", "Hugging Face inference call latency", ("model",))
+FALLBACK_SECONDS = Histogram("fallback_duration_seconds", "Time spent in local fallback implementations", ("stage",))
+WORDCLOUD_SECONDS = Histogram("wordcloud_render_seconds", "Word cloud render time")
+EXCEL_IO_SECONDS = Histogram("excel_io_seconds", "Excel read and write time", ("operation",))
+SEARCH_QUERY_SECONDS = Histogram("search_query_duration_seconds", "Search index query latency")
+SUPABASE_SECONDS = Histogram("supabase_request_duration_seconds", "Supabase REST call latency", ("operation",))
+PROCESS_RSS_BYTES = Gauge("process_resident_memory_bytes", "Resident memory of this worker process")
+WORKER_RECYCLES_TOTAL = Counter("worker_recycles_total", "Workers asked to restart by the recycling guard", ("reason",))
+COMPRESSION_BYTES_TOTAL = Counter("response_compression_bytes_total", "Response body bytes before and after compression", ("encoding", "stage"))
+
+HF_QUEUE_DEPTH = Gauge("hf_queue_depth", "Calls waiting for an HF rate-limit token", ("model", "priority"))
+HF_QUEUE_WAIT_SECONDS = Histogram("hf_queue_wait_seconds", "Time spent waiting for an HF rate-limit token", ("model", "priority"))
+ADMISSION_QUEUE_DEPTH = Gauge("admission_queue_depth", "Requests waiting for endpoint capacity", ("endpoint",))
+ADMISSION_IN_FLIGHT_COST = Gauge("admission_in_flight_cost", "Estimated cost of requests currently running", ("endpoint",))
+ADMISSION_QUEUE_WAIT_SECONDS = Histogram("admission_queue_wait_seconds", "Time admitted requests waited for endpoint capacity", ("endpoint",))
+ADMISSION_REJECTED_TOTAL = Counter("admission_rejected_total", "Requests rejected with 429 because an endpoint was saturated", ("endpoint", "reason"))
+HF_RETRIES_TOTAL = Counter("hf_retries_total", "HF calls retried after a 429 or 503", ("model", "status"))
+
+CASCADE_DECISIONS_TOTAL = Counter("sentiment_cascade_decisions_total", "Sentiment cascade outcomes: answered locally or escalated to HF", ("outcome", "reason"))
+FALLBACKS_TOTAL = Counter("fallbacks_total", "Calls answered by a local fallback instead of the remote model", ("stage",))
+CACHE_HITS_TOTAL = Counter("cache_hits_total", "Results served without running the pipeline", ("cache",))
+CACHE_MISSES_TOTAL = Counter("cache_misses_total", "Results that had to be computed", ("cache",))
+ERRORS_TOTAL = Counter("errors_total", "Errors by stage", ("stage",))
@@ -0,0 +1,69 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+
+from core.metrics import CACHE_HITS_TOTAL, CACHE_MISSES_TOTAL
+from core.progress import current_fallbacks
+from core.shared_state import get_backend
+
+logger = logging.getLogger(__name__)
+
+NLP_CACHE_ENABLED = os.getenv("NLP_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+NLP_CACHE_TTL_SECONDS = int(os.getenv("NLP_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+def cache_key(name: str, arguments: dict) -> str:
+    payload = json.dumps(arguments, sort_keys=True, default=str)
+    return f"{name}:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cached(name: str, ttl: int = NLP_CACHE_TTL_SECONDS, decode=None):
+    """
+    Decorator caching an async model call's JSON-serialisable result in the
+    shared-state backend, keyed by its bound arguments, so every worker
+    process reuses it. Results produced by a fallback path aren't stored.
+    `decode` restores the result type from its JSON form, e.g. tuple.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not NLP_CACHE_ENABLED:
+                return await fn(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = cache_key(name, bound.arguments)
+            backend = get_backend()
+
+            try:
+                value = await asyncio.to_thread(backend.cache_get, key)
+            except Exception as e:
+                logger.warning(f"NLP cache lookup failed: {str(e)}")
+                value = None
+            if value is not None:
+                CACHE_HITS_TOTAL.inc(cache=f"nlp_{name}")
+                result = json.loads(value)
+                return decode(result) if decode else result
+            CACHE_MISSES_TOTAL.inc(cache=f"nlp_{name}")
+
+            fallbacks = []
+            token = current_fallbacks.set(fallbacks)
+            try:
+                result = await fn(*args, **kwargs)
+            finally:
+                current_fallbacks.reset(token)
+
+            if not fallbacks and result is not None:
+                try:
+                    await asyncio.to_thread(backend.cache_set, key, json.dumps(result), ttl)
+                except Exception as e:
+                    logger.warning(f"NLP cache store failed: {str(e)}")
+            return result
+
+        return wrapper
+    return decorator
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import shutil
+import time
+import zipfile
+from typing import List, Optional, Tuple
+
+from core.checkpoint import Checkpoint, CHECKPOINT_ENABLED
+from core.dedup import DEDUP_ENABLED
+from core.metrics import EXCEL_IO_SECONDS
+from core.process_excel import (
+    ALL_STAGES, ESTIMATED_BYTES_PER_ROW, NLP_CONCURRENCY, analyze_sheets, count_rows, index_source, new_output_buffer,
+    parse_stages, read_workbook, write_workbook
+)
+from core.progress import ProgressTracker, current_tracker
+from core.rate_limit import current_priority
+
+WORKBOOK_EXTENSIONS = (".xlsx", ".xls")
+MAX_ARCHIVE_MEMBERS = int(os.getenv("MAX_ARCHIVE_MEMBERS", "50"))
+MAX_ARCHIVE_UNCOMPRESSED_BYTES = int(os.getenv("MAX_ARCHIVE_UNCOMPRESSED_BYTES", str(500 * 1024 * 1024)))
+EXTRACT_CHUNK_SIZE = 1024 * 1024
+
+# Excel caps sheet names at 31 characters and forbids a few punctuation marks
+_SHEET_NAME_LIMIT = 31
+_SHEET_NAME_FORBIDDEN = str.maketrans({c: "_" for c in "[]:*?/\\"})
+
+
+def extract_workbooks(archive_path: str, dest_dir: str) -> List[Tuple[str, str]]:
+    """
+    Extract the workbooks in a zip archive to `dest_dir`, returning
+    (member_name, path) pairs. Folders, non-Excel files and macOS metadata are
+    skipped; members are written under their base name only. Extraction
+    stops with ValueError once more than MAX_ARCHIVE_UNCOMPRESSED_BYTES have
+    been written, whatever sizes the archive declares.
+    """
+    try:
+        archive = zipfile.ZipFile(archive_path)
+    except zipfile.BadZipFile:
+        raise ValueError("Uploaded file is not a valid zip archive")
+
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and info.filename.lower().endswith(WORKBOOK_EXTENSIONS)
+            and not info.filename.startswith("__MACOSX/")
+            and not os.path.basename(info.filename).startswith(("~$", "."))
+        ]
+        if not members:
+            raise ValueError("Zip archive contains no Excel workbooks (.xlsx, .xls)")
+        if len(members) > MAX_ARCHIVE_MEMBERS:
+            raise ValueError(f"Zip archive contains {len(members)} workbooks; at most {MAX_ARCHIVE_MEMBERS} are accepted")
+        if sum(info.file_size for info in members) > MAX_ARCHIVE_UNCOMPRESSED_BYTES:
+            raise ValueError("Zip archive is too large once uncompressed")
+
+        extracted = []
+        remaining = MAX_ARCHIVE_UNCOMPRESSED_BYTES
+        for number, info in enumerate(members):
+            # Prefix with the member number so equal base names from different folders don't collide
+            path = os.path.join(dest_dir, f"{number:03d}_{os.path.basename(info.filename)}")
+            with archive.open(info) as source, open(path, "wb") as target:
+                # Count the bytes actually written; declared sizes can be forged
+                while True:
+                    try:
+                        block = source.read(EXTRACT_CHUNK_SIZE)
+                    except zipfile.BadZipFile as e:
+                        raise ValueError(f"Zip archive member {info.filename} is corrupt: {str(e)}")
+                    if not block:
+                        break
+                    remaining -= len(block)
+                    if remaining < 0:
+                        raise ValueError("Zip archive is too large once uncompressed")
+                    target.write(block)
+            extracted.append((info.filename, path))
+    return extracted
+
+
+def estimate_archive_rows(archive_path: str) -> int:
+    """Rough row count of a zip of workbooks from its members' sizes, for admission control"""
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            size = sum(info.file_size for info in archive.infolist()
+                       if info.filename.lower().endswith(WORKBOOK_EXTENSIONS))
+    except zipfile.BadZipFile:
+        size = os.path.getsize(archive_path)
+    return max(size // ESTIMATED_BYTES_PER_ROW, 1)
+
+
+def _unique_sheet_name(name: str, used: set) -> str:
+    base = name.translate(_SHEET_NAME_FORBIDDEN)[:_SHEET_NAME_LIMIT] or "Sheet"
+    candidate, counter = base, 2
+    while candidate.lower() in used:
+        suffix = f" ({counter})"
+        candidate = base[:_SHEET_NAME_LIMIT - len(suffix)] + suffix
+        counter += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+async def process_archive(archive_path: str, work_dir: str, combined: bool = False, dedup: bool = DEDUP_ENABLED,
+                          progress: Optional[ProgressTracker] = None, incremental: bool = False,
+                          stages=ALL_STAGES, resume: bool = CHECKPOINT_ENABLED) -> Tuple[object, str]:
+    """
+    Analyse every sheet of every workbook in a zip archive concurrently, all
+    sharing one NLP concurrency budget. Returns (output file, media_type): either a
+    zip with one processed workbook per input, or with `combined` a single
+    workbook holding every analysed sheet named "<file> - <sheet>". With
+    `resume`, each workbook is checkpointed separately by its own hash.
+    """
+    tracker_token = current_tracker.set(progress)
+    priority_token = current_priority.set("bulk")
+    checkpoints = []
+    try:
+        stages = parse_stages(stages)
+        workbooks = await asyncio.to_thread(extract_workbooks, archive_path, work_dir)
+
+        # Read everything first so progress knows the grand total up front
+        inputs = []
+        for member, path in workbooks:
+            try:
+                inputs.append((member, await asyncio.to_thread(read_workbook, path, True)))
+            except ValueError as e:
+                raise ValueError(f"{member}: {str(e)}")
+        if progress:
+            progress.start(total=sum(count_rows(sheets) for _, sheets in inputs))
+
+        if resume:
+            checkpoints = [await asyncio.to_thread(Checkpoint.for_file, path) for _, path in workbooks]
+        else:
+            checkpoints = [None] * len(workbooks)
+
+        sources = [await index_source(path, checkpoint) for (_, path), checkpoint in zip(workbooks, checkpoints)]
+        nlp_slots = asyncio.Semaphore(NLP_CONCURRENCY)
+        analysed = await asyncio.gather(*(
+            analyze_sheets(sheets, stages, dedup, progress, incremental, nlp_slots, checkpoint, source)
+            for (_, sheets), checkpoint, source in zip(inputs, checkpoints, sources)
+        ))
+        write_started = time.perf_counter()
+        output = new_output_buffer()
+        if combined:
+            used = set()
+            sheets = []
+            for (member, _), workbook_sheets in zip(inputs, analysed):
+                stem = os.path.splitext(os.path.basename(member))[0]
+                for name, df, table, rep_of in workbook_sheets:
+                    sheets.append((_unique_sheet_name(f"{stem} - {name}", used), df, table, rep_of))
+            await asyncio.to_thread(write_workbook, sheets, output)
+            media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        else:
+            with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as bundle:
+                used = set()
+                for (member, _), workbook_sheets in zip(inputs, analysed):
+                    workbook_output = new_output_buffer()
+                    await asyncio.to_thread(write_workbook, workbook_sheets, workbook_output)
+                    workbook_output.seek(0)
+                    stem = os.path.splitext(os.path.basename(member))[0]
+                    name = f"processed_{stem}.xlsx"
+                    while name.lower() in used:
+                        name = f"processed_{stem}_{len(used)}.xlsx"
+                    used.add(name.lower())
+                    with workbook_output, bundle.open(name, "w") as member_file:
+                        shutil.copyfileobj(workbook_output, member_file)
+            media_type = "application/zip"
+        EXCEL_IO_SECONDS.observe(time.perf_counter() - write_started, operation="write")
+
+        for workbook_sheets in analysed:
+            for _, _, table, _ in workbook_sheets:
+                if table is not None:
+                    table.close()
+        for checkpoint in checkpoints:
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.clear)
+        output.seek(0)
+        return output, media_type
+    finally:
+        for checkpoint in checkpoints:
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.flush)
+        current_tracker.reset(tracker_token)
+        current_priority.reset(priority_token)
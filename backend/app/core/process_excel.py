@@ -5,205 +5,599 @@ from openpyxl.drawing.image import Image as XlImage
 import os
 import io
 import base64
+import re
+import shutil
 import tempfile
 import time
-from datetime import datetime
+import zipfile
+from datetime import date, datetime
+from datetime import time as dt_time
+from typing import List, Optional, Tuple
+import numpy as np
 from PIL import Image as PILImage
 
+try:
+    import xlsxwriter
+    from xlsxwriter.image import Image as XlsxImage
+except ImportError:  # Optional: fall back to the openpyxl writer
+    xlsxwriter = None
+
 from core.keyword_model import extract_keywords_async
 from core.sentiment_model import analyze_sentiment
 from core.summariser_model import generate_summary
 from core.wordcloud_gen import create_wordcloud
+from core.dedup import cluster_comments, cluster_sizes, DEDUP_ENABLED
+from core.rate_limit import current_priority
+from core.progress import ProgressTracker, current_tracker
+from core.metrics import EXCEL_IO_SECONDS, ERRORS_TOTAL, CACHE_HITS_TOTAL, CACHE_MISSES_TOTAL
+from core.result_store import row_fingerprint, get_results, put_results, RESULT_STORE_ENABLED
+from core.result_table import ResultTable
+from core.checkpoint import Checkpoint, CHECKPOINT_ENABLED, file_hash
+from core.search_index import index_comments, SEARCH_INDEX_ENABLED
+from core.columnar_export import write_export, parse_format
+from core.tracing import span
 
 OUTPUT_DIR = "outputs"
+# Computed rows are written to the result store in batches of this size
+RESULT_STORE_BATCH = 500
+# Comments analysed at once across all sheets and files of one request
+NLP_CONCURRENCY = int(os.getenv("NLP_CONCURRENCY", "8"))
+
+REQUIRED_COLUMNS = ("comment_id", "comment")
+
+# "xlsxwriter" writes data and images in one constant-memory pass; "openpyxl" is the
+# older two-pass writer, used automatically when xlsxwriter is not installed
+EXCEL_WRITE_ENGINE = os.getenv("EXCEL_WRITE_ENGINE", "xlsxwriter").lower()
+# Word cloud images are scaled to this size (pixels) to fit next to their row
+WORDCLOUD_CELL_SIZE = (250, 120)
+
+# Outputs larger than this spill from memory to a temp file
+OUTPUT_SPOOL_BYTES = int(os.getenv("OUTPUT_SPOOL_BYTES", str(16 * 1024 * 1024)))
+
+def new_output_buffer():
+    """A file-like buffer for generated workbooks that only stays in memory while small"""
+    return tempfile.SpooledTemporaryFile(max_size=OUTPUT_SPOOL_BYTES)
+
+def buffer_size(buffer) -> int:
+    position = buffer.tell()
+    buffer.seek(0, os.SEEK_END)
+    size = buffer.tell()
+    buffer.seek(position)
+    return size
+
+ALL_STAGES = ("keywords", "sentiment", "summary", "wordcloud")
+STAGE_COLUMNS = {
+    "keywords": ("keywords",),
+    "sentiment": ("sentiment", "sentiment_score", "confidence"),
+    "summary": ("summary",),
+    "wordcloud": ("wordcloud",)
+}
+
+def parse_stages(stages=None) -> tuple:
+    """Normalise a comma-separated string or list of stage names, keeping pipeline order"""
+    if stages is None:
+        return ALL_STAGES
+    if isinstance(stages, str):
+        stages = [stage.strip().lower() for stage in stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in ALL_STAGES]
+    if unknown:
+        raise ValueError(f"Unknown analysis stages: {', '.join(unknown)}. Valid stages are: {', '.join(ALL_STAGES)}")
+    if not stages:
+        raise ValueError("At least one analysis stage must be selected")
+    return tuple(stage for stage in ALL_STAGES if stage in stages)
+
+def stage_columns(stages) -> list:
+    return [column for stage in stages for column in STAGE_COLUMNS[stage]]
+
+async def analyze_comment(comment: str, stages=ALL_STAGES, top_n: int = 5) -> dict:
+    """
+    Run the selected NLP stages for a single comment. The remote stages run
+    concurrently; the word cloud renders in a worker thread meanwhile, so it
+    doesn't hold up the event loop for every other row and request.
+    """
+    calls = {}
+    if "keywords" in stages:
+        calls["keywords"] = extract_keywords_async(comment, top_n=top_n)
+    if "sentiment" in stages:
+        calls["sentiment"] = analyze_sentiment(comment)
+    if "summary" in stages:
+        calls["summary"] = generate_summary(comment)
+    if "wordcloud" in stages:
+        calls["wordcloud"] = asyncio.to_thread(create_wordcloud, comment)
+    values = dict(zip(calls, await asyncio.gather(*calls.values())))
+
+    result = {}
+    if "keywords" in values:
+        result["keywords"] = values["keywords"] or []
+    if "sentiment" in values:
+        sentiment_label, sentiment_score, confidence = values["sentiment"]
+        result.update(sentiment=sentiment_label, sentiment_score=sentiment_score, confidence=confidence)
+    if "summary" in values:
+        result["summary"] = values["summary"]
+
+    if "wordcloud" in values:
+        result["wordcloud"] = base64.b64encode(values["wordcloud"].getbuffer()).decode('utf-8')  # Store base64 data for now
+
+    return result
+
+def _missing_columns_error(df: pd.DataFrame, missing_columns: List[str]) -> str:
+    available_cols = [col.lower() for col in df.columns]
+    similar_cols = {
+        "comment_id": [c for c in available_cols if "id" in c or "comment" in c],
+        "comment": [c for c in available_cols if "comment" in c or "text" in c or "feedback" in c]
+    }
+
+    error_msg = f"Excel file is missing required columns: {', '.join(missing_columns)}. "
+    for missing in missing_columns:
+        if similar_cols[missing]:
+            error_msg += f"\nFound similar columns for '{missing}': {', '.join(similar_cols[missing])}"
+
+    error_msg += "\n\nPlease ensure your Excel file has the columns 'comment_id' and 'comment'."
+    return error_msg
+
+# Fallback for estimate_rows when a sheet doesn't record its dimensions:
+# typical compressed bytes per comment row in an .xlsx
+ESTIMATED_BYTES_PER_ROW = 64
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension ref="[A-Z]+\d+(?::[A-Z]+(\d+))?"')
+_SHEET_PART = re.compile(r"xl/worksheets/sheet(\d+)\.xml$")
+
+def estimate_rows(input_file: str, all_sheets: bool = False) -> int:
+    """
+    Cheap row count for admission control, taken from the <dimension> tag at
+    the top of each sheet's XML without parsing any cells. Falls back to the
+    file size for .xls files or sheets without a dimension.
+    """
+    try:
+        with zipfile.ZipFile(input_file) as workbook:
+            parts = sorted(
+                (int(match.group(1)), name) for name in workbook.namelist()
+                if (match := _SHEET_PART.match(name))
+            )
+            if not all_sheets:
+                parts = parts[:1]
+            rows = 0
+            for _, name in parts:
+                with workbook.open(name) as sheet:
+                    match = _DIMENSION.search(sheet.read(4096))
+                if not match:
+                    raise ValueError(f"No dimension recorded for {name}")
+                rows += max(int(match.group(1) or 1) - 1, 0)  # minus the header row
+            return rows
+    except (zipfile.BadZipFile, ValueError, OSError):
+        return max(os.path.getsize(input_file) // ESTIMATED_BYTES_PER_ROW, 1)
+
+def read_workbook(input_file: str, all_sheets: bool = False) -> List[Tuple[str, pd.DataFrame, bool]]:
+    """
+    Read the first sheet, or every sheet, of a workbook as (sheet_name, df,
+    analysable) with lowercased column names. In multi-sheet mode sheets
+    without comment columns are kept and passed through unchanged; it is an
+    error only if no sheet can be analysed.
+    """
+    if not os.path.exists(input_file):
+        raise ValueError(f"Input file does not exist: {input_file}")
+
+    try:
+        with EXCEL_IO_SECONDS.time(operation="read"), span("excel.read"):
+            with pd.ExcelFile(input_file) as workbook:
+                names = workbook.sheet_names if all_sheets else workbook.sheet_names[:1]
+                frames = [(name, workbook.parse(name)) for name in names]
+    except Exception as e:
+        raise ValueError(f"Failed to read Excel file: {str(e)}")
+
+    sheets = []
+    first_error = None
+    for name, df in frames:
+        print(f"Columns found in sheet '{name}': {list(df.columns)}")
+        df.columns = [str(col).lower() for col in df.columns]
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        if missing_columns:
+            first_error = first_error or _missing_columns_error(df, missing_columns)
+            if all_sheets:
+                print(f"Sheet '{name}' has no comment columns, copying it unchanged")
+        sheets.append((name, df, not missing_columns))
+
+    if not any(analysable for _, _, analysable in sheets):
+        raise ValueError(first_error)
+    return sheets
+
+async def analyze_sheet(df: pd.DataFrame, stages=ALL_STAGES, dedup: bool = DEDUP_ENABLED,
+                        progress: Optional[ProgressTracker] = None, incremental: bool = False,
+                        nlp_slots: Optional[asyncio.Semaphore] = None, checkpoint: Optional[Checkpoint] = None,
+                        sheet_name: str = "", source: str = "") -> Tuple[ResultTable, List[int]]:
+    """
+    Analyse the comments of one sheet, filling the stage columns of `df` in
+    place. Returns the result table and each row's cluster representative,
+    which the writer needs to place word cloud images. Rows are analysed
+    concurrently; `nlp_slots` caps how many comments run at once across every
+    sheet sharing it (NLP_CONCURRENCY for this sheet alone if omitted). With a
+    `checkpoint`, rows completed by an earlier attempt on the same input are
+    reused and newly completed rows are checkpointed under `sheet_name`.
+    With `incremental`, rows unchanged since an earlier incremental run reuse
+    its stored results and newly computed rows are stored for the next one.
+    Rows are added to the search index under "<source>/<sheet_name>".
+    """
+    columns = stage_columns(stages)
+    for column in columns:
+        if column not in df.columns:
+            df[column] = None if column in ("sentiment_score", "confidence") else ""
+
+    comments = [str(c).strip() for c in df["comment"]]
+    comment_ids = list(df["comment_id"])
+
+    # Collapse near-duplicate comments so each cluster is analysed once
+    if dedup:
+        rep_of = cluster_comments(comments)
+    else:
+        rep_of = list(range(len(comments)))
+    sizes = cluster_sizes(rep_of)
+    # Only deduplicated output gains the cluster columns
+    if dedup:
+        df["cluster_id"] = [comment_ids[rep] for rep in rep_of]
+        df["cluster_size"] = sizes
+
+    representatives = sorted(set(rep_of))
+    fingerprints = {idx: row_fingerprint(comment_ids[idx], comments[idx]) for idx in representatives}
+
+    # Incremental mode: reuse stored results for rows whose id and text are unchanged
+    stored = await asyncio.to_thread(get_results, list(fingerprints.values())) if incremental else {}
+    if incremental:
+        CACHE_HITS_TOTAL.inc(len(stored), cache="result_store")
+        CACHE_MISSES_TOTAL.inc(len(representatives) - len(stored), cache="result_store")
+        print(f"Incremental mode: {len(stored)} of {len(representatives)} rows unchanged")
+
+    # Resume: rows finished before an interrupted attempt on this same input
+    resumed = await asyncio.to_thread(checkpoint.load, sheet_name) if checkpoint else {}
+    if resumed:
+        print(f"Resuming sheet '{sheet_name}' from checkpoint with {len(resumed)} completed rows")
+
+    table = ResultTable(len(comments))
+    # Only incremental runs keep their rows for the next run
+    store_results = incremental and RESULT_STORE_ENABLED
+    computed = []
+    if nlp_slots is None:
+        nlp_slots = asyncio.Semaphore(NLP_CONCURRENCY)
+
+    async def process_row(idx):
+        nonlocal computed
+        comment_id = comment_ids[idx]
+        comment = comments[idx]
+
+        if not comment:
+            if progress:
+                progress.row_done(comment_id, {"skipped": True}, count=sizes[idx])
+            return
+
+        checkpointed = resumed.get(fingerprints[idx])
+        if checkpointed and all(column in checkpointed for column in columns):
+            table.set(idx, checkpointed)
+            CACHE_HITS_TOTAL.inc(cache="checkpoint")
+            if progress:
+                progress.row_done(comment_id, {"resumed": True}, count=sizes[idx])
+            return
+
+        # A stored row only counts if an earlier run produced every selected stage
+        previous = stored.get(fingerprints[idx], {})
+        if previous and all(column in previous for column in columns):
+            table.set(idx, previous)
+            if progress:
+                progress.row_done(comment_id, {"cached": True}, count=sizes[idx])
+            return
+
+        print(f"Processing Comment ID {comment_id}...")
+
+        try:
+            async with nlp_slots:
+                result = await analyze_comment(comment, stages)
+            table.set(idx, result)
+            if checkpoint:
+                await checkpoint.add(sheet_name, fingerprints[idx], comment_id, result)
+            if store_results:
+                computed.append((fingerprints[idx], comment_id, {**previous, **result}))
+                if len(computed) >= RESULT_STORE_BATCH:
+                    batch, computed = computed, []
+                    await asyncio.to_thread(put_results, batch)
+            if progress:
+                row_data = {k: v for k, v in result.items() if k != "wordcloud"}
+                progress.row_done(comment_id, row_data, count=sizes[idx])
+        except Exception as e:
+            print(f"Error processing comment ID {comment_id}: {str(e)}")
+            ERRORS_TOTAL.inc(stage="process_excel_row")
+            error_values = {
+                "keywords": "Error processing",
+                "sentiment": "Error",
+                "sentiment_score": 0.0,
+                "confidence": 0.0,
+                "summary": f"Error: {str(e)}",
+                "wordcloud": ""
+            }
+            table.set(idx, {column: error_values[column] for column in columns})
+            if progress:
+                progress.row_done(comment_id, {"error": str(e)}, count=sizes[idx], error=True)
+
+    # Rows of a sheet run concurrently too: a fixed set of workers pulls
+    # representatives in order and `nlp_slots` bounds the comments in flight
+    pending = iter(representatives)
+
+    async def worker():
+        for idx in pending:
+            await process_row(idx)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(min(NLP_CONCURRENCY, len(representatives)))]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+
+    if store_results:
+        await asyncio.to_thread(put_results, computed)
+    if checkpoint:
+        await asyncio.to_thread(checkpoint.flush)
+
+    # Fan cluster results back out to every member row; only now do
+    # results become Excel-ready column values
+    for column in columns:
+        df[column] = table.column(column, rep_of)
+
+    if SEARCH_INDEX_ENABLED:
+        await asyncio.to_thread(index_comments, search_records(df), f"{source}/{sheet_name}")
+
+    return table, rep_of
 
-async def process_excel(input_file: str, output_file: str = None):
+SEARCH_FIELDS = ("comment_id", "comment", "keywords", "sentiment", "sentiment_score", "section_reference")
+
+def search_records(df: pd.DataFrame):
+    """Rows of an analysed sheet as search index records"""
+    fields = [field for field in SEARCH_FIELDS if field in df.columns]
+    for values in df[fields].itertuples(index=False, name=None):
+        yield {field: _cell_value(value) for field, value in zip(fields, values)}
+
+def count_rows(sheets: List[Tuple[str, pd.DataFrame, bool]]) -> int:
+    return sum(len(df) for _, df, analysable in sheets if analysable)
+
+async def analyze_sheets(sheets: List[Tuple[str, pd.DataFrame, bool]], stages=ALL_STAGES, dedup: bool = DEDUP_ENABLED,
+                         progress: Optional[ProgressTracker] = None, incremental: bool = False,
+                         nlp_slots: Optional[asyncio.Semaphore] = None,
+                         checkpoint: Optional[Checkpoint] = None, source: str = "") -> List[Tuple]:
+    """
+    Analyse sheets concurrently under one shared NLP concurrency budget and
+    return (sheet_name, df, table, rep_of) per sheet; passed-through sheets
+    have no table. Callers start `progress` with count_rows() beforehand.
+    """
+    if nlp_slots is None:
+        nlp_slots = asyncio.Semaphore(NLP_CONCURRENCY)
+
+    async def run(name, df, analysable):
+        if not analysable:
+            return None, None
+        return await analyze_sheet(df, stages, dedup, progress, incremental, nlp_slots, checkpoint, name, source)
+
+    outcomes = await asyncio.gather(*(run(name, df, analysable) for name, df, analysable in sheets))
+    return [(name, df, table, rep_of) for (name, df, _), (table, rep_of) in zip(sheets, outcomes)]
+
+async def index_source(path: str, checkpoint: Optional[Checkpoint] = None) -> str:
+    """Search index source of an input workbook, by content hash so a re-run replaces its own entries"""
+    if not SEARCH_INDEX_ENABLED:
+        return ""
+    input_hash = checkpoint.input_hash if checkpoint else await asyncio.to_thread(file_hash, path)
+    return f"excel:{input_hash[:16]}"
+
+def _image_sheets(sheets: List[Tuple]) -> List[Tuple]:
+    return [sheet for sheet in sheets if sheet[2] is not None and "wordcloud" in sheet[1].columns
+            and (sheet[2].image_offset >= 0).any()]
+
+def _cell_value(value):
+    """Convert a DataFrame value into something xlsxwriter writes natively"""
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    if isinstance(value, np.generic):
+        value = value.item()
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, (datetime, dt_time)):
+        # Excel has no time zones; pandas' to_excel rejects aware values outright
+        return value.replace(tzinfo=None)
+    if isinstance(value, date):
+        return value
+    return str(value)
+
+def _write_workbook_xlsxwriter(sheets: List[Tuple], output) -> int:
+    """
+    Single pass: rows are streamed out in order (constant_memory keeps only
+    the current row in memory) and each word cloud is placed as its row is
+    written. Image bytes are shared per cluster and stored once in the file.
+    """
+    workbook = xlsxwriter.Workbook(output, {
+        "constant_memory": True,
+        "in_memory": False,
+        # Comment text is data: never turn it into formulas or hyperlinks
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss"
+    })
+    # pandas' default to_excel header style
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    target_width, target_height = WORDCLOUD_CELL_SIZE
+    images = 0
+
+    with span("excel.write_data"):
+        for name, df, table, rep_of in sheets:
+            worksheet = workbook.add_worksheet(name)
+            columns = list(df.columns)
+            worksheet.write_row(0, 0, [str(column) for column in columns], header_format)
+
+            with_images = table is not None and "wordcloud" in columns and (table.image_offset >= 0).any()
+            wordcloud_col = columns.index("wordcloud") if with_images else -1
+            image_streams = {}
+
+            for row_idx, values in enumerate(df.itertuples(index=False, name=None), start=1):
+                for col_idx, value in enumerate(values):
+                    value = _cell_value(value)
+                    if value is not None:
+                        worksheet.write(row_idx, col_idx, value)
+
+                if not with_images:
+                    continue
+                rep = rep_of[row_idx - 1]
+                if rep not in image_streams:
+                    image_data = table.image(rep)
+                    image_streams[rep] = io.BytesIO(image_data) if image_data else None
+                if image_streams[rep] is None:
+                    continue
+                try:
+                    image = XlsxImage(image_streams[rep])
+                    # Scale to the same on-screen size as the openpyxl writer, net of the PNG's DPI
+                    worksheet.insert_image(row_idx, wordcloud_col, image, {
+                        "x_scale": target_width * image.x_dpi / (96.0 * image.width),
+                        "y_scale": target_height * image.y_dpi / (96.0 * image.height)
+                    })
+                    images += 1
+                except Exception as img_err:
+                    print(f"Could not add image for row {row_idx + 1} of sheet '{name}': {str(img_err)}")
+
+    print(f"Saving workbook with {images} images...")
+    with span("excel.save"):
+        workbook.close()
+    return images
+
+def _write_workbook_openpyxl(sheets: List[Tuple], output) -> int:
+    """Two passes: pandas writes the data, then the workbook is reloaded to add images"""
+    with span("excel.write_data"):
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            for name, df, _, _ in sheets:
+                df.to_excel(writer, sheet_name=name, index=False)
+
+    image_sheets = _image_sheets(sheets)
+    if not image_sheets:
+        return 0
+
+    with span("excel.reload"):
+        workbook = openpyxl.load_workbook(output)
+
+    images = 0
+    with span("excel.insert_images"):
+        for name, df, table, rep_of in image_sheets:
+            worksheet = workbook[name]
+            wordcloud_col_idx = list(df.columns).index('wordcloud') + 1  # +1 because Excel is 1-indexed
+            for row_idx, rep in enumerate(rep_of, start=2):  # Start from row 2 (skip header)
+                image_data = table.image(rep)
+                if not image_data:
+                    continue
+                try:
+                    img = XlImage(io.BytesIO(image_data))
+                    # Scale down the image to fit in an Excel cell
+                    img.width, img.height = WORDCLOUD_CELL_SIZE
+                    cell = worksheet.cell(row=row_idx, column=wordcloud_col_idx)
+                    worksheet.add_image(img, f"{cell.coordinate}")
+                    images += 1
+                except Exception as img_err:
+                    print(f"Could not add image for row {row_idx} of sheet '{name}': {str(img_err)}")
+
+    print(f"Saving workbook with {images} images...")
+    output.seek(0)
+    output.truncate(0)
+    with span("excel.save"):
+        workbook.save(output)
+    return images
+
+def write_workbook(sheets: List[Tuple], output, engine: Optional[str] = None):
+    """
+    Write analysed sheets, as returned by analyze_sheets, into one workbook
+    and embed each row's word cloud next to its data. `engine` overrides
+    EXCEL_WRITE_ENGINE.
+    """
+    engine = (engine or EXCEL_WRITE_ENGINE).lower()
+    if engine not in ("xlsxwriter", "openpyxl"):
+        raise ValueError(f"Unknown Excel write engine '{engine}'. Valid engines are: xlsxwriter, openpyxl")
+    if engine == "xlsxwriter" and xlsxwriter is not None:
+        _write_workbook_xlsxwriter(sheets, output)
+    else:
+        _write_workbook_openpyxl(sheets, output)
+
+async def process_excel(input_file: str, output_file: str = None, dedup: bool = DEDUP_ENABLED,
+                        progress: Optional[ProgressTracker] = None, incremental: bool = False,
+                        stages=ALL_STAGES, all_sheets: bool = False,
+                        nlp_slots: Optional[asyncio.Semaphore] = None, resume: bool = CHECKPOINT_ENABLED,
+                        output_format: str = "xlsx", export_images: bool = False):
+    """
+    Analyse the first sheet of a workbook, or every sheet with `all_sheets`,
+    and return the processed workbook as a spooled temp file positioned at
+    the start; it is only also written to disk when `output_file` is a path.
+    With `resume`, completed rows are checkpointed against the input's hash
+    so a retried run of the same file only processes the rows that were left.
+    `output_format` "parquet" or "arrow" writes the results as a columnar
+    file instead of a workbook; `export_images` embeds the word clouds in it.
+    """
     # Generate a unique process ID for tracking
     process_id = f"excel_{int(time.time())}_{os.getpid()}"
-    temp_files = []  # Track temp files for cleanup
+    tracker_token = current_tracker.set(progress)
+    # Workbook rows yield HF rate-limit tokens to interactive API calls
+    priority_token = current_priority.set("bulk")
+    checkpoint = None
+    analysed = []
+    excel_output = None
     
     try:
         print(f"[{process_id}] Starting Excel processing")
-        if not os.path.exists(input_file):
-            raise ValueError(f"Input file does not exist: {input_file}")
-        
-        if output_file is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"processed_results_{timestamp}.xlsx"
-        
-        try:
-            df = pd.read_excel(input_file)
-            print(f"Columns found in Excel: {list(df.columns)}")
-        except Exception as e:
-            raise ValueError(f"Failed to read Excel file: {str(e)}")
-        
-        df.columns = [col.lower() for col in df.columns]
-        
-        required_columns = ["comment_id", "comment"]
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        
-        if missing_columns:
-            available_cols = [col.lower() for col in df.columns]
-            similar_cols = {
-                "comment_id": [c for c in available_cols if "id" in c or "comment" in c],
-                "comment": [c for c in available_cols if "comment" in c or "text" in c or "feedback" in c]
-            }
-            
-            error_msg = f"Excel file is missing required columns: {', '.join(missing_columns)}. "
-            for missing in missing_columns:
-                if similar_cols[missing]:
-                    error_msg += f"\nFound similar columns for '{missing}': {', '.join(similar_cols[missing])}"
-            
-            error_msg += "\n\nPlease ensure your Excel file has the columns 'comment_id' and 'comment'."
-            raise ValueError(error_msg)
-            
-        # Initialize columns
-        if "keywords" not in df.columns:
-            df["keywords"] = ""
-        if "sentiment" not in df.columns:
-            df["sentiment"] = ""
-        if "sentiment_score" not in df.columns:
-            df["sentiment_score"] = None
-        if "confidence" not in df.columns:
-            df["confidence"] = None
-        if "summary" not in df.columns:
-            df["summary"] = ""
-        if "wordcloud" not in df.columns:
-            df["wordcloud"] = ""
-
-        for idx, row in df.iterrows():
-            comment_id = row["comment_id"]
-            comment = str(row["comment"]).strip()
-
-            if not comment:
-                continue
-
-            print(f"Processing Comment ID {comment_id}...")
+        if output_format != "xlsx":
+            output_format = parse_format(output_format)
 
-            try:
-                # --- Run async NLP functions ---
-                keywords = await extract_keywords_async(comment, top_n=5)
-                sentiment_label, sentiment_score, confidence = await analyze_sentiment(comment)
-                summary = await generate_summary(comment)
+        sheets = await asyncio.to_thread(read_workbook, input_file, all_sheets)
+        stages = parse_stages(stages)
+        if progress:
+            progress.start(total=count_rows(sheets))
+        if resume:
+            checkpoint = await asyncio.to_thread(Checkpoint.for_file, input_file)
+        source = await index_source(input_file, checkpoint)
+        analysed = await analyze_sheets(sheets, stages, dedup, progress, incremental, nlp_slots, checkpoint, source)
 
-                wc_buffer = create_wordcloud(comment)
-                wc_base64 = base64.b64encode(wc_buffer.getbuffer()).decode('utf-8')
-                
-                df.at[idx, "keywords"] = ", ".join(keywords) if keywords else ""
-                df.at[idx, "sentiment"] = sentiment_label
-                df.at[idx, "sentiment_score"] = sentiment_score
-                df.at[idx, "confidence"] = confidence
-                df.at[idx, "summary"] = summary
-                df.at[idx, "wordcloud"] = wc_base64  # Store base64 data for now
-            except Exception as e:
-                print(f"Error processing comment ID {comment_id}: {str(e)}")
-                df.at[idx, "keywords"] = "Error processing"
-                df.at[idx, "sentiment"] = "Error"
-                df.at[idx, "sentiment_score"] = 0.0
-                df.at[idx, "confidence"] = 0.0
-                df.at[idx, "summary"] = f"Error: {str(e)}"
-                df.at[idx, "wordcloud"] = ""
-
-        # Create output file with images
-        excel_output = io.BytesIO()
-        temp_files = []  # Keep track of all temp files for cleanup
-        
-        try:
+        excel_output = new_output_buffer()
+        write_started = time.perf_counter()
+        if output_format == "xlsx":
+            # Create output file with images
             print("Creating Excel output with images...")
-            with pd.ExcelWriter(excel_output, engine='openpyxl') as writer:
-                # First write the data without wordcloud column
-                wordcloud_col = None
-                if 'wordcloud' in df.columns:
-                    wordcloud_col = df['wordcloud'].copy()
-                    df['wordcloud'] = ""  # Clear it temporarily
-                
-                df.to_excel(writer, index=False)
-                
-                # Get the workbook and worksheet to add images
-                if wordcloud_col is not None:
-                    # Finish the pandas Excel writing process to get access to the workbook
-                    writer.close()
-                    
-                    # Now open with openpyxl to add images
-                    workbook = openpyxl.load_workbook(excel_output)
-                    worksheet = workbook.active
-                    
-                    # Find the wordcloud column index
-                    wordcloud_col_idx = list(df.columns).index('wordcloud') + 1  # +1 because Excel is 1-indexed
-                    
-                    # Add images to cells
-                    for row_idx, wc_data in enumerate(wordcloud_col, start=2):  # Start from row 2 (skip header)
-                        if wc_data and len(wc_data) > 100:  # Check if there's actual image data
-                            try:
-                                # Create a unique temp file name in a system temp directory
-                                temp_dir = tempfile.gettempdir()
-                                temp_img_path = os.path.join(temp_dir, f"wc_temp_{row_idx}_{os.getpid()}.png")
-                                temp_files.append(temp_img_path)  # Track for later cleanup
-                                
-                                # Write the image data to the file
-                                with open(temp_img_path, 'wb') as img_file:
-                                    img_file.write(base64.b64decode(wc_data))
-                                
-                                # Verify the file was created
-                                if not os.path.exists(temp_img_path):
-                                    raise FileNotFoundError(f"Failed to create temp image file at {temp_img_path}")
-                                
-                                # Add image to the cell
-                                img = XlImage(temp_img_path)
-                                # Scale down the image to fit in an Excel cell
-                                img.width = 250
-                                img.height = 120
-                                cell = worksheet.cell(row=row_idx, column=wordcloud_col_idx)
-                                worksheet.add_image(img, f"{cell.coordinate}")
-                                
-                            except Exception as img_err:
-                                print(f"Could not add image for row {row_idx}: {str(img_err)}")
-                    
-                    try:
-                        # Save the workbook to the BytesIO object
-                        print(f"[{process_id}] Saving workbook with {len(temp_files)} images...")
-                        excel_output.seek(0)
-                        excel_output.truncate(0)
-                        workbook.save(excel_output)
-                        print(f"[{process_id}] Workbook saved successfully")
-                    finally:
-                        # Clean up temp files after Excel is saved
-                        print("Cleaning up temporary image files...")
-                        for temp_path in temp_files:
-                            try:
-                                if os.path.exists(temp_path):
-                                    os.unlink(temp_path)
-                            except Exception as cleanup_err:
-                                print(f"Warning: Could not remove temp file {temp_path}: {str(cleanup_err)}")
-        except Exception as e:
-            raise ValueError(f"Failed to write Excel file: {str(e)}")
+            try:
+                await asyncio.to_thread(write_workbook, analysed, excel_output)
+            except Exception as e:
+                raise ValueError(f"Failed to write Excel file: {str(e)}")
+            EXCEL_IO_SECONDS.observe(time.perf_counter() - write_started, operation="write")
+        else:
+            print(f"Creating {output_format} export...")
+            try:
+                await asyncio.to_thread(write_export, analysed, excel_output, output_format, export_images)
+            except ValueError:
+                raise
+            except Exception as e:
+                raise ValueError(f"Failed to write {output_format} file: {str(e)}")
+            EXCEL_IO_SECONDS.observe(time.perf_counter() - write_started, operation=f"write_{output_format}")
+        if checkpoint:
+            await asyncio.to_thread(checkpoint.clear)
         
         # If output_file is a path, save to disk
         if isinstance(output_file, str):
             try:
+                excel_output.seek(0)
                 with open(output_file, 'wb') as f:
-                    f.write(excel_output.getvalue())
+                    shutil.copyfileobj(excel_output, f)
                 print(f"\n✅ Processing complete. Results saved to {output_file}")
-                # Always return BytesIO object regardless of whether we saved to disk
+                # Always return the buffer regardless of whether we saved to disk
             except Exception as e:
                 raise ValueError(f"Failed to save output file: {str(e)}")
         
-        # Return the BytesIO object for download
+        # Return the buffer for download
         excel_output.seek(0)
         return excel_output
         
     except Exception as e:
         import traceback
         print(f"[{process_id}] Error in process_excel: {str(e)}\n{traceback.format_exc()}")
-        
-        # Clean up any remaining temporary files
-        for temp_path in temp_files:
-            try:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
-                    print(f"[{process_id}] Cleaned up temp file: {temp_path}")
-            except Exception as cleanup_err:
-                print(f"[{process_id}] Failed to clean up temp file {temp_path}: {str(cleanup_err)}")
+        if excel_output is not None:
+            excel_output.close()
                 
         # For production environments, ensure the error message is production-friendly
         if isinstance(e, ValueError):
@@ -212,15 +606,13 @@ async def process_excel(input_file: str, output_file: str = None):
         else:
             # Sanitize internal errors for production
             raise ValueError(f"Excel processing failed: {type(e).__name__}. Please try again or contact support if the issue persists.")
-
-
-if __name__ == "__main__":
-    import sys
-    if len(sys.argv) < 2:
-        print("Usage: python process_excel.py <input_excel_file> [output_excel_file]")
-    else:
-        input_file = sys.argv[1]
-        output_file = sys.argv[2] if len(sys.argv) > 2 else None
-        result = asyncio.run(process_excel(input_file, output_file))
-        if isinstance(result, io.BytesIO):
-            print(f"\n✅ Processing complete. Excel file prepared for download.")
+    finally:
+        # Keep whatever finished if the run fails or is cancelled
+        if checkpoint:
+            await asyncio.to_thread(checkpoint.flush)
+        # Release the result tables' spooled image files on every path, not just success
+        for _, _, table, _ in analysed:
+            if table is not None:
+                table.close()
+        current_tracker.reset(tracker_token)
+        current_priority.reset(priority_token)
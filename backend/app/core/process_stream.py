@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+from typing import AsyncIterator, Dict
+
+from core.process_excel import analyze_comment
+from core.rate_limit import priority
+from core.search_index import index_comments, SEARCH_INDEX_ENABLED
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_CONCURRENCY = 4
+# Client-requested concurrency is capped at this many rows in flight per stream
+MAX_STREAM_CONCURRENCY = int(os.getenv("STREAM_MAX_CONCURRENCY", "32"))
+DEFAULT_STREAM_STAGES = ("keywords", "sentiment", "summary")
+# Finished rows are added to the search index in batches of this size
+SEARCH_INDEX_BATCH = 500
+
+
+def _lower_keys(record: Dict) -> Dict:
+    return {str(key).strip().lower(): value for key, value in record.items()}
+
+
+async def _process_record(index: int, record: Dict, stages) -> Dict:
+    comment_id = record.get("comment_id")
+    comment = str(record.get("comment") or "").strip()
+    result = {"row": index, "comment_id": comment_id}
+
+    if comment_id is None:
+        result["error"] = "Missing required field 'comment_id'"
+        return result
+    if not comment:
+        result["error"] = "Empty comment"
+        return result
+
+    try:
+        with priority("bulk"):
+            result.update(await analyze_comment(comment, stages))
+    except Exception as e:
+        logger.error(f"Error processing comment ID {comment_id}: {str(e)}")
+        result["error"] = str(e)
+    return result
+
+
+def _search_record(record: Dict, result: Dict) -> Dict:
+    return {
+        "comment_id": result["comment_id"],
+        "comment": str(record.get("comment") or "").strip(),
+        "keywords": result.get("keywords"),
+        "sentiment": result.get("sentiment"),
+        "sentiment_score": result.get("sentiment_score"),
+        "section_reference": record.get("section_reference")
+    }
+
+
+async def process_records(records: AsyncIterator[Dict], concurrency: int = DEFAULT_STREAM_CONCURRENCY,
+                          stages=DEFAULT_STREAM_STAGES) -> AsyncIterator[Dict]:
+    """
+    Run the comment pipeline over an async stream of records, yielding each
+    result as soon as it completes. At most `concurrency` rows (capped at
+    MAX_STREAM_CONCURRENCY) are in flight, so input is only read as fast as
+    results are produced.
+    """
+    concurrency = min(max(1, concurrency), MAX_STREAM_CONCURRENCY)
+    pending = set()
+    inputs = {}
+    to_index = []
+    index = 0
+
+    async def finished(done):
+        nonlocal to_index
+        for task in done:
+            result = task.result()
+            record = inputs.pop(result["row"])
+            if SEARCH_INDEX_ENABLED and "error" not in result:
+                to_index.append(_search_record(record, result))
+            yield result
+        if len(to_index) >= SEARCH_INDEX_BATCH:
+            batch, to_index = to_index, []
+            await asyncio.to_thread(index_comments, batch, "stream")
+
+    try:
+        async for record in records:
+            record = _lower_keys(record)
+            inputs[index] = record
+            pending.add(asyncio.create_task(_process_record(index, record, stages)))
+            index += 1
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                async for result in finished(done):
+                    yield result
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            async for result in finished(done):
+                yield result
+        if to_index:
+            await asyncio.to_thread(index_comments, to_index, "stream")
+    finally:
+        # Client went away or input was malformed: don't leave rows running
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,166 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from core.metrics import FALLBACKS_TOTAL, CASCADE_DECISIONS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+# Tracker for the job running in the current task, so model modules can
+# report fallbacks without threading a parameter through every call
+current_tracker: contextvars.ContextVar = contextvars.ContextVar("current_tracker", default=None)
+
+# Set by the NLP cache to a list while a model call runs; fallbacks are
+# appended so degraded results aren't cached
+current_fallbacks: contextvars.ContextVar = contextvars.ContextVar("current_fallbacks", default=None)
+
+
+def note_fallback(stage: str):
+    """Record that a stage fell back to its local implementation"""
+    FALLBACKS_TOTAL.inc(stage=stage)
+    fallbacks = current_fallbacks.get()
+    if fallbacks is not None:
+        fallbacks.append(stage)
+    tracker = current_tracker.get()
+    if tracker is not None:
+        tracker.fallbacks[stage] = tracker.fallbacks.get(stage, 0) + 1
+
+
+def note_cascade(outcome: str, reason: str):
+    """Record whether the sentiment cascade answered locally or escalated to the remote model"""
+    CASCADE_DECISIONS_TOTAL.inc(outcome=outcome, reason=reason)
+    tracker = current_tracker.get()
+    if tracker is not None:
+        tracker.cascade[outcome] = tracker.cascade.get(outcome, 0) + 1
+
+
+class ProgressTracker:
+    """Collects per-row completion for one job and fans events out to SSE subscribers"""
+
+    def __init__(self, job_id: str, kind: str):
+        self.job_id = job_id
+        self.kind = kind
+        self.status = "pending"
+        self.total = 0
+        self.completed = 0
+        self.errors = 0
+        self.fallbacks: Dict[str, int] = {}
+        self.cascade: Dict[str, int] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.media_type: Optional[str] = None
+        self.filename: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self._subscribers: List[asyncio.Queue] = []
+
+    def start(self, total: int):
+        self.status = "running"
+        self.total = total
+        self.started_at = time.time()
+        self._publish("start", self.snapshot())
+
+    def row_done(self, comment_id: Any, data: Optional[Dict] = None, count: int = 1, error: bool = False):
+        self.completed += count
+        if error:
+            self.errors += count
+        payload = {"comment_id": comment_id, "rows": count}
+        if data:
+            payload.update(data)
+        payload.update(self.snapshot())
+        self._publish("row", payload)
+
+    def finish(self, result: Any = None, media_type: Optional[str] = None, filename: Optional[str] = None):
+        self.status = "completed"
+        self.result = result
+        self.media_type = media_type
+        self.filename = filename
+        self.finished_at = time.time()
+        self._publish("done", self.snapshot())
+
+    def fail(self, error: str):
+        self.status = "failed"
+        self.error = error
+        self.finished_at = time.time()
+        self._publish("error", self.snapshot())
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def snapshot(self) -> Dict:
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+        remaining = max(self.total - self.completed, 0)
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "completed": self.completed,
+            "total": self.total,
+            "errors": self.errors,
+            "fallbacks": dict(self.fallbacks),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_sec": round(rate, 3),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 else None,
+            "cascade": self._cascade_summary(),
+            "error": self.error
+        }
+
+    def _cascade_summary(self) -> Optional[Dict]:
+        decided = sum(self.cascade.values())
+        if not decided:
+            return None
+        escalated = self.cascade.get("escalated", 0)
+        return {**self.cascade, "escalation_rate": round(escalated / decided, 4)}
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def _publish(self, event: str, data: Dict):
+        for queue in self._subscribers:
+            queue.put_nowait((event, data))
+
+
+JOBS: Dict[str, ProgressTracker] = {}
+
+
+def _cleanup_path(path: Any):
+    if isinstance(path, str) and os.path.exists(path):
+        try:
+            os.unlink(path)
+        except OSError as e:
+            logger.warning(f"Could not remove job output {path}: {str(e)}")
+
+
+def prune_jobs():
+    """Forget finished jobs older than JOB_TTL_SECONDS and remove their outputs"""
+    now = time.time()
+    for job_id, tracker in list(JOBS.items()):
+        if tracker.finished and now - tracker.finished_at > JOB_TTL_SECONDS:
+            _cleanup_path(tracker.result)
+            del JOBS[job_id]
+
+
+def create_job(kind: str) -> ProgressTracker:
+    prune_jobs()
+    job_id = uuid.uuid4().hex
+    tracker = ProgressTracker(job_id, kind)
+    JOBS[job_id] = tracker
+    return tracker
+
+
+def get_job(job_id: str) -> Optional[ProgressTracker]:
+    return JOBS.get(job_id)
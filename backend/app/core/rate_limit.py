@@ -0,0 +1,100 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from core.metrics import HF_QUEUE_DEPTH, HF_QUEUE_WAIT_SECONDS
+from core.shared_state import get_backend
+
+logger = logging.getLogger(__name__)
+
+# Requests per second allowed to each HF model endpoint, shared by all
+# workers through the shared-state backend. 0 disables limiting.
+HF_RATE_LIMIT_PER_SEC = float(os.getenv("HF_RATE_LIMIT_PER_SEC", "0"))
+HF_RATE_LIMIT_BURST = float(os.getenv("HF_RATE_LIMIT_BURST", str(max(1.0, HF_RATE_LIMIT_PER_SEC))))
+
+# Lower value is served first. Interactive API calls jump ahead of bulk rows
+# from workbook and stream processing whenever both wait on the same model.
+PRIORITIES = {"interactive": 0, "bulk": 1}
+
+current_priority: contextvars.ContextVar = contextvars.ContextVar("current_priority", default="interactive")
+
+
+@contextmanager
+def priority(name: str):
+    """Run HF calls made inside the block at the given priority class"""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{name}'")
+    token = current_priority.set(name)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class ModelLimiter:
+    """
+    Priority queue in front of one model's token bucket. Only the head of the
+    queue draws from the shared bucket, so waiters are granted strictly by
+    priority class and then arrival order.
+    """
+
+    def __init__(self, model: str, rate: float, burst: float):
+        self.model = model
+        self.rate = rate
+        self.burst = burst
+        self._waiters = []
+        self._seq = itertools.count()
+        self._pump_task = None
+
+    async def acquire(self, priority_name: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.get(priority_name, 0), next(self._seq), future))
+        HF_QUEUE_DEPTH.inc(model=self.model, priority=priority_name)
+        started = time.perf_counter()
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = loop.create_task(self._pump())
+        try:
+            await future
+        finally:
+            HF_QUEUE_DEPTH.dec(model=self.model, priority=priority_name)
+            HF_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - started, model=self.model, priority=priority_name)
+
+    async def _pump(self):
+        backend = get_backend()
+        while self._waiters:
+            # Skip callers that were cancelled while queued
+            if self._waiters[0][2].done():
+                heapq.heappop(self._waiters)
+                continue
+            try:
+                wait = await asyncio.to_thread(backend.take_tokens, f"hf:{self.model}", self.rate, self.burst)
+            except Exception as e:
+                # Never block model calls on a broken coordination store
+                logger.warning(f"Rate limiter unavailable: {str(e)}")
+                wait = 0
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+
+
+_limiters: Dict[str, ModelLimiter] = {}
+
+
+async def acquire(model: str):
+    """Wait until the token bucket for `model` grants one request"""
+    if HF_RATE_LIMIT_PER_SEC <= 0:
+        return
+    limiter = _limiters.get(model)
+    if limiter is None:
+        limiter = _limiters[model] = ModelLimiter(model, HF_RATE_LIMIT_PER_SEC, HF_RATE_LIMIT_BURST)
+    await limiter.acquire(current_priority.get())
@@ -0,0 +1,79 @@
+import logging
+import os
+import random
+import signal
+
+from core.metrics import PROCESS_RSS_BYTES, WORKER_RECYCLES_TOTAL
+from core.progress import JOBS
+
+logger = logging.getLogger(__name__)
+
+# Restart a worker once its resident memory passes this many MB, or after
+# this many requests plus up to the jitter (so workers don't all restart at
+# once); 0 disables either. Only acts under a process manager that replaces
+# exiting workers (gunicorn, which turns it on in gunicorn.conf.py). This
+# replaces gunicorn's own max_requests, which restarts a worker without
+# waiting for the background jobs it is running.
+WORKER_RECYCLING = os.getenv("WORKER_RECYCLING", "false").lower() in ("1", "true", "yes")
+WORKER_MAX_RSS_MB = float(os.getenv("WORKER_MAX_RSS_MB", "0"))
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "0"))
+WORKER_MAX_REQUESTS_JITTER = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "0"))
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # No procfs (macOS): peak RSS is the closest available figure
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class WorkerRecycler:
+    """
+    Checks RSS and the request count after each request and asks the
+    worker to shut down gracefully (SIGTERM) once either is over its limit,
+    so slow leaks in long-lived workers are bounded. In-flight requests
+    finish first; recycling waits while background jobs in this worker are
+    still running.
+    """
+
+    def __init__(self, max_rss_mb: float = WORKER_MAX_RSS_MB, max_requests: int = WORKER_MAX_REQUESTS,
+                 max_requests_jitter: int = WORKER_MAX_REQUESTS_JITTER, enabled: bool = WORKER_RECYCLING):
+        self.max_rss_bytes = int(max_rss_mb * 1024 * 1024)
+        self.max_requests = max_requests + random.randint(0, max(0, max_requests_jitter)) if max_requests > 0 else 0
+        self.enabled = enabled and (self.max_rss_bytes > 0 or self.max_requests > 0)
+        self.requests = 0
+        self.recycling = False
+
+    def request_finished(self):
+        if not self.enabled or self.recycling:
+            return
+        self.requests += 1
+        rss = rss_bytes()
+        PROCESS_RSS_BYTES.set(rss)
+        if self.max_rss_bytes and rss > self.max_rss_bytes:
+            reason = "max_rss"
+        elif self.max_requests and self.requests >= self.max_requests:
+            reason = "max_requests"
+        else:
+            return
+        running = sum(1 for tracker in JOBS.values() if not tracker.finished)
+        if running:
+            logger.info(f"Worker is over its {reason} limit; recycling after {running} running jobs finish")
+            return
+        self.recycle(reason, rss)
+
+    def recycle(self, reason: str, rss: int):
+        self.recycling = True
+        WORKER_RECYCLES_TOTAL.inc(reason=reason)
+        logger.warning(f"Recycling worker {os.getpid()} ({reason}): RSS {rss / 1024 / 1024:.0f}MB "
+                       f"after {self.requests} requests")
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+recycler = WorkerRecycler()
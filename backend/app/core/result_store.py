@@ -0,0 +1,116 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RESULT_STORE_ENABLED = os.getenv("RESULT_STORE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", os.path.join("outputs", "result_store.db"))
+# Rows not written again for this long are dropped, checked at most once per RESULT_STORE_PRUNE_INTERVAL
+RESULT_STORE_TTL_SECONDS = int(os.getenv("RESULT_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+RESULT_STORE_PRUNE_INTERVAL = 3600
+
+# SQLite caps bound parameters per statement; stay well below it
+_QUERY_BATCH = 500
+_last_prune = 0.0
+
+
+def row_fingerprint(comment_id, comment: str) -> str:
+    """Identify a row by its comment_id and the exact comment text"""
+    return hashlib.sha256(f"{comment_id}\x1f{comment}".encode("utf-8")).hexdigest()
+
+
+def _connect() -> sqlite3.Connection:
+    directory = os.path.dirname(RESULT_STORE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(RESULT_STORE_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS row_results ("
+        " fingerprint TEXT PRIMARY KEY,"
+        " comment_id TEXT,"
+        " data TEXT NOT NULL,"
+        " wordcloud BLOB,"
+        " updated_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS row_results_updated ON row_results (updated_at)")
+    return conn
+
+
+def _prune(conn: sqlite3.Connection):
+    global _last_prune
+    if time.monotonic() - _last_prune < RESULT_STORE_PRUNE_INTERVAL:
+        return
+    _last_prune = time.monotonic()
+    with conn:
+        conn.execute("DELETE FROM row_results WHERE updated_at < ?", (time.time() - RESULT_STORE_TTL_SECONDS,))
+
+
+def get_results(fingerprints: Iterable[str]) -> Dict[str, Dict]:
+    """Look up stored row results; word clouds come back base64-encoded as in process_excel"""
+    fingerprints = list(fingerprints)
+    found = {}
+    if not fingerprints:
+        return found
+    try:
+        conn = _connect()
+        try:
+            for i in range(0, len(fingerprints), _QUERY_BATCH):
+                batch = fingerprints[i:i + _QUERY_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT fingerprint, data, wordcloud FROM row_results WHERE fingerprint IN ({placeholders})",
+                    batch
+                )
+                for fingerprint, data, wordcloud in rows:
+                    result = json.loads(data)
+                    if wordcloud is not None:
+                        result["wordcloud"] = base64.b64encode(wordcloud).decode("utf-8")
+                    found[fingerprint] = result
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Result store lookup failed: {str(e)} - recomputing all rows")
+        return {}
+    return found
+
+
+def put_results(items: List[Tuple[str, object, Dict]]):
+    """
+    Store (fingerprint, comment_id, result) rows, replacing older results.
+    Rows older than RESULT_STORE_TTL_SECONDS are pruned along the way.
+    """
+    if not items:
+        return
+    now = time.time()
+    records = []
+    for fingerprint, comment_id, result in items:
+        data = {k: v for k, v in result.items() if k != "wordcloud"}
+        wordcloud = result.get("wordcloud")
+        records.append((
+            fingerprint,
+            str(comment_id),
+            json.dumps(data, default=str),
+            base64.b64decode(wordcloud) if wordcloud else None,
+            now
+        ))
+    try:
+        conn = _connect()
+        try:
+            _prune(conn)
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO row_results (fingerprint, comment_id, data, wordcloud, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    records
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to store row results: {str(e)}")
@@ -0,0 +1,149 @@
+import base64
+import tempfile
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Images larger than this in total spill from memory to a temp file
+IMAGE_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+
+
+def _score(value) -> Optional[float]:
+    # float32 storage; round on the way out so JSON and Excel don't show float32 noise
+    return None if np.isnan(value) else round(float(value), 6)
+
+
+class ResultTable:
+    """
+    Columnar per-row results for batch runs. Sentiment labels are stored as
+    categorical codes, scores as float32, keywords as interned ids addressed
+    by per-row offsets, and word cloud PNGs out of line in a spooled temp
+    file. Rows are only turned back into dicts, DataFrame columns or JSON at
+    the output edge.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.labels: List[str] = []
+        self._label_ids: Dict[str, int] = {}
+        self.label_codes = np.full(size, -1, dtype=np.int16)
+        self.scores = np.full(size, np.nan, dtype=np.float32)
+        self.confidence = np.full(size, np.nan, dtype=np.float32)
+
+        self.vocabulary: List[str] = []
+        self._word_ids: Dict[str, int] = {}
+        self.keyword_ids = array("i")
+        self.keyword_start = np.zeros(size, dtype=np.int64)
+        self.keyword_count = np.full(size, -1, dtype=np.int32)
+
+        self.summaries: List[Optional[str]] = [None] * size
+
+        self._images = tempfile.SpooledTemporaryFile(max_size=IMAGE_SPOOL_MAX_BYTES)
+        self._images_end = 0
+        self.image_offset = np.full(size, -1, dtype=np.int64)
+        self.image_length = np.zeros(size, dtype=np.int64)
+
+    def _intern(self, table: Dict[str, int], values: List[str], value: str) -> int:
+        index = table.get(value)
+        if index is None:
+            index = table[value] = len(values)
+            values.append(value)
+        return index
+
+    def set(self, row: int, result: Dict):
+        """Store one row's stage results as produced by analyze_comment or the result store"""
+        if "sentiment" in result and result["sentiment"] is not None:
+            self.label_codes[row] = self._intern(self._label_ids, self.labels, str(result["sentiment"]))
+        if result.get("sentiment_score") is not None:
+            self.scores[row] = result["sentiment_score"]
+        if result.get("confidence") is not None:
+            self.confidence[row] = result["confidence"]
+
+        if "keywords" in result:
+            keywords = result["keywords"]
+            if isinstance(keywords, str):
+                keywords = [keywords] if keywords else []
+            self.keyword_start[row] = len(self.keyword_ids)
+            self.keyword_count[row] = len(keywords)
+            self.keyword_ids.extend(self._intern(self._word_ids, self.vocabulary, str(word)) for word in keywords)
+
+        if "summary" in result:
+            self.summaries[row] = result["summary"]
+
+        wordcloud = result.get("wordcloud")
+        if wordcloud:
+            data = base64.b64decode(wordcloud) if isinstance(wordcloud, str) else bytes(wordcloud)
+            self._images.seek(self._images_end)
+            self._images.write(data)
+            self.image_offset[row] = self._images_end
+            self.image_length[row] = len(data)
+            self._images_end += len(data)
+
+    def keywords(self, row: int) -> Optional[List[str]]:
+        count = self.keyword_count[row]
+        if count < 0:
+            return None
+        start = self.keyword_start[row]
+        return [self.vocabulary[i] for i in self.keyword_ids[start:start + count]]
+
+    def sentiment(self, row: int) -> Optional[str]:
+        code = self.label_codes[row]
+        return self.labels[code] if code >= 0 else None
+
+    def image(self, row: int) -> Optional[bytes]:
+        offset = self.image_offset[row]
+        if offset < 0:
+            return None
+        self._images.seek(offset)
+        return self._images.read(self.image_length[row])
+
+    def row(self, row: int, columns: Iterable[str]) -> Dict:
+        """Materialise one row as a dict with the given columns, word clouds base64-encoded"""
+        values = {}
+        for column in columns:
+            if column == "keywords":
+                value = self.keywords(row)
+            elif column == "sentiment":
+                value = self.sentiment(row)
+            elif column == "sentiment_score":
+                value = _score(self.scores[row])
+            elif column == "confidence":
+                value = _score(self.confidence[row])
+            elif column == "summary":
+                value = self.summaries[row]
+            elif column == "wordcloud":
+                image = self.image(row)
+                value = base64.b64encode(image).decode("utf-8") if image else None
+            else:
+                raise ValueError(f"Unknown result column '{column}'")
+            if value is not None:
+                values[column] = value
+        return values
+
+    def column(self, column: str, rows) -> object:
+        """
+        Excel-ready values of `column` for each entry of `rows`, an array of
+        row indices (e.g. each row's cluster representative).
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if column == "sentiment":
+            return pd.Categorical.from_codes(self.label_codes[rows], categories=pd.Index(self.labels, dtype=object))
+        if column in ("sentiment_score", "confidence"):
+            values = self.scores if column == "sentiment_score" else self.confidence
+            return np.round(values[rows].astype(np.float64), 6)
+        if column == "keywords":
+            joined = {}
+            for row in np.unique(rows):
+                keywords = self.keywords(row)
+                joined[row] = ", ".join(keywords) if keywords else ""
+            return [joined[row] for row in rows]
+        if column == "summary":
+            return [self.summaries[row] or "" for row in rows]
+        if column == "wordcloud":
+            return [""] * len(rows)
+        raise ValueError(f"Unknown result column '{column}'")
+
+    def close(self):
+        self._images.close()
@@ -0,0 +1,270 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional
+
+from core.dedup import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Off by default: the index keeps the full text of every analysed comment
+SEARCH_INDEX_ENABLED = os.getenv("SEARCH_INDEX_ENABLED", "false").lower() in ("1", "true", "yes")
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join("outputs", "search_index.db"))
+SEARCH_MAX_LIMIT = 200
+# Facet counts are only computed when a query matches at most this many comments
+SEARCH_FACET_LIMIT = int(os.getenv("SEARCH_FACET_LIMIT", "20000"))
+# Entries not re-indexed for this long are dropped, checked at most once per SEARCH_PRUNE_INTERVAL
+SEARCH_INDEX_TTL_SECONDS = int(os.getenv("SEARCH_INDEX_TTL_SECONDS", str(30 * 24 * 3600)))
+SEARCH_PRUNE_INTERVAL = 3600
+SEARCH_PRUNE_BATCH = 5000
+
+# Bumped when the table layout changes; the index is derived data, so older files are rebuilt
+_SCHEMA_VERSION = 2
+_last_prune = 0.0
+
+_SECTION_PREFIX = re.compile(r"^\s*(section|sec\.?|s\.)\s*", re.IGNORECASE)
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_QUERY_TERM = re.compile(r"\w+")
+
+
+def section_key(section_reference) -> str:
+    """Normalise "Section 4", "sec. 4" and "4" to the same facet value"""
+    if section_reference is None:
+        return ""
+    text = _SECTION_PREFIX.sub("", str(section_reference).strip().lower())
+    return _NON_ALNUM.sub("x", text).strip("x")
+
+
+def _facet_tokens(sentiment: Optional[str], section: str) -> str:
+    # Facets are indexed as single tokens so filters intersect posting lists inside FTS5
+    tokens = []
+    if sentiment:
+        tokens.append("sentiment" + _NON_ALNUM.sub("", sentiment.lower()))
+    if section:
+        tokens.append("section" + section)
+    return " ".join(tokens)
+
+
+def _connect() -> sqlite3.Connection:
+    directory = os.path.dirname(SEARCH_INDEX_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(SEARCH_INDEX_PATH, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+        with conn:
+            conn.execute("DROP TABLE IF EXISTS search_comments")
+            conn.execute("DROP TABLE IF EXISTS search_fts")
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS search_comments ("
+        " id INTEGER PRIMARY KEY,"
+        " entry_key TEXT NOT NULL UNIQUE,"
+        " source TEXT NOT NULL,"
+        " comment_id TEXT NOT NULL,"
+        " comment TEXT NOT NULL,"
+        " keywords TEXT,"
+        " sentiment TEXT,"
+        " sentiment_score REAL,"
+        " section_reference TEXT,"
+        " section_key TEXT,"
+        " updated_at REAL NOT NULL)"
+    )
+    # Covering index so facet counts don't read the wide comment rows
+    conn.execute("CREATE INDEX IF NOT EXISTS search_comments_facets ON search_comments (id, sentiment, section_reference)")
+    conn.execute("CREATE INDEX IF NOT EXISTS search_comments_updated ON search_comments (updated_at)")
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+        " tokens, keywords, facets, content='', detail='column', tokenize='porter unicode61')"
+    )
+    return conn
+
+
+def _keywords_text(keywords) -> str:
+    if not keywords:
+        return ""
+    if isinstance(keywords, str):
+        return keywords
+    return ", ".join(str(keyword) for keyword in keywords)
+
+
+def entry_key(source: str, comment_id: str, comment: str) -> str:
+    """
+    Identity of an index entry. comment_ids are only unique within their input
+    (Excel ids restart at 1 in every file and sheet), so the key also holds the
+    source and the text: a different comment never replaces another's entry.
+    """
+    return hashlib.sha256(f"{source}\x1f{comment_id}\x1f{comment}".encode("utf-8")).hexdigest()[:32]
+
+
+def _delete_entries(conn: sqlite3.Connection, rows):
+    # The FTS table is contentless, so entries are deleted with their original values
+    conn.executemany(
+        "INSERT INTO search_fts (search_fts, rowid, tokens, keywords, facets) VALUES ('delete', ?, ?, ?, ?)",
+        [(row_id, normalize_text(comment), keywords or "", _facet_tokens(sentiment, section or ""))
+         for row_id, comment, keywords, sentiment, section in rows]
+    )
+    conn.executemany("DELETE FROM search_comments WHERE id = ?", [(row[0],) for row in rows])
+
+
+def _prune(conn: sqlite3.Connection):
+    """Drop entries that have not been re-indexed within SEARCH_INDEX_TTL_SECONDS"""
+    global _last_prune
+    if time.monotonic() - _last_prune < SEARCH_PRUNE_INTERVAL:
+        return
+    _last_prune = time.monotonic()
+    cutoff = time.time() - SEARCH_INDEX_TTL_SECONDS
+    pruned = 0
+    while True:
+        with conn:
+            rows = conn.execute(
+                "SELECT id, comment, keywords, sentiment, section_key FROM search_comments WHERE updated_at < ? LIMIT ?",
+                (cutoff, SEARCH_PRUNE_BATCH)
+            ).fetchall()
+            _delete_entries(conn, rows)
+        pruned += len(rows)
+        if len(rows) < SEARCH_PRUNE_BATCH:
+            break
+    if pruned:
+        logger.info(f"Search index: pruned {pruned} expired entries")
+
+
+def index_comments(records: Iterable[Dict], source: str):
+    """
+    Add or update analysed comments in the search index. Each record needs
+    `comment_id` and `comment`; `keywords`, `sentiment`, `sentiment_score`
+    and `section_reference` are optional. `source` names the input the
+    records came from (e.g. "excel:<input hash>/<sheet>"); re-indexing the
+    same comment of the same source replaces its entry (see entry_key).
+    """
+    if not SEARCH_INDEX_ENABLED:
+        return
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            _prune(conn)
+            with conn:
+                for record in records:
+                    comment = str(record.get("comment") or "").strip()
+                    if record.get("comment_id") is None or not comment:
+                        continue
+                    comment_id = str(record["comment_id"])
+                    key = entry_key(source, comment_id, comment)
+                    keywords = _keywords_text(record.get("keywords"))
+                    sentiment = record.get("sentiment") or None
+                    section = section_key(record.get("section_reference"))
+
+                    # A stale entry's FTS row has to go before the entry is replaced
+                    old = conn.execute(
+                        "SELECT id, comment, keywords, sentiment, section_key FROM search_comments WHERE entry_key = ?",
+                        (key,)
+                    ).fetchone()
+                    if old:
+                        conn.execute(
+                            "INSERT INTO search_fts (search_fts, rowid, tokens, keywords, facets) VALUES ('delete', ?, ?, ?, ?)",
+                            (old[0], normalize_text(old[1]), old[2] or "", _facet_tokens(old[3], old[4] or ""))
+                        )
+                    row_id = conn.execute(
+                        "INSERT INTO search_comments (entry_key, source, comment_id, comment, keywords, sentiment,"
+                        " sentiment_score, section_reference, section_key, updated_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT(entry_key) DO UPDATE SET comment = excluded.comment, keywords = excluded.keywords,"
+                        " sentiment = excluded.sentiment, sentiment_score = excluded.sentiment_score,"
+                        " section_reference = excluded.section_reference, section_key = excluded.section_key,"
+                        " updated_at = excluded.updated_at"
+                        " RETURNING id",
+                        (key, source, comment_id, comment, keywords, sentiment, record.get("sentiment_score"),
+                         record.get("section_reference"), section, now)
+                    ).fetchone()[0]
+                    conn.execute(
+                        "INSERT INTO search_fts (rowid, tokens, keywords, facets) VALUES (?, ?, ?, ?)",
+                        (row_id, normalize_text(comment), keywords, _facet_tokens(sentiment, section))
+                    )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Failed to update search index: {str(e)}")
+
+
+def _match_expression(query: str, sentiment: Optional[str], section: str) -> str:
+    """Build an FTS5 query: every word must match (prefix match on the last one) and every facet must hold"""
+    terms = _QUERY_TERM.findall(normalize_text(query or ""))
+    clauses = [f'"{term}"' for term in terms]
+    if clauses:
+        clauses[-1] += "*"
+        clauses = [f"{{tokens keywords}} : ({' AND '.join(clauses)})"]
+    facets = _facet_tokens(sentiment, section)
+    if facets:
+        clauses.append(f"facets : ({' AND '.join(facets.split())})")
+    return " AND ".join(clauses)
+
+
+def search_comments(query: str = "", sentiment: Optional[str] = None, section: Optional[str] = None,
+                    limit: int = 20, offset: int = 0, facets: bool = True) -> Dict:
+    """
+    Find analysed comments containing every word of `query` (in the comment
+    text or its keywords), optionally restricted to a sentiment label and a
+    section. Newest results first. Facet counts of sentiment labels and
+    sections are included while the match set is small enough to count.
+    """
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+    section = section_key(section) if section else ""
+    expression = _match_expression(query, sentiment, section)
+
+    conn = _connect()
+    try:
+        if expression:
+            matched, params = "SELECT rowid FROM search_fts WHERE search_fts MATCH ? ORDER BY rowid DESC", (expression,)
+        else:
+            matched, params = "SELECT id FROM search_comments ORDER BY id DESC", ()
+
+        # One pass over a small match set answers the total, the page and the facets
+        ids = [row[0] for row in conn.execute(f"{matched} LIMIT ?", params + (SEARCH_FACET_LIMIT + 1,))]
+        countable = len(ids) <= SEARCH_FACET_LIMIT
+        total = len(ids) if countable else conn.execute(f"SELECT count(*) FROM ({matched})", params).fetchone()[0]
+        if countable or offset + limit <= len(ids):
+            page = ids[offset:offset + limit]
+        else:
+            page = [row[0] for row in conn.execute(f"{matched} LIMIT ? OFFSET ?", params + (limit, offset))]
+
+        rows = conn.execute(
+            "SELECT source, comment_id, comment, keywords, sentiment, sentiment_score, section_reference FROM search_comments"
+            " WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id DESC",
+            (json.dumps(page),)
+        ).fetchall()
+
+        facet_counts = None
+        if facets and countable:
+            facet_counts = {"sentiment": {}, "section_reference": {}}
+            counts = conn.execute(
+                "SELECT sentiment, section_reference, count(*) FROM search_comments"
+                " WHERE id IN (SELECT value FROM json_each(?)) GROUP BY sentiment, section_reference",
+                (json.dumps(ids),)
+            )
+            for label, section_reference, count in counts:
+                for facet, value in (("sentiment", label), ("section_reference", section_reference)):
+                    if value is not None:
+                        facet_counts[facet][value] = facet_counts[facet].get(value, 0) + count
+    finally:
+        conn.close()
+
+    results: List[Dict] = [
+        {
+            "source": source,
+            "comment_id": comment_id,
+            "comment": comment,
+            "keywords": [keyword for keyword in (keywords or "").split(", ") if keyword],
+            "sentiment": label,
+            "sentiment_score": score,
+            "section_reference": section_reference
+        }
+        for source, comment_id, comment, keywords, label, score, section_reference in rows
+    ]
+    return {"total": total, "limit": limit, "offset": offset, "results": results, "facets": facet_counts}
@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from core.dedup import cluster_comments, cluster_sizes, DEDUP_ENABLED
+from core.metrics import CACHE_HITS_TOTAL, CACHE_MISSES_TOTAL, ERRORS_TOTAL
+from core.process_excel import analyze_comment
+from core.search_index import section_key
+from core.shared_state import get_backend
+from core.summariser_model import generate_summary
+
+logger = logging.getLogger(__name__)
+
+# Sections analysed at once, and per-comment model calls in flight across all of them
+SECTION_CONCURRENCY = int(os.getenv("SECTION_CONCURRENCY", "4"))
+SECTION_NLP_CONCURRENCY = int(os.getenv("SECTION_NLP_CONCURRENCY", "8"))
+SECTION_CACHE_TTL_SECONDS = int(os.getenv("SECTION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+SECTION_STAGES = ("keywords", "sentiment")
+SENTIMENT_LABELS = ("Positive", "Negative", "Neutral")
+# The HF model answers POS/NEG/NEU and the VADER fallback POSITIVE/NEGATIVE/NEUTRAL
+LABEL_ALIASES = {
+    "POS": "Positive", "POSITIVE": "Positive",
+    "NEG": "Negative", "NEGATIVE": "Negative",
+    "NEU": "Neutral", "NEUTRAL": "Neutral"
+}
+
+
+class Section:
+    """The comments of one section of a legislation"""
+
+    def __init__(self, key: str, reference: Optional[str]):
+        self.key = key
+        self.reference = reference
+        self.comments: List[Tuple[str, str]] = []
+
+    def fingerprint(self) -> str:
+        """Changes whenever a comment is added to, edited in or removed from the section"""
+        digest = hashlib.sha256()
+        for comment_id, text in sorted(self.comments):
+            digest.update(f"{comment_id}\x1f{text}\x1e".encode("utf-8"))
+        return digest.hexdigest()
+
+
+def canonical_label(label) -> Optional[str]:
+    """One of SENTIMENT_LABELS for any label the sentiment models emit, or None if unknown"""
+    return LABEL_ALIASES.get(str(label or "").strip().upper())
+
+
+def partition_by_section(comments: List[Dict]) -> List[Section]:
+    """
+    Group stakeholder comment rows by section. References are normalised, so
+    "Section 4" and "sec. 4" land together; comments without one form the
+    section with key "". Sections keep the order they first appear in.
+    """
+    sections: Dict[str, Section] = {}
+    for comment in comments:
+        text = " ".join(str(comment.get("comment_text") or "").split())
+        if not text:
+            continue
+        reference = comment.get("section_reference")
+        key = section_key(reference)
+        if key not in sections:
+            sections[key] = Section(key, reference if key else None)
+        sections[key].comments.append((str(comment.get("id")), text))
+    return list(sections.values())
+
+
+def _cache_key(legislation_id: str, section: Section, top_n: int) -> str:
+    return f"section_analytics:{legislation_id}:{section.key}:{top_n}:{section.fingerprint()}"
+
+
+def cached_sections(legislation_id: str, sections: List[Section], top_n: int) -> Dict[str, Dict]:
+    """
+    Stored results of sections whose comments are unchanged since they were
+    analysed. The cache key includes each section's fingerprint, so a section
+    that received new comments simply misses and only it is recomputed.
+    """
+    backend = get_backend()
+    found = {}
+    for section in sections:
+        try:
+            value = backend.cache_get(_cache_key(legislation_id, section, top_n))
+        except Exception as e:
+            logger.warning(f"Section cache lookup failed: {str(e)}")
+            value = None
+        if value is not None:
+            found[section.key] = json.loads(value)
+    CACHE_HITS_TOTAL.inc(len(found), cache="section_analytics")
+    CACHE_MISSES_TOTAL.inc(len(sections) - len(found), cache="section_analytics")
+    return found
+
+
+def _store_section(legislation_id: str, section: Section, top_n: int, result: Dict):
+    try:
+        get_backend().cache_set(_cache_key(legislation_id, section, top_n), json.dumps(result), SECTION_CACHE_TTL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Section cache store failed: {str(e)}")
+
+
+async def analyze_section(section: Section, top_n: int = 10, dedup: bool = DEDUP_ENABLED,
+                          nlp_slots: Optional[asyncio.Semaphore] = None) -> Dict:
+    """
+    Sentiment distribution, top keywords and a summary of one section.
+    Near-duplicate comments are analysed once and weighted by cluster size;
+    the summary is generated from the distinct comments.
+    """
+    texts = [text for _, text in section.comments]
+    rep_of = cluster_comments(texts) if dedup else list(range(len(texts)))
+    sizes = cluster_sizes(rep_of)
+    representatives = sorted(set(rep_of))
+    nlp_slots = nlp_slots or asyncio.Semaphore(SECTION_NLP_CONCURRENCY)
+
+    async def run(idx: int) -> Optional[Dict]:
+        async with nlp_slots:
+            try:
+                return await analyze_comment(texts[idx], SECTION_STAGES)
+            except Exception as e:
+                logger.error(f"Section analysis failed for comment {section.comments[idx][0]}: {str(e)}")
+                ERRORS_TOTAL.inc(stage="section_comment")
+                return None
+
+    summary_text = " ".join(texts[idx] for idx in representatives)
+    outputs, summary = await asyncio.gather(
+        asyncio.gather(*(run(idx) for idx in representatives)),
+        generate_summary(summary_text)
+    )
+
+    distribution = {label: 0 for label in SENTIMENT_LABELS}
+    keywords = Counter()
+    score_total = 0.0
+    analysed = 0
+    for idx, result in zip(representatives, outputs):
+        if not result:
+            continue
+        label = canonical_label(result.get("sentiment"))
+        if label is None:
+            logger.warning(f"Unknown sentiment label {result.get('sentiment')!r} for comment {section.comments[idx][0]}")
+            continue
+        weight = sizes[idx]
+        distribution[label] += weight
+        score_total += (result.get("sentiment_score") or 0.0) * weight
+        analysed += weight
+        keywords.update({str(keyword).lower(): weight for keyword in result.get("keywords") or []})
+
+    return {
+        "section_reference": section.reference,
+        "comment_count": len(texts),
+        "sentiment": {
+            "distribution": distribution,
+            "percentages": {label: round(100 * count / analysed, 1) if analysed else 0.0
+                            for label, count in distribution.items()},
+            "average_score": round(score_total / analysed, 4) if analysed else None
+        },
+        "top_keywords": [{"keyword": keyword, "count": count} for keyword, count in keywords.most_common(top_n)],
+        "summary": summary
+    }
+
+
+async def analyze_sections(legislation_id: str, sections: List[Section], top_n: int = 10,
+                           dedup: bool = DEDUP_ENABLED) -> Dict[str, Dict]:
+    """Analyse several sections concurrently and cache each result as soon as it is ready"""
+    section_slots = asyncio.Semaphore(SECTION_CONCURRENCY)
+    nlp_slots = asyncio.Semaphore(SECTION_NLP_CONCURRENCY)
+
+    async def run(section: Section) -> Dict:
+        async with section_slots:
+            result = await analyze_section(section, top_n=top_n, dedup=dedup, nlp_slots=nlp_slots)
+        await asyncio.to_thread(_store_section, legislation_id, section, top_n, result)
+        return result
+
+    results = await asyncio.gather(*(run(section) for section in sections))
+    return {section.key: result for section, result in zip(sections, results)}
@@ -1,9 +1,18 @@
 import os
+import asyncio
 import httpx
 import socket
+import re
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 import nltk
 from db.supabase_client import store_sentiment_analysis
+from core.chunking import split_text, estimate_tokens
+from core.progress import note_fallback, note_cascade
+from core.metrics import FALLBACK_SECONDS, ERRORS_TOTAL
+from core.tracing import span, traced
+from core.singleflight import coalesce
+from core.nlp_cache import cached
+from core import hf_client
 from dotenv import load_dotenv
 import logging
 
@@ -17,44 +26,87 @@ if not HF_API_TOKEN:
     logger.warning("HF_API_TOKEN not found, will use VADER fallback only")
 
 # Updated to use a different sentiment analysis model that's more reliable
-HF_SENTIMENT_URL = "https://api-inference.huggingface.co/models/finiteautomata/bertweet-base-sentiment-analysis"
+HF_API_BASE_URL = os.getenv("HF_API_BASE_URL", "https://api-inference.huggingface.co")
+HF_SENTIMENT_URL = f"{HF_API_BASE_URL}/models/finiteautomata/bertweet-base-sentiment-analysis"
 headers = {"Authorization": f"Bearer {HF_API_TOKEN}"} if HF_API_TOKEN else {}
+# bertweet accepts 128 tokens; leave headroom for special tokens
+HF_SENTIMENT_MAX_TOKENS = int(os.getenv("HF_SENTIMENT_MAX_TOKENS", "120"))
+
+# Cascade mode: score locally with VADER first and only send ambiguous
+# comments to the HF model
+SENTIMENT_CASCADE_ENABLED = os.getenv("SENTIMENT_CASCADE_ENABLED", "false").lower() in ("1", "true", "yes")
+# Minimum |compound| for VADER's answer to stand on its own
+CASCADE_VADER_THRESHOLD = float(os.getenv("CASCADE_VADER_THRESHOLD", "0.5"))
+# Both positive and negative lexicon shares above this count as mixed
+CASCADE_MIXED_THRESHOLD = float(os.getenv("CASCADE_MIXED_THRESHOLD", "0.15"))
+# VADER is a bag-of-words scorer; longer comments go to the model
+CASCADE_MAX_TOKENS = int(os.getenv("CASCADE_MAX_TOKENS", "80"))
+CONTRAST_MARKERS = re.compile(r"\b(but|however|although|though|whereas|despite|nevertheless|yet)\b", re.IGNORECASE)
 
 # VADER analyzer as fallback
 vader_analyzer = SentimentIntensityAnalyzer()
 
-async def analyze_sentiment_hf_api(text: str):
-    """Analyze sentiment using Hugging Face API"""
-    if not HF_API_TOKEN:
-        return None
-    
+async def _request_sentiment(client: httpx.AsyncClient, text: str):
+    """Send a single sentiment request and return the best (label, score)"""
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.post(
-                HF_SENTIMENT_URL, 
-                headers=headers, 
-                json={"inputs": text}
-            )
-            response.raise_for_status()
-            result = response.json()
-            
+        response = await hf_client.post(
+            client,
+            HF_SENTIMENT_URL,
+            "sentiment",
+            headers=headers,
+            json={"inputs": text}
+        )
+        response.raise_for_status()
+        result = response.json()
+
+        # The inference API nests per-input results: [[{label, score}, ...]]
+        if isinstance(result, list) and result and isinstance(result[0], list):
+            result = result[0]
         if isinstance(result, list) and len(result) > 0:
             # Get the highest scoring label
             best_result = max(result, key=lambda x: x['score'])
-            label = best_result['label']
-            score = best_result['score']
-            return label, score, score
+            return best_result['label'], best_result['score']
         return None
     except (httpx.ConnectError, httpx.ConnectTimeout, socket.gaierror) as network_err:
         logger.error(f"HF API network error: {str(network_err)}")
+        ERRORS_TOTAL.inc(stage="hf_sentiment")
         raise
     except Exception as e:
         logger.error(f"HF API sentiment analysis failed: {str(e)}")
+        ERRORS_TOTAL.inc(stage="hf_sentiment")
         return None
 
+async def analyze_sentiment_hf_api(text: str):
+    """Analyze sentiment using Hugging Face API, chunking inputs longer than the model limit"""
+    if not HF_API_TOKEN:
+        return None
+    
+    chunks = split_text(text, HF_SENTIMENT_MAX_TOKENS)
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        chunk_results = await asyncio.gather(*(_request_sentiment(client, chunk) for chunk in chunks))
+
+    # Length-weighted vote across chunks
+    label_weights = {}
+    total_weight = 0
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        if chunk_result is None:
+            continue
+        label, score = chunk_result
+        weight = estimate_tokens(chunk) or 1
+        label_weights[label] = label_weights.get(label, 0.0) + weight * score
+        total_weight += weight
+
+    if not label_weights:
+        return None
+    label = max(label_weights, key=label_weights.get)
+    score = label_weights[label] / total_weight
+    return label, score, score
+
 def analyze_sentiment_vader(text: str):
     """VADER sentiment analysis fallback"""
-    scores = vader_analyzer.polarity_scores(text)
+    return _vader_result(vader_analyzer.polarity_scores(text))
+
+def _vader_result(scores: dict):
     compound = scores['compound']
     
     if compound >= 0.05:
@@ -67,8 +119,36 @@ def analyze_sentiment_vader(text: str):
     confidence = abs(compound)
     return label, compound, confidence
 
-async def analyze_sentiment(text: str):
-    """Main sentiment analysis function with HF API and VADER fallback"""
+def cascade_escalation_reason(text: str, scores: dict):
+    """Return why a comment needs the remote model, or None if VADER's answer is clear"""
+    if estimate_tokens(text) > CASCADE_MAX_TOKENS:
+        return "long"
+    if scores['pos'] >= CASCADE_MIXED_THRESHOLD and scores['neg'] >= CASCADE_MIXED_THRESHOLD:
+        return "mixed"
+    if CONTRAST_MARKERS.search(text):
+        return "contrast"
+    if abs(scores['compound']) < CASCADE_VADER_THRESHOLD:
+        return "low_confidence"
+    return None
+
+@traced()
+@coalesce("sentiment")
+@cached("sentiment", decode=tuple)
+async def analyze_sentiment(text: str, cascade: bool = SENTIMENT_CASCADE_ENABLED):
+    """
+    Main sentiment analysis function with HF API and VADER fallback. In
+    cascade mode (SENTIMENT_CASCADE_ENABLED or `cascade=True`) clearly polar
+    comments are answered by VADER and only ambiguous ones reach HF.
+    """
+    if cascade and HF_API_TOKEN:
+        with span("cascade.sentiment"):
+            scores = vader_analyzer.polarity_scores(text)
+            reason = cascade_escalation_reason(text, scores)
+        if reason is None:
+            note_cascade("local", "clear")
+            return _vader_result(scores)
+        note_cascade("escalated", reason)
+
     try:
         # Try Hugging Face API first
         hf_result = await analyze_sentiment_hf_api(text)
@@ -77,17 +157,23 @@ async def analyze_sentiment(text: str):
         
         # Fallback to VADER
         logger.info("Using VADER fallback due to low confidence or no result from HF API")
-        return analyze_sentiment_vader(text)
+        note_fallback("sentiment")
+        with FALLBACK_SECONDS.time(stage="sentiment"), span("fallback.sentiment"):
+            return analyze_sentiment_vader(text)
         
         
     except (httpx.ConnectError, httpx.ConnectTimeout, socket.gaierror):
         # Explicitly handle network errors by using VADER directly
         logger.warning("Network error connecting to HF API, using VADER fallback")
-        return analyze_sentiment_vader(text)
+        note_fallback("sentiment")
+        with FALLBACK_SECONDS.time(stage="sentiment"), span("fallback.sentiment"):
+            return analyze_sentiment_vader(text)
     except Exception as e:
         logger.error(f"Sentiment analysis failed: {str(e)}")
         # Final fallback to VADER
-        return analyze_sentiment_vader(text)
+        note_fallback("sentiment")
+        with FALLBACK_SECONDS.time(stage="sentiment"), span("fallback.sentiment"):
+            return analyze_sentiment_vader(text)
 
 def nltk_fallback(text: str):
     """Legacy function for backward compatibility"""
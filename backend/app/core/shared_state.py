@@ -0,0 +1,195 @@
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# State that must be shared between worker processes: the NLP result cache
+# and the HF token buckets. "memory" is per-process and fine for a single
+# worker; "sqlite" coordinates workers on one host; "redis" spans hosts.
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "memory").lower()
+SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", os.path.join("outputs", "shared_state.db"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+MEMORY_CACHE_MAX_ENTRIES = int(os.getenv("MEMORY_CACHE_MAX_ENTRIES", "10000"))
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate: float, capacity: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_entries: int = MEMORY_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def cache_get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return value
+
+    def cache_set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._cache[key] = (value, time.time() + ttl)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def take_tokens(self, bucket: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        """Take tokens from a bucket; returns 0 if granted, else seconds to wait before retrying"""
+        now = time.time()
+        with self._lock:
+            available, updated_at = self._buckets.get(bucket, (capacity, now))
+            available = _refill(available, updated_at, now, rate, capacity)
+            if available >= tokens:
+                self._buckets[bucket] = (available - tokens, now)
+                return 0.0
+            self._buckets[bucket] = (available, now)
+            return (tokens - available) / rate
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, path: str = SHARED_STATE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS nlp_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        conn.execute("CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections aren't thread-safe
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def cache_get(self, key: str) -> Optional[str]:
+        row = self._conn().execute(
+            "SELECT value FROM nlp_cache WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def cache_set(self, key: str, value: str, ttl: float):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("INSERT OR REPLACE INTO nlp_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl))
+        # Occasionally sweep expired entries instead of running a separate job
+        if random.random() < 0.001:
+            conn.execute("DELETE FROM nlp_cache WHERE expires_at < ?", (now,))
+
+    def take_tokens(self, bucket: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        conn = self._conn()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock, making read-modify-write atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (bucket,)).fetchone()
+            available = _refill(row[0], row[1], now, rate, capacity) if row else capacity
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / rate
+            conn.execute("INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                         (bucket, available, now))
+            conn.execute("COMMIT")
+            return wait
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class RedisBackend:
+    """
+    Redis adapter. Any Redis-compatible server works; for local testing
+    REDIS_URL=fakeredis:// uses the in-process fakeredis stand-in.
+    """
+    name = "redis"
+
+    def __init__(self, url: str = REDIS_URL):
+        if url.startswith("fakeredis://"):
+            import fakeredis
+            self.client = fakeredis.FakeRedis(decode_responses=True)
+        else:
+            import redis
+            self.client = redis.Redis.from_url(url, decode_responses=True)
+
+    def cache_get(self, key: str) -> Optional[str]:
+        return self.client.get(f"nlp_cache:{key}")
+
+    def cache_set(self, key: str, value: str, ttl: float):
+        self.client.set(f"nlp_cache:{key}", value, ex=max(1, int(ttl)))
+
+    def take_tokens(self, bucket: str, rate: float, capacity: float, tokens: float = 1.0) -> float:
+        from redis.exceptions import WatchError
+
+        key = f"token_bucket:{bucket}"
+        with self.client.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    state = pipe.hgetall(key)
+                    now = time.time()
+                    available = capacity
+                    if state:
+                        available = _refill(float(state["tokens"]), float(state["updated_at"]), now, rate, capacity)
+                    wait = 0.0
+                    if available >= tokens:
+                        available -= tokens
+                    else:
+                        wait = (tokens - available) / rate
+                    pipe.multi()
+                    pipe.hset(key, mapping={"tokens": available, "updated_at": now})
+                    pipe.expire(key, 3600)
+                    pipe.execute()
+                    return wait
+                except WatchError:
+                    continue
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Return the configured shared-state backend, falling back to memory if it can't start"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                try:
+                    if SHARED_STATE_BACKEND == "sqlite":
+                        _backend = SQLiteBackend()
+                    elif SHARED_STATE_BACKEND == "redis":
+                        _backend = RedisBackend()
+                    else:
+                        _backend = MemoryBackend()
+                except Exception as e:
+                    logger.warning(f"Shared state backend '{SHARED_STATE_BACKEND}' unavailable ({str(e)}), using in-process memory")
+                    _backend = MemoryBackend()
+                logger.info(f"Using {_backend.name} shared state backend")
+    return _backend
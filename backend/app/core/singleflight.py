@@ -0,0 +1,58 @@
+import asyncio
+import functools
+import inspect
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from core.metrics import CACHE_HITS_TOTAL, CACHE_MISSES_TOTAL
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key onto one in-flight task.
+    Nothing is cached: once the task finishes the next call runs again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            CACHE_HITS_TOTAL.inc(cache=f"inflight_{self.name}")
+        else:
+            CACHE_MISSES_TOTAL.inc(cache=f"inflight_{self.name}")
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller being cancelled doesn't cancel the shared call
+        return await asyncio.shield(task)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+def coalesce(name: str):
+    """
+    Decorator routing an async function through a SingleFlight keyed by its
+    bound arguments, e.g. (text, top_n) for keyword extraction.
+    """
+    def decorator(fn):
+        group = SingleFlight(name)
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not SINGLEFLIGHT_ENABLED:
+                return await fn(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(bound.arguments.items())
+            return await group.do(key, lambda: fn(*args, **kwargs))
+
+        wrapper.singleflight = group
+        return wrapper
+    return decorator
@@ -0,0 +1,231 @@
+import codecs
+import csv
+import json
+import logging
+from typing import AsyncIterator, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CSV_CONTENT_TYPES = ("text/csv", "application/csv")
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+JSON_CONTENT_TYPES = ("application/json",)
+
+# A single array element larger than this is treated as malformed input
+MAX_JSON_RECORD_CHARS = 1024 * 1024
+# Likewise for an NDJSON line or CSV record, which may be missing its newline or closing quote
+MAX_LINE_CHARS = MAX_JSON_RECORD_CHARS
+
+
+def detect_format(content_type: Optional[str] = None, filename: Optional[str] = None) -> Optional[str]:
+    """Work out whether an upload is CSV, NDJSON or JSON from its name or content type"""
+    if filename:
+        lowered = filename.lower()
+        if lowered.endswith(".csv"):
+            return "csv"
+        if lowered.endswith((".ndjson", ".jsonl")):
+            return "ndjson"
+        if lowered.endswith(".json"):
+            return "json"
+    if content_type:
+        content_type = content_type.split(";")[0].strip().lower()
+        if content_type in CSV_CONTENT_TYPES:
+            return "csv"
+        if content_type in NDJSON_CONTENT_TYPES:
+            return "ndjson"
+        if content_type in JSON_CONTENT_TYPES:
+            return "json"
+    return None
+
+
+def _line(parts: list) -> str:
+    line = b"".join(parts)
+    if len(line) > MAX_LINE_CHARS:
+        raise ValueError(f"Input line exceeds {MAX_LINE_CHARS} bytes")
+    return line.rstrip(b"\r").decode("utf-8-sig")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Yield decoded lines from a byte stream without buffering the whole body.
+    Only each new chunk is scanned for newlines, and a line that grows past
+    MAX_LINE_CHARS bytes is rejected with ValueError.
+    """
+    parts = []
+    size = 0
+    async for chunk in chunks:
+        start = 0
+        end = chunk.find(b"\n")
+        while end >= 0:
+            parts.append(chunk[start:end])
+            yield _line(parts)
+            parts, size = [], 0
+            start = end + 1
+            end = chunk.find(b"\n", start)
+        if start < len(chunk):
+            parts.append(chunk[start:])
+            size += len(chunk) - start
+            if size > MAX_LINE_CHARS:
+                raise ValueError(f"Input line exceeds {MAX_LINE_CHARS} bytes")
+    if parts:
+        yield _line(parts)
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict]:
+    """Yield one JSON object per non-empty line"""
+    line_no = 0
+    async for line in iter_lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_no}: {str(e)}")
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {line_no} is not a JSON object")
+        yield record
+
+
+async def iter_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[Dict]:
+    """Yield one dict per CSV record, keyed by the lowercased header row"""
+    header = None
+    pending = []
+    quotes = 0
+    size = 0
+    async for line in iter_lines(chunks):
+        # Quoted fields may contain newlines; keep reading until quotes balance
+        pending.append(line)
+        quotes += line.count('"')
+        size += len(line) + 1
+        if quotes % 2:
+            if size > MAX_LINE_CHARS:
+                raise ValueError(f"CSV record exceeds {MAX_LINE_CHARS} characters; is a quote left open?")
+            continue
+        record = "\n".join(pending)
+        pending, quotes, size = [], 0, 0
+        if not record.strip():
+            continue
+
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [value.strip().lower() for value in values]
+            continue
+        yield dict(zip(header, values))
+
+    if pending:
+        raise ValueError("CSV input ended inside a quoted field")
+
+
+class _JSONStream:
+    """Incrementally decoded text buffer over a byte stream, consumed left to right"""
+
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    async def fill(self) -> bool:
+        """Read one more chunk; returns False once the input is exhausted"""
+        if self.eof:
+            return False
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self.eof = True
+            self.buffer = self.buffer[self.pos:] + self._utf8.decode(b"", final=True)
+            self.pos = 0
+            return False
+        # Drop consumed text so the buffer only ever holds the unparsed tail
+        self.buffer = self.buffer[self.pos:] + self._utf8.decode(chunk)
+        self.pos = 0
+        return True
+
+    async def peek(self) -> str:
+        """Skip whitespace and return the next character, or "" at end of input"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not await self.fill():
+                return ""
+
+    async def expect(self, char: str):
+        found = await self.peek()
+        if found != char:
+            raise ValueError(f"Invalid JSON: expected '{char}' but found '{found or 'end of input'}'")
+        self.pos += 1
+
+    async def value(self):
+        """Decode the next complete JSON value, reading more input until it parses"""
+        await self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if len(self.buffer) - self.pos > MAX_JSON_RECORD_CHARS:
+                    raise ValueError(f"JSON value exceeds {MAX_JSON_RECORD_CHARS} characters")
+                if not await self.fill():
+                    raise ValueError(f"Invalid JSON: {str(e)}")
+                continue
+            # A bare number may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and not isinstance(value, (dict, list, str)):
+                if await self.fill():
+                    continue
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            self.pos = end
+            return value
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes], key: Optional[str] = None) -> AsyncIterator[Dict]:
+    """
+    Yield the objects of a JSON array one at a time as the body arrives. The
+    array may be the whole document or, when `key` is given, the value of
+    that top-level field, e.g. {"comments": [...]}. Other top-level fields
+    before it are skipped; anything after it is not read.
+    """
+    stream = _JSONStream(chunks)
+    first = await stream.peek()
+    if first == "{" and key:
+        await stream.expect("{")
+        while True:
+            if await stream.peek() == "}":
+                raise ValueError(f"JSON object has no '{key}' array")
+            name = await stream.value()
+            await stream.expect(":")
+            if name == key:
+                break
+            await stream.value()
+            if await stream.peek() == ",":
+                stream.pos += 1
+    await stream.expect("[")
+
+    index = 0
+    if await stream.peek() == "]":
+        return
+    while True:
+        record = await stream.value()
+        if not isinstance(record, dict):
+            raise ValueError(f"Array element {index} is not a JSON object")
+        yield record
+        index += 1
+        separator = await stream.peek()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Invalid JSON: expected ',' or ']' after array element {index - 1}")
+        stream.pos += 1
+
+
+def iter_records(chunks: AsyncIterator[bytes], fmt: str, key: Optional[str] = None) -> AsyncIterator[Dict]:
+    if fmt == "csv":
+        return iter_csv(chunks)
+    if fmt == "ndjson":
+        return iter_ndjson(chunks)
+    if fmt == "json":
+        return iter_json_array(chunks, key)
+    raise ValueError(f"Unsupported input format: {fmt}")
@@ -1,4 +1,5 @@
 import os
+import asyncio
 import httpx
 from dotenv import load_dotenv
 import logging
@@ -6,6 +7,13 @@ import re
 import nltk
 from nltk.tokenize import sent_tokenize
 from typing import List
+from core.chunking import split_text
+from core.progress import note_fallback
+from core.metrics import FALLBACK_SECONDS, ERRORS_TOTAL
+from core.tracing import span, traced
+from core.singleflight import coalesce
+from core.nlp_cache import cached
+from core import hf_client
 
 load_dotenv()
 logger = logging.getLogger(__name__)
@@ -17,8 +25,12 @@ HF_API_TOKEN = os.getenv("HF_API_TOKEN")
 if not HF_API_TOKEN:
     logger.warning("HF_API_TOKEN is missing in .env file, will use fallback summarization")
 
-HF_SUMMARIZER_URL = "https://api-inference.huggingface.co/models/sshleifer/distilbart-cnn-12-6"
+HF_API_BASE_URL = os.getenv("HF_API_BASE_URL", "https://api-inference.huggingface.co")
+HF_SUMMARIZER_URL = f"{HF_API_BASE_URL}/models/sshleifer/distilbart-cnn-12-6"
 headers = {"Authorization": f"Bearer {HF_API_TOKEN}"} if HF_API_TOKEN else {}
+# distilbart accepts 1024 tokens
+HF_SUMMARIZER_MAX_TOKENS = int(os.getenv("HF_SUMMARIZER_MAX_TOKENS", "900"))
+HF_SUMMARY_MAX_ROUNDS = 3
 
 
 def fallback_summarize(text: str, max_sentences: int = 3) -> str:
@@ -47,16 +59,8 @@ def fallback_summarize(text: str, max_sentences: int = 3) -> str:
     
     return " ".join(summary_sentences)
 
-async def generate_summary(text: str, max_length: int = 130, min_length: int = 30) -> str:
-    """Generate summary using Hugging Face API with fallback."""
-    if not text:
-        return ""
-
-    # If no API token, use fallback immediately
-    if not HF_API_TOKEN:
-        logger.info("No HF API token available, using fallback summarization")
-        return fallback_summarize(text)
-
+async def _request_summary(client: httpx.AsyncClient, text: str, max_length: int, min_length: int) -> str:
+    """Summarise a single chunk that fits within the model input limit"""
     payload = {
         "inputs": text,
         "parameters": {
@@ -66,18 +70,59 @@ async def generate_summary(text: str, max_length: int = 130, min_length: int = 3
         }
     }
 
-    try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(HF_SUMMARIZER_URL, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
+    response = await hf_client.post(client, HF_SUMMARIZER_URL, "summary", headers=headers, json=payload)
+    response.raise_for_status()
+    result = response.json()
+
+    if isinstance(result, dict) and "error" in result:
+        raise ValueError(f"Hugging Face API Error: {result['error']}")
+
+    return result[0]["summary_text"]
 
-        if isinstance(result, dict) and "error" in result:
-            logger.warning(f"Hugging Face API Error: {result['error']}, using fallback")
+@traced()
+@coalesce("summary")
+@cached("summary")
+async def generate_summary(text: str, max_length: int = 130, min_length: int = 30) -> str:
+    """Generate summary using Hugging Face API with fallback."""
+    if not text:
+        return ""
+
+    # If no API token, use fallback immediately
+    if not HF_API_TOKEN:
+        logger.info("No HF API token available, using fallback summarization")
+        note_fallback("summary")
+        with FALLBACK_SECONDS.time(stage="summary"), span("fallback.summary"):
             return fallback_summarize(text)
 
-        return result[0]["summary_text"]
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            # Long inputs: summarise each chunk concurrently, then summarise
+            # the joined partial summaries until they fit in one request.
+            # `text` stays the original input for the fallback below.
+            reduced = text
+            for _ in range(HF_SUMMARY_MAX_ROUNDS):
+                chunks = split_text(reduced, HF_SUMMARIZER_MAX_TOKENS)
+                if len(chunks) == 1:
+                    break
+                partials = await asyncio.gather(*(
+                    _request_summary(client, chunk, max_length, min(min_length, max_length // 2))
+                    for chunk in chunks
+                ))
+                reduced = " ".join(partials)
+            else:
+                chunks = split_text(reduced, HF_SUMMARIZER_MAX_TOKENS)
+                if len(chunks) > 1:
+                    # Still over the model limit after the last round: keep the first window
+                    # rather than send a request the model would reject or cut silently
+                    logger.warning(f"Partial summaries still span {len(chunks)} chunks after "
+                                   f"{HF_SUMMARY_MAX_ROUNDS} rounds; truncating to the model limit")
+                    reduced = chunks[0]
+
+            return await _request_summary(client, reduced, max_length, min_length)
 
     except Exception as e:
         logger.warning(f"Summarization API failed: {str(e)}, using fallback")
-        return fallback_summarize(text)
\ No newline at end of file
+        ERRORS_TOTAL.inc(stage="hf_summary")
+        note_fallback("summary")
+        with FALLBACK_SECONDS.time(stage="summary"), span("fallback.summary"):
+            return fallback_summarize(text)
@@ -0,0 +1,119 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Opt-in request tracing. When a request asks for profiling, a Trace is bound
+# to the request context and every span() below records a Chrome trace event.
+# Without an active trace span() is a no-op.
+
+PROFILE_HISTORY = int(os.getenv("PROFILE_HISTORY", "50"))
+
+current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    def __init__(self, trace_id: str, name: str):
+        self.trace_id = trace_id
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.events = []
+        self._lanes: Dict = {}
+        self._lock = threading.Lock()
+
+    def _lane(self) -> int:
+        # Concurrent tasks get their own lane so spans nest correctly per lane
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        key = ("task", id(task)) if task else ("thread", threading.get_ident())
+        with self._lock:
+            if key not in self._lanes:
+                self._lanes[key] = len(self._lanes) + 1
+            return self._lanes[key]
+
+    def add(self, name: str, start: float, end: float, args: Optional[Dict] = None):
+        event = {
+            "name": name,
+            "cat": name.split(".")[0],
+            "ph": "X",
+            "ts": round((start - self.started) * 1e6, 1),
+            "dur": round((end - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": self._lane()
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def to_chrome_trace(self) -> Dict:
+        """Chrome trace-event JSON, also importable by speedscope and Perfetto"""
+        with self._lock:
+            events = list(self.events)
+        metadata = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": self.name}}]
+        return {
+            "traceEvents": metadata + sorted(events, key=lambda e: e["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.trace_id, "started_at": self.wall_started}
+        }
+
+
+TRACES: "OrderedDict[str, Trace]" = OrderedDict()
+
+
+def start_trace(name: str) -> Trace:
+    trace = Trace(uuid.uuid4().hex, name)
+    TRACES[trace.trace_id] = trace
+    while len(TRACES) > PROFILE_HISTORY:
+        TRACES.popitem(last=False)
+    return trace
+
+
+def get_trace(trace_id: str) -> Optional[Trace]:
+    return TRACES.get(trace_id)
+
+
+@contextmanager
+def span(name: str, **args):
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        args["error"] = f"{type(e).__name__}: {str(e)}"
+        raise
+    finally:
+        trace.add(name, start, time.perf_counter(), args or None)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator recording a span around each call of a sync or async function"""
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -6,6 +6,8 @@ import logging
 import json
 from typing import Dict, List, Optional, Union
 
+from core.metrics import SUPABASE_SECONDS
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -51,7 +53,8 @@ def store_comment(comment_text: str, legislation_id: str, stakeholder_id: str, s
         }
 
         with httpx.Client() as client:
-            response = client.post(COMMENTS_URL, headers=headers, json=data)
+            with SUPABASE_SECONDS.time(operation="store_comment"):
+                response = client.post(COMMENTS_URL, headers=headers, json=data)
             response.raise_for_status()
             logger.info(f"Comment stored successfully for legislation {legislation_id}.")
             return response.json()
@@ -84,7 +87,8 @@ def store_sentiment_analysis(comment_id: str, sentiment_score: float, sentiment_
         }
 
         with httpx.Client(timeout=10.0) as client:
-            response = client.post(SENTIMENTS_URL, headers=headers, json=data)
+            with SUPABASE_SECONDS.time(operation="store_sentiment_analysis"):
+                response = client.post(SENTIMENTS_URL, headers=headers, json=data)
             response.raise_for_status()
             logger.info(f"Sentiment analysis stored successfully for comment {comment_id}.")
             return response.json()
@@ -114,7 +118,8 @@ def store_summary(legislation_id: str, summary_text: str, summary_type: str, com
         }
 
         with httpx.Client() as client:
-            response = client.post(SUMMARIES_URL, headers=headers, json=data)
+            with SUPABASE_SECONDS.time(operation="store_summary"):
+                response = client.post(SUMMARIES_URL, headers=headers, json=data)
             response.raise_for_status()
             logger.info(f"Summary stored successfully for legislation {legislation_id}.")
             return response.json()
@@ -140,7 +145,8 @@ def store_word_cloud_data(legislation_id: str, word_data: List[Dict], source_typ
         }
 
         with httpx.Client() as client:
-            response = client.post(WORDCLOUD_URL, headers=headers, json=data)
+            with SUPABASE_SECONDS.time(operation="store_word_cloud_data"):
+                response = client.post(WORDCLOUD_URL, headers=headers, json=data)
             response.raise_for_status()
             logger.info(f"Word cloud data stored successfully for legislation {legislation_id}.")
             return response.json()
@@ -171,6 +177,21 @@ def get_comments(legislation_id: str, limit: int = 100, offset: int = 0, filters
         logger.error(f"Failed to retrieve comments: {str(e)}")
         raise
 
+# Retrieve every stakeholder comment for a legislation, paging through the REST API.
+def get_all_comments(legislation_id: str, page_size: int = 1000,
+                     columns: str = "id,comment_text,section_reference,created_at") -> List[Dict]:
+
+    comments = []
+    offset = 0
+    while True:
+        with SUPABASE_SECONDS.time(operation="get_comments"):
+            page = get_comments(legislation_id, limit=page_size, offset=offset,
+                                filters={"select": columns, "order": "created_at.asc,id.asc"})
+        comments.extend(page)
+        if len(page) < page_size:
+            return comments
+        offset += page_size
+
 # Retrieve sentiment analysis results.
 def get_sentiment_analysis(comment_ids: Optional[List[str]] = None, 
                           legislation_id: Optional[str] = None,
@@ -207,6 +228,48 @@ def get_sentiment_analysis(comment_ids: Optional[List[str]] = None,
         logger.error(f"Failed to retrieve sentiment analysis: {str(e)}")
         raise
 
+# Page through the sentiment analysis results of a legislation's comments, joined with the comment rows.
+# Every analysis inserts a new row, so by default only the latest one per comment is yielded.
+def iter_sentiment_results(legislation_id: str, page_size: int = 1000, latest_only: bool = True):
+
+    rows = _iter_sentiment_pages(legislation_id, page_size)
+    if not latest_only:
+        yield from rows
+        return
+    # Rows come ordered by comment_id then analyzed_at, so the last of each run is the latest
+    previous = None
+    for row in rows:
+        if previous is not None and row.get("comment_id") != previous.get("comment_id"):
+            yield previous
+        previous = row
+    if previous is not None:
+        yield previous
+
+def _iter_sentiment_pages(legislation_id: str, page_size: int):
+
+    offset = 0
+    while True:
+        params = {
+            "select": "*,stakeholder_comments!inner(comment_text,section_reference,legislation_id)",
+            "stakeholder_comments.legislation_id": f"eq.{legislation_id}",
+            "order": "comment_id.asc,analyzed_at.asc",
+            "limit": page_size,
+            "offset": offset
+        }
+        try:
+            with httpx.Client(timeout=30.0) as client:
+                with SUPABASE_SECONDS.time(operation="get_sentiment_analysis"):
+                    response = client.get(SENTIMENTS_URL, headers=headers, params=params)
+                response.raise_for_status()
+                page = response.json()
+        except Exception as e:
+            logger.error(f"Failed to retrieve sentiment analysis: {str(e)}")
+            raise
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += page_size
+
 # Retrieve generated summaries for a legislation.
 def get_summaries(legislation_id: str, summary_type: Optional[str] = None) -> List[Dict]:
 
@@ -0,0 +1,24 @@
+# Multi-worker deployment: gunicorn -c gunicorn.conf.py main:app
+# Workers share the NLP cache and HF rate limits through the shared-state
+# backend (core/shared_state.py), which defaults to SQLite here since the
+# in-process memory backend can't coordinate across workers.
+import multiprocessing
+import os
+
+os.environ.setdefault("SHARED_STATE_BACKEND", "sqlite")
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(4, multiprocessing.cpu_count()))))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = int(os.getenv("WORKER_TIMEOUT", "300"))
+graceful_timeout = 30
+keepalive = 5
+
+# Bound slow memory growth in long-lived workers: core/recycling.py restarts
+# a worker after WORKER_MAX_REQUESTS requests or once its RSS passes
+# WORKER_MAX_RSS_MB, waiting for its background jobs to finish first.
+# gunicorn's own max_requests stays off since it doesn't wait for them.
+os.environ.setdefault("WORKER_RECYCLING", "true")
+os.environ.setdefault("WORKER_MAX_REQUESTS", "5000")
+os.environ.setdefault("WORKER_MAX_REQUESTS_JITTER", "500")
+max_requests = 0
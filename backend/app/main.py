@@ -1,6 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from api import summariser, keyword, sentiment, wordcloud, excel_processor
+from fastapi.responses import JSONResponse, PlainTextResponse
+from api import summariser, keyword, sentiment, wordcloud, excel_processor, stream_processor, jobs, profiles, analyze, search, sections, export
+from api.compression import CompressionMiddleware
+from core.metrics import render as render_metrics, HTTP_REQUESTS_TOTAL, HTTP_REQUEST_SECONDS, PROCESS_RSS_BYTES
+from core.admission import Overloaded
+from core.recycling import recycler, rss_bytes
+from core.tracing import current_trace, start_trace, span
+import time
 import uvicorn
 
 app = FastAPI(
@@ -24,15 +31,63 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "X-Requested-With", "Content-Disposition"],
-    expose_headers=["Content-Disposition", "Content-Type", "Content-Length"]  # Important for file downloads
+    allow_headers=["Content-Type", "Authorization", "Accept", "Origin", "X-Requested-With", "Content-Disposition", "X-Profile"],
+    expose_headers=["Content-Disposition", "Content-Type", "Content-Length", "X-Profile-Id", "X-Row-Count"]  # Important for file downloads
 )
 
+# gzip/brotli for large single-body responses (COMPRESSION_MIN_SIZE); streams pass through
+app.add_middleware(CompressionMiddleware)
+
+@app.middleware("http")
+async def record_request_timing(request: Request, call_next):
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by route template so path parameters don't explode cardinality
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, path=path)
+        HTTP_REQUESTS_TOTAL.inc(method=request.method, path=path, status=status_code)
+        recycler.request_finished()
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
+    """Record a span tree for requests sent with `X-Profile: 1` or `?profile=1`"""
+    flag = request.headers.get("x-profile") or request.query_params.get("profile")
+    if not flag or flag.lower() not in ("1", "true", "yes"):
+        return await call_next(request)
+
+    trace = start_trace(f"{request.method} {request.url.path}")
+    token = current_trace.set(trace)
+    try:
+        with span("request", method=request.method, path=request.url.path):
+            response = await call_next(request)
+    finally:
+        current_trace.reset(token)
+    response.headers["X-Profile-Id"] = trace.trace_id
+    return response
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Saturated endpoints answer 429 with a Retry-After estimated from their backlog"""
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
+
 app.include_router(summariser.router, prefix="/api", tags=["Summarization"])
 app.include_router(keyword.router, prefix="/api", tags=["Keyword Extraction"])
 app.include_router(sentiment.router, prefix="/api", tags=["Sentiment Analysis"])
 app.include_router(wordcloud.router, prefix="/api", tags=["Word Cloud Generation"])
 app.include_router(excel_processor.router, prefix="/api", tags=["Excel Processing"])
+app.include_router(analyze.router, prefix="/api", tags=["Combined Analysis"])
+app.include_router(stream_processor.router, prefix="/api", tags=["Stream Processing"])
+app.include_router(search.router, prefix="/api", tags=["Search"])
+app.include_router(sections.router, prefix="/api", tags=["Section Analytics"])
+app.include_router(export.router, prefix="/api", tags=["Export"])
+app.include_router(jobs.router, prefix="/api", tags=["Jobs"])
+app.include_router(profiles.router, prefix="/api", tags=["Profiling"])
 
 @app.get("/status")
 async def status():
@@ -42,6 +97,11 @@ async def status():
 async def api_status():
     return {"message": "E-Consultation AI API is running", "status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    PROCESS_RSS_BYTES.set(rss_bytes())
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "E-Consultation AI Backend", "version": "1.0.0"}
@@ -49,4 +109,10 @@ async def root():
 if __name__ == "__main__":
     import os
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    if workers > 1:
+        # Workers re-import the app, so shared state has to live outside the process
+        os.environ.setdefault("SHARED_STATE_BACKEND", "sqlite")
+        uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""
+Compare the Excel output engines of core.process_excel.write_workbook.
+
+Builds an analysed sheet from synthetic rows (stage columns filled, word
+clouds on the first --image-rows rows) and writes it with each engine in a
+fresh subprocess, so peak RSS is not skewed by earlier runs:
+
+    cd backend
+    python benchmarks/bench_excel_write.py --sizes 10000 100000
+    python benchmarks/bench_excel_write.py --sizes 10000 --engines xlsxwriter --output benchmarks/results/excel_write.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+ENGINES = ("openpyxl", "xlsxwriter")
+# Distinct word cloud images; rows cycle through them like clustered comments do
+DISTINCT_IMAGES = 10
+
+
+def build_sheet(size: int, image_rows: int):
+    import pandas as pd
+    from core.process_excel import ALL_STAGES, stage_columns
+    from core.result_table import ResultTable
+    from core.wordcloud_gen import create_wordcloud
+    from synthetic import make_rows
+
+    df = pd.DataFrame(make_rows(size))
+    labels = ("Positive", "Negative", "Neutral")
+    table = ResultTable(size)
+    images = [create_wordcloud(f"policy section {i} burden privacy consent").getvalue()
+              for i in range(min(DISTINCT_IMAGES, image_rows))]
+    for row, comment in enumerate(df["comment"]):
+        result = {
+            "keywords": comment.split()[:5],
+            "sentiment": labels[row % 3],
+            "sentiment_score": (row % 200) / 100 - 1,
+            "confidence": 0.5 + (row % 50) / 100,
+            "summary": comment[:120]
+        }
+        if row < image_rows:
+            result["wordcloud"] = images[row % len(images)]
+        table.set(row, result)
+
+    rep_of = list(range(size))
+    df["cluster_id"] = df["comment_id"]
+    df["cluster_size"] = 1
+    for column in stage_columns(ALL_STAGES):
+        df[column] = table.column(column, rep_of)
+    return [("Sheet1", df, table, rep_of)]
+
+
+def run_case(engine: str, size: int, image_rows: int) -> dict:
+    """Runs in the worker subprocess: time one write_workbook call and sample its RSS"""
+    from core.process_excel import write_workbook, buffer_size
+    from run_benchmarks import RssSampler, summarise
+
+    sheets = build_sheet(size, image_rows)
+    with tempfile.TemporaryFile() as output:
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            write_workbook(sheets, output, engine=engine)
+            elapsed = time.perf_counter() - start
+        output_bytes = buffer_size(output)
+    sheets[0][2].close()
+    return summarise(size, elapsed, [], sampler, engine=engine, image_rows=image_rows, output_bytes=output_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--engines", choices=ENGINES, nargs="+", default=list(ENGINES))
+    parser.add_argument("--image-rows", type=int, default=500,
+                        help="Rows that carry a word cloud image")
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results", f"excel_write_{datetime.now():%Y%m%d_%H%M%S}.json"))
+    parser.add_argument("--worker", nargs=2, metavar=("ENGINE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        engine, size = args.worker
+        print(json.dumps(run_case(engine, int(size), args.image_rows)))
+        return
+
+    results = {}
+    for size in args.sizes:
+        for engine in args.engines:
+            print(f"Writing {size} rows with {engine}...")
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", engine, str(size),
+                 "--image-rows", str(min(args.image_rows, size))],
+                check=True, capture_output=True, text=True
+            )
+            results[f"write_workbook[{engine},{size}]"] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    print(f"\n{'benchmark':40} {'seconds':>10} {'peak MB':>10} {'growth MB':>10} {'output MB':>10}")
+    for name, result in results.items():
+        print(f"{name:40} {result['seconds']:10.2f} {result['peak_rss_mb']:10.1f} "
+              f"{result['rss_growth_mb']:10.1f} {result['output_bytes'] / 1024 / 1024:10.1f}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"meta": {"timestamp": datetime.now().isoformat(), "image_rows": args.image_rows},
+                   "results": results}, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Output size and write time of the columnar exports (core.columnar_export)
+against the Excel writer, on the same analysed synthetic sheet:
+
+    cd backend
+    python benchmarks/bench_export.py --sizes 10000 100000 --image-rows 500
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+WRITERS = ("xlsx", "parquet", "arrow", "parquet+images")
+
+
+def run_case(writer: str, sheets) -> dict:
+    from core.columnar_export import write_export
+    from core.process_excel import buffer_size, write_workbook
+
+    with tempfile.TemporaryFile() as output:
+        start = time.perf_counter()
+        if writer == "xlsx":
+            write_workbook(sheets, output)
+        else:
+            fmt, _, images = writer.partition("+")
+            write_export(sheets, output, fmt, images=bool(images))
+        elapsed = time.perf_counter() - start
+        return {"seconds": round(elapsed, 3), "output_bytes": buffer_size(output)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--writers", choices=WRITERS, nargs="+", default=list(WRITERS))
+    parser.add_argument("--image-rows", type=int, default=500, help="Rows that carry a word cloud image")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    from bench_excel_write import build_sheet
+
+    results = {}
+    print(f"{'benchmark':32} {'seconds':>10} {'output MB':>10} {'vs xlsx':>8}")
+    for size in args.sizes:
+        sheets = build_sheet(size, min(args.image_rows, size))
+        baseline = None
+        for writer in args.writers:
+            name = f"{writer}[{size}]"
+            results[name] = result = run_case(writer, sheets)
+            if writer == "xlsx":
+                baseline = result["output_bytes"]
+            ratio = f"{result['output_bytes'] / baseline:8.3f}" if baseline else f"{'-':>8}"
+            print(f"{name:32} {result['seconds']:10.2f} {result['output_bytes'] / 1024 / 1024:10.2f} {ratio}")
+        sheets[0][2].close()
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"image_rows": args.image_rows, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Query latency of the comment search index (core.search_index).
+
+Indexes synthetic comments into a throwaway index and reports p50/p99
+latency of a fixed query mix, covering text-only, facet-only and combined
+queries:
+
+    cd backend
+    python benchmarks/bench_search.py --size 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+QUERIES = [
+    {"query": "privacy", "sentiment": "Negative", "section": "4"},
+    {"query": "privacy"},
+    {"query": "startups burden", "section": "Section 7"},
+    {"query": "", "sentiment": "Negative"},
+    {"query": "grievance redressal timeline", "sentiment": "Positive"},
+    {"query": "consent min"},
+    {"query": "nonexistentterm"}
+]
+LABELS = ("Positive", "Negative", "Neutral")
+INDEX_BATCH = 5000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Point the index at the temp dir before the module reads its environment
+        os.environ["SEARCH_INDEX_PATH"] = os.path.join(workdir, "search_index.db")
+        os.environ["SEARCH_INDEX_ENABLED"] = "true"
+        from core.search_index import index_comments, search_comments
+        from run_benchmarks import percentile
+        from synthetic import make_rows
+
+        rng = random.Random(11)
+        rows = make_rows(args.size)
+        start = time.perf_counter()
+        for i in range(0, len(rows), INDEX_BATCH):
+            index_comments(({
+                **row, "keywords": row["comment"].split()[2:5], "sentiment": rng.choice(LABELS)
+            } for row in rows[i:i + INDEX_BATCH]), "bench")
+        index_seconds = time.perf_counter() - start
+        print(f"Indexed {args.size} comments in {index_seconds:.1f}s ({args.size / index_seconds:.0f}/s)")
+
+        results = {}
+        for params in QUERIES:
+            search_comments(**params)  # warm the page cache
+            latencies = []
+            for _ in range(args.repeat):
+                query_start = time.perf_counter()
+                response = search_comments(**params)
+                latencies.append(time.perf_counter() - query_start)
+            name = json.dumps(params, sort_keys=True)
+            results[name] = {
+                "total": response["total"],
+                "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 2)
+            }
+            print(f"{name:80} total={response['total']:>8} p50={results[name]['p50_ms']:7.1f}ms "
+                  f"p99={results[name]['p99_ms']:7.1f}ms")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"size": args.size, "index_seconds": round(index_seconds, 2), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Serialisation time and bytes on the wire of /api/sentiment result bodies:
+the stdlib encoder the endpoint used before, orjson records and the compact
+(parallel arrays) layout, each raw and after gzip/brotli as applied by
+api.compression. Also times FastAPI's default jsonable_encoder + JSONResponse
+path on the same records, which /api/analyze and /api/search went through:
+
+    cd backend
+    python benchmarks/bench_serialization.py --sizes 10000 100000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+SERIALIZERS = ("stdlib", "fastapi-default", "orjson", "orjson-compact")
+
+
+def build_batch(size: int):
+    from core.dedup import cluster_comments, cluster_sizes
+    from core.result_table import ResultTable
+    from synthetic import make_rows
+
+    rng = random.Random(7)
+    rows = make_rows(size)
+    comment_ids = [row["comment_id"] for row in rows]
+    rep_of = cluster_comments([row["comment"] for row in rows])
+    table = ResultTable(size)
+    for idx in set(rep_of):
+        table.set(idx, {
+            "sentiment": rng.choice(("Positive", "Negative", "Neutral")),
+            "sentiment_score": rng.uniform(-1, 1),
+            "confidence": rng.random()
+        })
+    return comment_ids, table, rep_of, cluster_sizes(rep_of)
+
+
+def serialize(serializer: str, comment_ids, table, rep_of, sizes) -> bytes:
+    from api.sentiment import _sentiment_columns, _sentiment_record
+    from core.serialization import dumps
+
+    records = (
+        _sentiment_record(comment_id, table, rep, comment_ids[rep], size)
+        for comment_id, rep, size in zip(comment_ids, rep_of, sizes)
+    )
+    # The stdlib and FastAPI paths build a dict per comment with table.row(), as /api/sentiment did
+    if serializer == "stdlib":
+        return ('{"results":[' + ",".join(json.dumps(record, separators=(",", ":"), default=str) for record in records)
+                + "]}").encode("utf-8")
+    if serializer == "fastapi-default":
+        from fastapi.encoders import jsonable_encoder
+        from fastapi.responses import JSONResponse
+        return JSONResponse(jsonable_encoder({"results": list(records)})).body
+    columns = _sentiment_columns(comment_ids, table, rep_of, sizes)
+    if serializer == "orjson":
+        fields = list(columns)
+        return dumps({"results": [dict(zip(fields, values)) for values in zip(*columns.values())]})
+    return dumps({"results": columns})
+
+
+def timed(fn, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000])
+    parser.add_argument("--serializers", choices=SERIALIZERS, nargs="+", default=list(SERIALIZERS))
+    parser.add_argument("--repeat", type=int, default=5, help="Best of this many runs is reported")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    from api.compression import ENCODINGS, compress
+
+    results = {}
+    encodings = ", ".join(f"{encoding} ms, {encoding} KB" for encoding in ENCODINGS)
+    print(f"{'benchmark':28} {'encode ms':>10} {'raw KB':>10}   {encodings}")
+    for size in args.sizes:
+        batch = build_batch(size)
+        for serializer in args.serializers:
+            name = f"{serializer}[{size}]"
+            seconds, body = timed(lambda: serialize(serializer, *batch), args.repeat)
+            result = results[name] = {"encode_ms": round(seconds * 1000, 2), "raw_bytes": len(body)}
+            columns = []
+            for encoding in ENCODINGS:
+                compress_seconds, compressed = timed(lambda: compress(body, encoding), args.repeat)
+                result[f"{encoding}_ms"] = round(compress_seconds * 1000, 2)
+                result[f"{encoding}_bytes"] = len(compressed)
+                columns.append(f"{compress_seconds * 1000:7.1f} {len(compressed) / 1024:8.1f}")
+            print(f"{name:28} {seconds * 1000:10.1f} {len(body) / 1024:10.1f}   " + "   ".join(columns))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Checks that per-section sentiment distributions count every label the
+sentiment models emit: the HF model's POS/NEG/NEU (answered by
+benchmarks/mock_server.py) and the VADER fallback's POSITIVE/NEGATIVE/NEUTRAL.
+Each section's distribution must have exactly the canonical labels and add
+up to its comment count. Exits with code 1 on a mismatch:
+
+    cd backend
+    python benchmarks/check_section_labels.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from collections import Counter
+from typing import List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from run_benchmarks import start_mock_server  # noqa: E402
+from synthetic import make_rows  # noqa: E402
+
+MODEL_LABELS = {"POS", "NEG", "NEU"}
+VADER_LABELS = {"POSITIVE", "NEGATIVE", "NEUTRAL"}
+
+
+async def run_phase(name: str, rows: List[dict], expected_labels: set) -> List[str]:
+    from core import section_analytics
+
+    emitted = Counter()
+    analyze_comment = section_analytics.analyze_comment
+
+    async def recording(comment, stages):
+        result = await analyze_comment(comment, stages)
+        emitted[result.get("sentiment")] += 1
+        return result
+
+    section_analytics.analyze_comment = recording
+    try:
+        sections = section_analytics.partition_by_section(rows)
+        results = [await section_analytics.analyze_section(section, dedup=False) for section in sections]
+    finally:
+        section_analytics.analyze_comment = analyze_comment
+
+    failures = []
+    if not expected_labels & set(emitted):
+        failures.append(f"{name}: no {sorted(expected_labels)} labels emitted (got {dict(emitted)})")
+    for section, result in zip(sections, results):
+        distribution = result["sentiment"]["distribution"]
+        if set(distribution) != set(section_analytics.SENTIMENT_LABELS):
+            failures.append(f"{name}: section {section.key!r} has labels {sorted(distribution)}")
+        if sum(distribution.values()) != result["comment_count"]:
+            failures.append(f"{name}: section {section.key!r} counts {sum(distribution.values())} "
+                            f"of {result['comment_count']} comments")
+        if result["comment_count"] and abs(sum(result["sentiment"]["percentages"].values()) - 100) > 1:
+            failures.append(f"{name}: section {section.key!r} percentages add up to "
+                            f"{sum(result['sentiment']['percentages'].values())}")
+    print(f"{name}: {sum(emitted.values())} comments in {len(sections)} sections, labels {dict(emitted)}")
+    return failures
+
+
+async def check(rows: int) -> List[str]:
+    from core import sentiment_model
+
+    comments = [{"id": row["comment_id"], "comment_text": row["comment"],
+                 "section_reference": row.get("section_reference")} for row in make_rows(2 * rows)]
+    failures = await run_phase("model", comments[:rows], MODEL_LABELS)
+    # Without a token comments go to VADER; only duplicates of model-phase comments hit the sentiment cache
+    token, sentiment_model.HF_API_TOKEN = sentiment_model.HF_API_TOKEN, None
+    try:
+        failures += await run_phase("vader", comments[rows:], VADER_LABELS)
+    finally:
+        sentiment_model.HF_API_TOKEN = token
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200, help="Comments per phase")
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+    args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate = 2.0, 0.0, 0.0, 0.0
+
+    with tempfile.TemporaryDirectory() as workdir:
+        mock_url = f"http://127.0.0.1:{args.port}"
+        os.environ.update({
+            "HF_API_TOKEN": "check-token",
+            "HF_API_BASE_URL": mock_url,
+            "SUPABASE_URL": mock_url,
+            "SUPABASE_KEY": "check-key",
+            "SEARCH_INDEX_PATH": os.path.join(workdir, "search_index.db")
+        })
+        server = start_mock_server(args.port, args)
+        try:
+            failures = asyncio.run(check(args.rows))
+        finally:
+            server.terminate()
+            server.wait()
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+    else:
+        print("\nAll section distributions use the canonical labels")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
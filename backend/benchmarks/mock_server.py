@@ -0,0 +1,166 @@
+"""
+Local stand-in for the Hugging Face inference API and Supabase REST API.
+
+    python benchmarks/mock_server.py --port 8765 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+
+Point the backend at it with HF_API_BASE_URL=http://127.0.0.1:8765 and
+SUPABASE_URL=http://127.0.0.1:8765. Latency and error rates can also be
+changed at runtime with POST /__config.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+from typing import Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+CONFIG = {
+    "latency_ms": 50.0,
+    "jitter_ms": 20.0,
+    "error_rate": 0.0,
+    "rate_limit_rate": 0.0,
+    "supabase_latency_ms": 10.0
+}
+
+POSITIVE = {"good", "great", "support", "welcome", "excellent", "benefit", "agree", "helpful", "positive", "appreciate"}
+NEGATIVE = {"bad", "oppose", "harm", "against", "poor", "concern", "reject", "unfair", "negative", "burden"}
+
+app = FastAPI(title="Mock HF + Supabase")
+TABLES: Dict[str, List[Dict]] = {}
+STATS = {"hf_requests": 0, "supabase_requests": 0, "errors": 0, "rate_limited": 0}
+
+
+async def _sleep(base_ms: float):
+    delay = max(0.0, random.gauss(base_ms, CONFIG["jitter_ms"])) / 1000.0
+    await asyncio.sleep(delay)
+
+
+def _injected_failure():
+    roll = random.random()
+    if roll < CONFIG["rate_limit_rate"]:
+        STATS["rate_limited"] += 1
+        return JSONResponse({"error": "Rate limit reached"}, status_code=429, headers={"Retry-After": "1"})
+    if roll < CONFIG["rate_limit_rate"] + CONFIG["error_rate"]:
+        STATS["errors"] += 1
+        return JSONResponse({"error": "Model is currently loading", "estimated_time": 1.0}, status_code=503)
+    return None
+
+
+def _sentiment(text: str) -> List[Dict]:
+    words = set(re.findall(r"\w+", text.lower()))
+    pos, neg = len(words & POSITIVE), len(words & NEGATIVE)
+    label = "POS" if pos > neg else "NEG" if neg > pos else "NEU"
+    # Deterministic confidence so repeated runs are comparable
+    confidence = 0.5 + (int(hashlib.md5(text.encode()).hexdigest()[:4], 16) / 0xFFFF) * 0.49
+    rest = (1 - confidence) / 2
+    return [{"label": name, "score": confidence if name == label else rest} for name in ("POS", "NEG", "NEU")]
+
+
+def _keywords(text: str) -> List[Dict]:
+    seen = []
+    for word in re.findall(r"[a-zA-Z]{5,}", text):
+        if word.lower() not in seen:
+            seen.append(word.lower())
+    return [{"entity_group": "KEY", "word": word, "score": 0.9 - i * 0.05} for i, word in enumerate(seen[:10])]
+
+
+def _summary(text: str, max_length: int) -> Dict:
+    words = text.split()
+    return {"summary_text": " ".join(words[:max(5, min(max_length, len(words) // 3))])}
+
+
+@app.post("/models/{model_path:path}")
+async def inference(model_path: str, request: Request):
+    STATS["hf_requests"] += 1
+    await _sleep(CONFIG["latency_ms"])
+    failure = _injected_failure()
+    if failure:
+        return failure
+
+    body = await request.json()
+    inputs = body.get("inputs", "")
+    batched = isinstance(inputs, list)
+    texts = inputs if batched else [inputs]
+
+    # Mirror the inference API's response shapes for each task
+    if "sentiment" in model_path:
+        return [_sentiment(t) for t in texts]
+    if "keyword" in model_path:
+        results = [_keywords(t) for t in texts]
+        return results if batched else results[0]
+    max_length = body.get("parameters", {}).get("max_length", 130)
+    return [_summary(t, max_length) for t in texts]
+
+
+@app.api_route("/rest/v1/{table}", methods=["GET", "POST", "PATCH", "DELETE"])
+async def supabase_table(table: str, request: Request):
+    STATS["supabase_requests"] += 1
+    await _sleep(CONFIG["supabase_latency_ms"])
+    rows = TABLES.setdefault(table, [])
+
+    if request.method == "POST":
+        body = await request.json()
+        records = body if isinstance(body, list) else [body]
+        for record in records:
+            record.setdefault("id", len(rows) + 1)
+            rows.append(record)
+        return JSONResponse(records, status_code=201)
+
+    if request.method == "DELETE":
+        TABLES[table] = []
+        return rows
+
+    limit = int(request.query_params.get("limit", 100))
+    offset = int(request.query_params.get("offset", 0))
+    return rows[offset:offset + limit]
+
+
+@app.post("/__config")
+async def update_config(request: Request):
+    updates = await request.json()
+    for key, value in updates.items():
+        if key in CONFIG:
+            CONFIG[key] = float(value)
+    return CONFIG
+
+
+@app.get("/__stats")
+async def stats():
+    return {**STATS, "tables": {name: len(rows) for name, rows in TABLES.items()}}
+
+
+@app.post("/__reset")
+async def reset():
+    TABLES.clear()
+    for key in STATS:
+        STATS[key] = 0
+    return STATS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=CONFIG["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=CONFIG["jitter_ms"])
+    parser.add_argument("--error-rate", type=float, default=CONFIG["error_rate"])
+    parser.add_argument("--rate-limit-rate", type=float, default=CONFIG["rate_limit_rate"])
+    parser.add_argument("--supabase-latency-ms", type=float, default=CONFIG["supabase_latency_ms"])
+    args = parser.parse_args()
+
+    CONFIG.update({
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "rate_limit_rate": args.rate_limit_rate,
+        "supabase_latency_ms": args.supabase_latency_ms
+    })
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
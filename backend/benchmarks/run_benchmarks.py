@@ -0,0 +1,360 @@
+"""
+Benchmark harness for the core NLP functions and the HTTP endpoints.
+
+Starts benchmarks/mock_server.py as a stand-in for Hugging Face and Supabase,
+generates synthetic consultation sheets and reports rows/s, p50/p99 latency
+and peak RSS for each benchmark. Results are written as JSON so runs can be
+compared for regressions:
+
+    cd backend
+    python benchmarks/run_benchmarks.py --sizes 100 1000 --output benchmarks/results/baseline.json
+    python benchmarks/run_benchmarks.py --sizes 100 1000 --compare benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+APP_DIR = os.path.join(BACKEND_DIR, "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import httpx  # noqa: E402
+
+from synthetic import make_rows, write_sheet  # noqa: E402
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RssSampler:
+    """Samples RSS in a background thread to capture the peak during a benchmark"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start_mb = 0.0
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, _rss_mb())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.start_mb = self.peak_mb = _rss_mb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, _rss_mb())
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarise(rows: int, seconds: float, latencies: List[float], sampler: RssSampler, **extra) -> Dict:
+    result = {
+        "rows": rows,
+        "seconds": round(seconds, 4),
+        "rows_per_sec": round(rows / seconds, 2) if seconds > 0 else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "peak_rss_mb": round(sampler.peak_mb, 1),
+        "rss_growth_mb": round(sampler.peak_mb - sampler.start_mb, 1)
+    }
+    result.update(extra)
+    return result
+
+
+async def timed_calls(items: List, call: Callable, concurrency: int) -> List[float]:
+    """Run call(item) for every item with bounded concurrency, returning per-call latencies"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run(item):
+        async with semaphore:
+            start = time.perf_counter()
+            await call(item)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(run(item) for item in items))
+    return latencies
+
+
+# --- Benchmarks ---
+
+async def bench_core_functions(size: int, concurrency: int) -> Dict[str, Dict]:
+    from core.sentiment_model import analyze_sentiment
+    from core.keyword_model import extract_keywords_async
+    from core.summariser_model import generate_summary
+    from core.wordcloud_gen import create_wordcloud
+
+    comments = [row["comment"] for row in make_rows(size)]
+    results = {}
+    for name, fn in (("analyze_sentiment", analyze_sentiment),
+                     ("extract_keywords_async", extract_keywords_async),
+                     ("generate_summary", generate_summary)):
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            latencies = await timed_calls(comments, fn, concurrency)
+            elapsed = time.perf_counter() - start
+        results[f"{name}[{size}]"] = summarise(size, elapsed, latencies, sampler)
+
+    # Word clouds are CPU-bound; a small sample is representative
+    sample = comments[:min(size, 50)]
+    with RssSampler() as sampler:
+        latencies = []
+        start = time.perf_counter()
+        for comment in sample:
+            call_start = time.perf_counter()
+            create_wordcloud(comment)
+            latencies.append(time.perf_counter() - call_start)
+        elapsed = time.perf_counter() - start
+    results[f"create_wordcloud[{len(sample)}]"] = summarise(len(sample), elapsed, latencies, sampler)
+    return results
+
+
+async def bench_process_excel(size: int, workdir: str) -> Dict[str, Dict]:
+    from core.process_excel import process_excel, buffer_size
+
+    path = write_sheet(os.path.join(workdir, f"sheet_{size}.xlsx"), size)
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        output = await process_excel(path)
+        elapsed = time.perf_counter() - start
+    output_bytes = buffer_size(output)
+    output.close()
+    return {f"process_excel[{size}]": summarise(size, elapsed, [], sampler, output_bytes=output_bytes)}
+
+
+async def bench_process_stream(size: int, concurrency: int) -> Dict[str, Dict]:
+    from core.process_stream import process_records
+
+    async def records():
+        for row in make_rows(size):
+            yield row
+
+    latencies = []
+    first_result = None
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        last = start
+        async for _ in process_records(records(), concurrency):
+            now = time.perf_counter()
+            if first_result is None:
+                first_result = now - start
+            latencies.append(now - last)
+            last = now
+        elapsed = time.perf_counter() - start
+    return {f"process_records[{size}]": summarise(
+        size, elapsed, latencies, sampler,
+        time_to_first_ms=round(first_result * 1000, 2) if first_result is not None else None
+    )}
+
+
+async def bench_endpoints(size: int, concurrency: int, batch_size: int, workdir: str) -> Dict[str, Dict]:
+    from main import app
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        rows = make_rows(size)
+        batches = [
+            {"comments": [{"comment_id": r["comment_id"], "text": r["comment"]} for r in rows[i:i + batch_size]]}
+            for i in range(0, len(rows), batch_size)
+        ]
+
+        async def post_batch(batch):
+            response = await client.post("/api/sentiment", json=batch)
+            response.raise_for_status()
+
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            latencies = await timed_calls(batches, post_batch, concurrency)
+            elapsed = time.perf_counter() - start
+        results[f"POST /api/sentiment[{size}]"] = summarise(size, elapsed, latencies, sampler, batch_size=batch_size)
+
+        path = write_sheet(os.path.join(workdir, f"upload_{size}.xlsx"), size)
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            with open(path, "rb") as f:
+                response = await client.post(
+                    "/api/process-excel",
+                    files={"file": (os.path.basename(path), f, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+                )
+            response.raise_for_status()
+            elapsed = time.perf_counter() - start
+        results[f"POST /api/process-excel[{size}]"] = summarise(size, elapsed, [elapsed], sampler)
+
+        csv_path = write_sheet(os.path.join(workdir, f"upload_{size}.csv"), size)
+        with RssSampler() as sampler:
+            start = time.perf_counter()
+            with open(csv_path, "rb") as f:
+                response = await client.post("/api/process-stream?format=csv", content=f.read(),
+                                             headers={"Content-Type": "text/csv"})
+            response.raise_for_status()
+            elapsed = time.perf_counter() - start
+        results[f"POST /api/process-stream[{size}]"] = summarise(size, elapsed, [elapsed], sampler)
+    return results
+
+
+# --- Mock server and comparison ---
+
+def start_mock_server(port: int, args) -> subprocess.Popen:
+    proc = subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "mock_server.py"),
+        "--port", str(port),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+        "--rate-limit-rate", str(args.rate_limit_rate)
+    ])
+    deadline = time.time() + 15
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/__stats", timeout=0.5)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("Mock server did not start")
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> bool:
+    """Print throughput/latency deltas; return False if anything regressed beyond threshold"""
+    ok = True
+    print(f"\n{'benchmark':45} {'rows/s':>12} {'Δ':>8} {'p99 ms':>10} {'Δ':>8}")
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        line = f"{name:45} {result['rows_per_sec'] or 0:12.2f}"
+        if base.get("rows_per_sec") and result.get("rows_per_sec"):
+            delta = result["rows_per_sec"] / base["rows_per_sec"] - 1
+            line += f" {delta:+8.1%}"
+            if delta < -threshold:
+                ok = False
+        else:
+            line += f" {'':>8}"
+        if base.get("p99_ms") and result.get("p99_ms"):
+            delta = result["p99_ms"] / base["p99_ms"] - 1
+            line += f" {result['p99_ms']:10.1f} {delta:+8.1%}"
+            if delta > threshold:
+                ok = False
+        print(line)
+    return ok
+
+
+async def run_all(args) -> Dict[str, Dict]:
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            print(f"Running benchmarks for {size} rows...")
+            if "core" in args.only:
+                results.update(await bench_core_functions(size, args.concurrency))
+            if "excel" in args.only:
+                results.update(await bench_process_excel(size, workdir))
+            if "stream" in args.only:
+                results.update(await bench_process_stream(size, args.concurrency))
+            if "endpoints" in args.only:
+                results.update(await bench_endpoints(size, args.concurrency, args.batch_size, workdir))
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--only", choices=["core", "excel", "stream", "endpoints"], nargs="+",
+                        default=["core", "excel", "stream", "endpoints"])
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results", f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"))
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--fail-threshold", type=float, default=0.15,
+                        help="Relative regression in rows/s or p99 that fails the comparison")
+    args = parser.parse_args()
+
+    # Configure the backend before any app module reads its environment
+    mock_url = f"http://127.0.0.1:{args.port}"
+    os.environ["HF_API_TOKEN"] = "benchmark-token"
+    os.environ["HF_API_BASE_URL"] = mock_url
+    os.environ["SUPABASE_URL"] = mock_url
+    os.environ["SUPABASE_KEY"] = "benchmark-key"
+
+    server = start_mock_server(args.port, args)
+    try:
+        results = asyncio.run(run_all(args))
+    finally:
+        server.terminate()
+        server.wait()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": args.sizes,
+            "concurrency": args.concurrency,
+            "mock_latency_ms": args.latency_ms,
+            "mock_jitter_ms": args.jitter_ms,
+            "mock_error_rate": args.error_rate,
+            "mock_rate_limit_rate": args.rate_limit_rate
+        },
+        "results": results
+    }
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.fail_threshold):
+            print(f"\nRegression beyond {args.fail_threshold:.0%} detected")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
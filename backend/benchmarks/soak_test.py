@@ -0,0 +1,264 @@
+"""
+Memory soak test for long-lived workers.
+
+Drives the word cloud, sentiment and Excel endpoints in-process (HF and
+Supabase answered by benchmarks/mock_server.py) for many iterations and
+tracks RSS, open file descriptors, files left in the temp and working
+directories and open matplotlib figures throughout. tracemalloc slows the
+matplotlib path several-fold, so Python allocations are only traced over
+the last --trace-iterations iterations.
+After a warmup (which fills caches and pools), growth beyond the thresholds
+fails the run with exit code 1 and prints the allocation sites that grew
+the most:
+
+    cd backend
+    python benchmarks/soak_test.py --iterations 2000
+    python benchmarks/soak_test.py --iterations 5000 --endpoints wordcloud --max-rss-growth-mb 32
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCH_DIR), "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import httpx  # noqa: E402
+
+from run_benchmarks import start_mock_server  # noqa: E402
+from synthetic import make_rows, write_sheet  # noqa: E402
+
+ENDPOINTS = ("wordcloud", "sentiment", "excel")
+# Comments are drawn from a fixed pool so caches reach a steady size during warmup
+COMMENT_POOL = 200
+# Iterations run after tracemalloc starts before its baseline snapshot is taken
+TRACE_SETTLE_ITERATIONS = 10
+
+
+def _open_fds() -> int:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+def _open_figures() -> int:
+    pyplot = sys.modules.get("matplotlib.pyplot")
+    return len(pyplot.get_fignums()) if pyplot else 0
+
+
+class Sample:
+    """Process state at one point of the soak, taken after a full collection"""
+
+    def __init__(self, iteration: int, tmp_dir: str):
+        from core.recycling import rss_bytes
+
+        gc.collect()
+        self.iteration = iteration
+        self.rss_mb = rss_bytes() / 1024 / 1024
+        self.fds = _open_fds()
+        self.tmp_files = len(os.listdir(tmp_dir))
+        self.cwd_files = len(os.listdir(os.getcwd()))
+        self.figures = _open_figures()
+        self.traced_mb: Optional[float] = None
+        self.snapshot = None
+        if tracemalloc.is_tracing():
+            self.traced_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+            self.snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+                tracemalloc.Filter(False, "<unknown>")
+            ))
+
+    def as_dict(self) -> dict:
+        return {
+            "iteration": self.iteration,
+            "rss_mb": round(self.rss_mb, 1),
+            "traced_mb": round(self.traced_mb, 2) if self.traced_mb is not None else None,
+            "fds": self.fds,
+            "tmp_files": self.tmp_files,
+            "cwd_files": self.cwd_files,
+            "figures": self.figures
+        }
+
+
+def top_growth(baseline: Sample, final: Sample, limit: int, key: str = "lineno") -> list:
+    """Allocation sites that grew the most between two traced samples"""
+    stats = final.snapshot.compare_to(baseline.snapshot, key)
+    return [stat for stat in stats if stat.size_diff > 0][:limit]
+
+
+async def soak(args, workdir: str, tmp_dir: str) -> List[Sample]:
+    from main import app
+
+    comments = [row["comment"] for row in make_rows(COMMENT_POOL)]
+    sheet = write_sheet(os.path.join(workdir, "soak.xlsx"), args.excel_rows)
+    with open(sheet, "rb") as f:
+        sheet_bytes = f.read()
+
+    async def run_iteration(client: httpx.AsyncClient, i: int):
+        if "wordcloud" in args.endpoints:
+            response = await client.get("/api/wordcloud", params={"sentence": comments[i % COMMENT_POOL]})
+            response.raise_for_status()
+        if "sentiment" in args.endpoints:
+            batch = [{"comment_id": f"soak{(i + j) % COMMENT_POOL}", "text": comments[(i + j) % COMMENT_POOL]}
+                     for j in range(args.batch_size)]
+            response = await client.post("/api/sentiment", json={"comments": batch})
+            response.raise_for_status()
+        if "excel" in args.endpoints and i % args.excel_every == 0:
+            response = await client.post("/api/process-excel", params={"resume": "false"}, files={
+                "file": ("soak.xlsx", sheet_bytes, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+            })
+            response.raise_for_status()
+
+    trace_start = max(0, args.iterations - args.trace_iterations)
+    samples = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://soak", timeout=None) as client:
+        start = time.perf_counter()
+        for i in range(args.warmup + args.iterations):
+            done = i - args.warmup
+            if done == trace_start:
+                # Last untraced sample: the RSS trend is judged up to here
+                samples.append(Sample(done, tmp_dir))
+                tracemalloc.start(args.frames)
+            await run_iteration(client, i)
+            done += 1
+            due = done > 0 and (done % args.sample_every == 0 or done == args.iterations)
+            if done == 0 or done == trace_start + TRACE_SETTLE_ITERATIONS or due:
+                samples.append(Sample(done, tmp_dir))
+            else:
+                continue
+            sample = samples[-1]
+            traced = f"  traced={sample.traced_mb:7.2f}MB" if sample.traced_mb is not None else ""
+            print(f"[{time.perf_counter() - start:7.1f}s] iteration {done:6d}  rss={sample.rss_mb:7.1f}MB{traced}  "
+                  f"fds={sample.fds}  tmp={sample.tmp_files}  cwd={sample.cwd_files}  figures={sample.figures}", flush=True)
+    tracemalloc.stop()
+    return samples
+
+
+def check(samples: List[Sample], args) -> List[str]:
+    """Threshold violations against the sample taken right after warmup"""
+    baseline, final = samples[0], samples[-1]
+    untraced = [sample for sample in samples if sample.snapshot is None]
+    traced = [sample for sample in samples if sample.snapshot is not None]
+    failures = []
+
+    rss_growth = untraced[-1].rss_mb - baseline.rss_mb
+    if rss_growth > args.max_rss_growth_mb:
+        failures.append(f"RSS grew {rss_growth:.1f}MB by iteration {untraced[-1].iteration} "
+                        f"(limit {args.max_rss_growth_mb}MB)")
+    if len(traced) > 1:
+        heap_growth = traced[-1].traced_mb - traced[0].traced_mb
+        if heap_growth > args.max_traced_growth_mb:
+            failures.append(f"Python heap grew {heap_growth:.2f}MB over iterations {traced[0].iteration}-"
+                            f"{traced[-1].iteration} (limit {args.max_traced_growth_mb}MB)")
+    if final.fds - baseline.fds > args.max_fd_growth:
+        failures.append(f"Open file descriptors grew from {baseline.fds} to {final.fds}")
+    if final.tmp_files > baseline.tmp_files:
+        failures.append(f"{final.tmp_files - baseline.tmp_files} temp files left behind")
+    if final.cwd_files > baseline.cwd_files:
+        failures.append(f"{final.cwd_files - baseline.cwd_files} files left behind in the working directory")
+    if final.figures > baseline.figures:
+        failures.append(f"{final.figures - baseline.figures} matplotlib figures left open")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--endpoints", choices=ENDPOINTS, nargs="+", default=list(ENDPOINTS))
+    parser.add_argument("--batch-size", type=int, default=10, help="Comments per /api/sentiment call")
+    parser.add_argument("--excel-rows", type=int, default=10)
+    parser.add_argument("--excel-every", type=int, default=25, help="Upload a workbook every N iterations")
+    parser.add_argument("--sample-every", type=int, default=250)
+    parser.add_argument("--trace-iterations", type=int, default=200,
+                        help="Trace Python allocations over this many final iterations")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=64.0)
+    parser.add_argument("--max-traced-growth-mb", type=float, default=4.0)
+    parser.add_argument("--max-fd-growth", type=int, default=8)
+    parser.add_argument("--top", type=int, default=15, help="Allocation sites to show on failure")
+    parser.add_argument("--frames", type=int, default=10, help="Stack depth recorded by tracemalloc")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--output", help="Write the sample series and result as JSON to this path")
+    args = parser.parse_args()
+    args.jitter_ms, args.error_rate, args.rate_limit_rate = 0.0, 0.0, 0.0
+    if args.trace_iterations <= TRACE_SETTLE_ITERATIONS:
+        parser.error(f"--trace-iterations must be more than {TRACE_SETTLE_ITERATIONS}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Configure the backend before any app module reads its environment;
+        # its temp files and working directory are private so leftovers can be counted
+        tmp_dir = os.path.join(workdir, "tmp")
+        os.makedirs(tmp_dir)
+        tempfile.tempdir = tmp_dir
+        run_dir = os.path.join(workdir, "cwd")
+        os.makedirs(run_dir)
+        previous_cwd = os.getcwd()
+        mock_url = f"http://127.0.0.1:{args.port}"
+        os.environ.update({
+            "HF_API_TOKEN": "soak-token",
+            "HF_API_BASE_URL": mock_url,
+            "SUPABASE_URL": mock_url,
+            "SUPABASE_KEY": "soak-key",
+            "RESULT_STORE_PATH": os.path.join(workdir, "result_store.db"),
+            "CHECKPOINT_PATH": os.path.join(workdir, "checkpoints.db"),
+            "SEARCH_INDEX_PATH": os.path.join(workdir, "search_index.db")
+        })
+
+        server = start_mock_server(args.port, args)
+        os.chdir(run_dir)
+        try:
+            samples = asyncio.run(soak(args, workdir, tmp_dir))
+        finally:
+            os.chdir(previous_cwd)
+            server.terminate()
+            server.wait()
+        tempfile.tempdir = None
+
+    failures = check(samples, args)
+    baseline = samples[0]
+    pre_trace = [sample for sample in samples if sample.snapshot is None][-1]
+    traced = [sample for sample in samples if sample.snapshot is not None]
+    growth = top_growth(traced[0], traced[-1], args.top) if len(traced) > 1 else []
+    if failures:
+        print("\nLEAK DETECTED:\n  " + "\n  ".join(failures))
+        if growth:
+            print(f"\nTop {len(growth)} allocation sites by growth over iterations "
+                  f"{traced[0].iteration}-{traced[-1].iteration}:")
+            for stat in growth:
+                print(f"  {stat}")
+            for stat in top_growth(traced[0], traced[-1], 3, "traceback"):
+                print(f"\n{stat.size_diff / 1024:.1f} KiB in {stat.count_diff:+d} blocks allocated at:")
+                print("\n".join(f"    {line}" for line in stat.traceback.format()))
+    else:
+        heap = f", Python heap {traced[-1].traced_mb - traced[0].traced_mb:+.2f}MB" if len(traced) > 1 else ""
+        print(f"\nNo leak: RSS {pre_trace.rss_mb - baseline.rss_mb:+.1f}MB over {pre_trace.iteration} iterations{heap}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "endpoints": args.endpoints,
+                "iterations": args.iterations,
+                "samples": [sample.as_dict() for sample in samples],
+                "failures": failures,
+                "top_growth": [str(stat) for stat in growth]
+            }, f, indent=2)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
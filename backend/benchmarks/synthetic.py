@@ -0,0 +1,59 @@
+"""Synthetic consultation data for benchmarks."""
+import random
+from typing import Dict, List
+
+import pandas as pd
+
+OPENINGS = [
+    "I strongly support", "I am concerned about", "We oppose", "I welcome", "Our association objects to",
+    "I appreciate the intent of", "There is a serious problem with", "We broadly agree with"
+]
+SUBJECTS = [
+    "the data retention rules in section {s}", "the compliance burden on small businesses",
+    "the proposed penalties under section {s}", "the consent requirements for minors",
+    "the grievance redressal timeline", "the exemptions granted to government agencies",
+    "the cross-border transfer provisions", "the definition of significant data fiduciary"
+]
+DETAILS = [
+    "This will harm privacy for ordinary citizens.", "It is a great benefit for consumers.",
+    "The timeline is unfair and unrealistic.", "Clear guidance would be helpful.",
+    "Compliance costs are a heavy burden for startups.", "The drafting is excellent and balanced.",
+    "We request the ministry to reconsider this clause.", "Enforcement should be phased over two years."
+]
+FORM_LETTER = (
+    "As a concerned citizen I oppose section 4 of this draft because it weakens privacy protections "
+    "and places an unfair burden on individuals. Please withdraw this clause."
+)
+
+
+def make_comment(rng: random.Random, long_ratio: float = 0.05) -> str:
+    sentences = [f"{rng.choice(OPENINGS)} {rng.choice(SUBJECTS).format(s=rng.randint(1, 40))}."]
+    count = rng.randint(8, 40) if rng.random() < long_ratio else rng.randint(1, 4)
+    sentences.extend(rng.choice(DETAILS) for _ in range(count))
+    return " ".join(sentences)
+
+
+def make_rows(n: int, duplicate_ratio: float = 0.2, seed: int = 7) -> List[Dict]:
+    """Generate comment rows; duplicate_ratio of them are near-identical form letters"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        if rng.random() < duplicate_ratio:
+            comment = FORM_LETTER + ("" if rng.random() < 0.5 else " Thank you.")
+        else:
+            comment = make_comment(rng)
+        rows.append({
+            "comment_id": f"c{i:07d}",
+            "comment": comment,
+            "section_reference": f"Section {rng.randint(1, 12)}"
+        })
+    return rows
+
+
+def write_sheet(path: str, n: int, duplicate_ratio: float = 0.2, seed: int = 7) -> str:
+    df = pd.DataFrame(make_rows(n, duplicate_ratio, seed))
+    if path.endswith(".csv"):
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+    return path